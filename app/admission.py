@@ -0,0 +1,333 @@
+# app/admission.py
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.requests import cookie_parser
+
+from . import auth, config
+
+# Классы маршрутов: у каждого свой предел одновременных запросов и своя очередь ожидания
+AUTH = "auth"
+READ = "read"
+WRITE = "write"
+
+# Маршруты входа: проверка пароля (bcrypt) и выдача токена по refresh-cookie
+AUTH_PATHS = ("/login", "/token/refresh")
+# Маршруты без контроля допуска: статика, служебные показатели и долгоживущий поток SSE,
+# который занимал бы место в пределе одновременных запросов все время соединения
+EXEMPT_PREFIXES = ("/static/", "/metrics", "/events/")
+# Максимальный размер тела формы, из которого извлекается токен или логин для корзины пользователя
+MAX_PEEK_BODY_SIZE = 16 * 1024
+# Максимальное число корзин пользователей в памяти процесса (вытесняются давно не активные)
+MAX_BUCKETS = 50000
+
+class Rejected(Exception):
+    """Запрос не допущен: очередь класса заполнена или время ожидания истекло."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Корзина токенов пользователя: rate запросов в секунду в среднем и до burst подряд."""
+
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated_at = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Забирает токен; возвращает 0 или число секунд до появления следующего токена."""
+        self.tokens = min(burst, self.tokens + (now - self.updated_at) * rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+class Gate:
+    """
+    Предел одновременных запросов класса с очередью ожидания FIFO.
+
+    Освободившееся место передается первому ожидающему напрямую, поэтому новые запросы
+    не обгоняют очередь. Очередь ограничена: лишние запросы сразу получают отказ
+    с оценкой времени, через которое стоит повторить попытку.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Скользящее среднее времени обработки запроса, по нему оценивается Retry-After
+        self.service_time = 0.05
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def retry_after(self) -> int:
+        """Оценка времени (в секундах), за которое очередь продвинется до нового запроса."""
+        return max(1, math.ceil((len(self._waiters) + 1) * self.service_time / self.limit))
+
+    async def acquire(self) -> None:
+        """Занимает место; при необходимости ждет в очереди. Выбрасывает Rejected."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise Rejected(self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Место передали в момент истечения ожидания: возвращаем его следующему
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            self.timed_out += 1
+            raise Rejected(self.retry_after())
+        except asyncio.CancelledError:
+            # Клиент отключился, пока ждал в очереди
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self, elapsed: Optional[float] = None) -> None:
+        """Освобождает место: передает его первому ожидающему или уменьшает число занятых."""
+        if elapsed is not None:
+            self.service_time = 0.9 * self.service_time + 0.1 * elapsed
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict:
+        """Возвращает состояние и счетчики класса."""
+        return {
+            "limit": self.limit, "active": self.active, "waiting": len(self._waiters),
+            "admitted": self.admitted, "queued": self.queued, "rejected": self.rejected,
+            "timed_out": self.timed_out, "service_time_ms": round(self.service_time * 1000, 1),
+        }
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Определяет класс маршрута (None — без контроля допуска)."""
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path in AUTH_PATHS and (method == "POST" or path != "/login"):
+        return AUTH
+    if method in ("GET", "HEAD"):
+        return READ
+    return WRITE
+
+class AdmissionController:
+    """Пределы классов маршрутов и корзины токенов пользователей одного процесса."""
+
+    def __init__(self):
+        settings = config.settings
+        auth_limit = settings.ADMISSION_AUTH_CONCURRENCY or os.cpu_count() or 1
+        limits = {
+            AUTH: auth_limit,
+            READ: settings.ADMISSION_READ_CONCURRENCY,
+            WRITE: settings.ADMISSION_WRITE_CONCURRENCY,
+        }
+        self.gates = {
+            name: Gate(name, limit, settings.ADMISSION_QUEUE_SIZE, settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+            for name, limit in limits.items()
+        }
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.throttled = 0
+        self.trusted_proxies = {address.strip() for address in settings.ADMISSION_TRUSTED_PROXIES.split(",") if address.strip()}
+
+    def take_token(self, identity: str) -> float:
+        """Списывает токен из корзины пользователя; возвращает время ожидания при исчерпании."""
+        settings = config.settings
+        now = time.monotonic()
+        bucket = self.buckets.get(identity)
+        if bucket is None:
+            bucket = self.buckets[identity] = TokenBucket(settings.ADMISSION_BURST, now)
+            if len(self.buckets) > MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(identity)
+        wait = bucket.take(settings.ADMISSION_RATE_PER_SECOND, settings.ADMISSION_BURST, now)
+        if wait:
+            self.throttled += 1
+        return wait
+
+    def stats(self) -> Dict:
+        """Возвращает состояние классов маршрутов и число отказов по корзинам пользователей."""
+        return {
+            "classes": {name: gate.stats() for name, gate in self.gates.items()},
+            "throttled": self.throttled,
+            "buckets": len(self.buckets),
+        }
+
+# Состояние контроля допуска процесса; все обращения к нему выполняются в потоке цикла событий
+controller = AdmissionController()
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware контроля допуска для всплесков нагрузки в день выбора тем.
+
+    Каждый пользователь ограничен корзиной токенов (ADMISSION_RATE_PER_SECOND в среднем,
+    до ADMISSION_BURST подряд): при исчерпании возвращается 429 с Retry-After. Анонимные
+    GET-запросы (страница входа, главная) корзину не расходуют: за NAT или прокси их
+    отправляет с одного адреса множество разных людей. Число
+    одновременно обрабатываемых запросов ограничено отдельно для входа (bcrypt), чтения
+    и записи (SQLite), остальные ждут в очереди FIFO; при заполненной очереди или
+    истечении ADMISSION_QUEUE_TIMEOUT_SECONDS возвращается 503 с Retry-After. Так процесс
+    работает на пределе своей производительности, а не деградирует для всех сразу.
+    Ограничения действуют в пределах одного процесса (воркера).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        receive, identity = await _identify(scope, receive)
+        wait = controller.take_token(identity) if identity else 0.0
+        if wait:
+            await _reject(send, 429, math.ceil(wait), "Слишком много запросов. Повторите попытку позже.")
+            return
+
+        gate = controller.gates[route_class]
+        try:
+            await gate.acquire()
+        except Rejected as rejected:
+            await _reject(send, 503, rejected.retry_after, "Сервер перегружен. Повторите попытку позже.")
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release(time.perf_counter() - started)
+
+async def _identify(scope, receive) -> Tuple[object, Optional[str]]:
+    """
+    Определяет, чью корзину токенов расходует запрос (None — ничью).
+
+    Пользователь определяется по токену доступа (параметр token в адресе или в теле
+    формы), при обновлении токена — по refresh-cookie, при входе — по логину из формы.
+    Анонимные GET и HEAD ограничены только пределом класса чтения, остальные анонимные
+    запросы — корзиной адреса клиента. Тело небольшой формы читается заранее и затем
+    передается приложению без изменений.
+    """
+    params = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if "token" not in params and scope["method"] == "POST" and _is_small_form(scope):
+        body, receive = await _peek_body(receive)
+        params = parse_qs(body.decode("utf-8", "replace"))
+    token = params.get("token", [None])[0]
+    username = auth.get_username_from_token(token) if token else None
+    if username:
+        return receive, f"user:{username}"
+    login = params.get("username", [None])[0]
+    if login and scope["path"] == "/login":
+        return receive, f"login:{login.strip().lower()}"
+    if scope["path"] == "/token/refresh":
+        username = auth.get_username_from_refresh_token(_cookies(scope).get(auth.REFRESH_COOKIE))
+        if username:
+            return receive, f"user:{username}"
+    if scope["method"] in ("GET", "HEAD"):
+        return receive, None
+    return receive, f"ip:{_client_address(scope)}"
+
+def _cookies(scope) -> Dict[str, str]:
+    """Возвращает cookie запроса."""
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            return cookie_parser(value.decode("latin-1"))
+    return {}
+
+def _client_address(scope) -> str:
+    """
+    Возвращает адрес клиента.
+
+    X-Forwarded-For учитывается только для запросов от доверенных прокси
+    (ADMISSION_TRUSTED_PROXIES): берется самый правый адрес, не принадлежащий им,
+    так как левые части заголовка клиент может подставить сам.
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if address not in controller.trusted_proxies:
+        return address
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            for forwarded in reversed(value.decode("latin-1").split(",")):
+                forwarded = forwarded.strip()
+                if forwarded and forwarded not in controller.trusted_proxies:
+                    return forwarded
+    return address
+
+def _is_small_form(scope) -> bool:
+    """Проверяет, что тело запроса — форма application/x-www-form-urlencoded небольшого размера."""
+    headers = dict(scope.get("headers", []))
+    if not headers.get(b"content-type", b"").startswith(b"application/x-www-form-urlencoded"):
+        return False
+    length = headers.get(b"content-length")
+    return length is not None and length.isdigit() and int(length) <= MAX_PEEK_BODY_SIZE
+
+async def _peek_body(receive):
+    """Читает тело запроса целиком и возвращает его вместе с receive, повторяющим это тело для приложения."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # Клиент отключился: приложение получит то же сообщение
+            replay = [message]
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            replay = [{"type": "http.request", "body": b"".join(chunks), "more_body": False}]
+            break
+    body = b"".join(chunks)
+
+    async def replay_receive():
+        if replay:
+            return replay.pop()
+        return await receive()
+
+    return body, replay_receive
+
+async def _reject(send, status_code: int, retry_after: int, message: str) -> None:
+    """Отправляет отказ с заголовком Retry-After."""
+    body = message.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,134 @@
+# app/allocation.py
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import config, crud, schemas
+from .database import run_write
+
+# Модуль зависит от numpy, поэтому подключается только задачей распределения (см. app/tasks.py)
+
+def serial_dictatorship(preferences: np.ndarray, order: np.ndarray, topic_teacher: np.ndarray,
+                        teacher_capacity: np.ndarray) -> np.ndarray:
+    """
+    Распределяет темы по спискам предпочтений в порядке приоритета студентов.
+
+    preferences — матрица [студенты × места] с индексами тем (-1 — пустое место),
+    order — порядок студентов по убыванию приоритета, topic_teacher — индекс
+    преподавателя каждой темы, teacher_capacity — число свободных мест у преподавателя.
+    Каждый студент по очереди получает самую желанную из тем, которая еще свободна
+    и у преподавателя которой остались места. Когда у всех тем один общий порядок
+    приоритета студентов, алгоритм отложенного согласия (Гейла — Шепли) дает ровно
+    этот результат, поэтому распределение устойчиво: ни один студент не предпочитает
+    чужую тему, отданную студенту с меньшим приоритетом. Возвращает для каждого
+    студента номер места в его списке (-1, если тема не досталась).
+    """
+    taken = np.zeros(len(topic_teacher), dtype=bool)
+    capacity = teacher_capacity.copy()
+    chosen = np.full(preferences.shape[0], -1, dtype=np.int64)
+    for student in order:
+        row = preferences[student]
+        # Место подходит, если оно заполнено, тема свободна и у преподавателя есть места
+        available = (row >= 0) & ~taken[row] & (capacity[topic_teacher[row]] > 0)
+        places = np.flatnonzero(available)
+        if places.size:
+            place = places[0]
+            topic = row[place]
+            taken[topic] = True
+            capacity[topic_teacher[topic]] -= 1
+            chosen[student] = place
+    return chosen
+
+def build_preference_matrix(rows: List[Tuple[int, int, str]], topic_ids: np.ndarray, topic_types: np.ndarray,
+                            max_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Строит матрицу предпочтений по строкам (student_id, topic_id, work_type).
+
+    Строки должны быть упорядочены по студенту и месту в списке, topic_ids — непустой
+    отсортированный массив свободных тем. Темы, которые уже заняты или не подходят
+    по типу работы, из списков исключаются. Возвращает идентификаторы студентов,
+    матрицу индексов тем в topic_ids и матрицу исходных мест в списках (для статистики).
+    """
+    count = len(rows)
+    student_column = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    topic_column = np.fromiter((row[1] for row in rows), dtype=np.int64, count=count)
+    work_types = np.array([row[2] for row in rows], dtype=object)
+    student_ids, student_index = np.unique(student_column, return_inverse=True)
+    # Исходное место темы в списке студента: строки студента идут подряд
+    places = np.arange(count) - np.searchsorted(student_index, student_index)
+
+    topic_index = np.minimum(np.searchsorted(topic_ids, topic_column), len(topic_ids) - 1)
+    matched_types = topic_types[topic_index]
+    usable = (topic_ids[topic_index] == topic_column) & (
+        (matched_types == work_types) | (matched_types == crud.BOTH_WORK_TYPES)
+    )
+
+    # После исключения неподходящих тем оставшиеся сдвигаются к началу списка
+    student_index, topic_index, places = student_index[usable], topic_index[usable], places[usable]
+    columns = np.arange(len(student_index)) - np.searchsorted(student_index, student_index)
+    fits = columns < max_length
+    preferences = np.full((len(student_ids), max_length), -1, dtype=np.int64)
+    ranks = np.full((len(student_ids), max_length), -1, dtype=np.int64)
+    preferences[student_index[fits], columns[fits]] = topic_index[fits]
+    ranks[student_index[fits], columns[fits]] = places[fits]
+    return student_ids, preferences, ranks
+
+def run_allocation(db: Session, capacity: Optional[int] = None, seed: Optional[int] = None) -> schemas.AllocationSummary:
+    """
+    Распределяет свободные темы между студентами без темы по их спискам предпочтений.
+
+    Приоритет студентов определяется жеребьевкой с зерном seed (сохраняется в итоге,
+    чтобы результат можно было воспроизвести), поэтому время подачи списка не дает
+    преимущества. capacity ограничивает общее число студентов у одного преподавателя
+    с учетом уже закрепленных тем (None — без ограничения). Результат записывается
+    одной транзакцией.
+    """
+    started = time.perf_counter()
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2 ** 32))
+    free_topics = crud.get_free_topic_rows(db)
+    topic_ids = np.array([row[0] for row in free_topics], dtype=np.int64)
+    topic_teacher_ids = np.array([row[1] for row in free_topics], dtype=np.int64)
+    topic_types = np.array([row[2] for row in free_topics], dtype=object)
+    rows = crud.get_pending_preference_rows(db)
+    summary = schemas.AllocationSummary(seed=seed)
+    if not rows:
+        return summary
+    if not free_topics:
+        summary.students = summary.unassigned = len({row[0] for row in rows})
+        return summary
+
+    student_ids, preferences, ranks = build_preference_matrix(
+        rows, topic_ids, topic_types, config.settings.PREFERENCES_MAX_LENGTH
+    )
+    teacher_ids, topic_teacher = np.unique(topic_teacher_ids, return_inverse=True)
+    if capacity is None:
+        teacher_capacity = np.full(len(teacher_ids), len(topic_ids), dtype=np.int64)
+    else:
+        loads = crud.get_teacher_loads(db)
+        teacher_capacity = np.maximum(
+            capacity - np.array([loads.get(teacher_id, 0) for teacher_id in teacher_ids.tolist()], dtype=np.int64), 0
+        )
+    order = np.random.default_rng(seed).permutation(len(student_ids))
+
+    solve_started = time.perf_counter()
+    chosen = serial_dictatorship(preferences, order, topic_teacher, teacher_capacity)
+    solve_seconds = time.perf_counter() - solve_started
+
+    students = np.flatnonzero(chosen >= 0)
+    topics = preferences[students, chosen[students]]
+    assignments = list(zip(topic_ids[topics].tolist(), student_ids[students].tolist(),
+                           topic_teacher_ids[topics].tolist()))
+    run_write(db, crud.apply_topic_allocation, assignments)
+
+    # Статистика по исходным местам в списках (1 — самая желанная тема)
+    granted_ranks, granted_counts = np.unique(ranks[students, chosen[students]] + 1, return_counts=True)
+    summary.students = len(student_ids)
+    summary.assigned = len(assignments)
+    summary.unassigned = len(student_ids) - len(assignments)
+    summary.by_rank = dict(zip(granted_ranks.tolist(), granted_counts.tolist()))
+    summary.solve_seconds = round(solve_seconds, 3)
+    summary.total_seconds = round(time.perf_counter() - started, 3)
+    return summary
@@ -1,19 +1,153 @@
 # app/auth.py
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
-from . import config, crud, models
+from . import config, crud, models, profiling, schemas
+from .cache import login_cache, principal_cache
+from .database import run_write
 
 # Инициализация контекста для хэширования паролей с использованием bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.settings.BCRYPT_ROUNDS)
+
+# Пул процессов для массового хэширования, создается при первом обращении
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+# Имя cookie с refresh-токеном
+REFRESH_COOKIE = "refresh_token"
+
+# Счетчики проверок пароля при входе: сколько раз вычислялся bcrypt и сколько это заняло
+_login_lock = threading.Lock()
+_bcrypt_verifications = 0
+_bcrypt_seconds = 0.0
+
+def generate_random_password(length=12):
+    """Генерирует случайный пароль длиной length из букв, цифр и символов."""
+    alphabet = string.ascii_letters + string.digits + string.punctuation
+    return ''.join(secrets.choice(alphabet) for i in range(length))
+
+def _hash_batch(passwords: List[str]) -> List[str]:
+    """Хэширует пачку паролей (выполняется в дочернем процессе пула)."""
+    return [pwd_context.hash(password) for password in passwords]
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    """Возвращает пул процессов для хэширования, размер которого равен числу доступных ядер."""
+    global _hash_pool
+    if _hash_pool is None:
+        workers = config.settings.HASH_WORKERS
+        if not workers:
+            # Учитываем ограничение процесса по ядрам (taskset, cgroups), если оно доступно
+            workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        # spawn вместо fork: процесс веб-сервера многопоточный, fork в нем небезопасен
+        _hash_pool = ProcessPoolExecutor(max_workers=workers or 1, mp_context=multiprocessing.get_context("spawn"))
+    return _hash_pool
+
+def hash_passwords(passwords: List[str]) -> Tuple[List[str], float]:
+    """
+    Хэширует список паролей, распределяя пачки по пулу процессов.
+
+    Возвращает список хэшей в исходном порядке и скорость хэширования (хэшей в секунду).
+    Небольшие списки хэшируются в текущем процессе, чтобы не платить за запуск пула.
+    """
+    if not passwords:
+        return [], 0.0
+    started = time.perf_counter()
+    batch_size = config.settings.HASH_BATCH_SIZE
+    if len(passwords) <= batch_size:
+        hashes = _hash_batch(passwords)
+    else:
+        batches = [passwords[start:start + batch_size] for start in range(0, len(passwords), batch_size)]
+        hashes = [hashed for batch in _get_hash_pool().map(_hash_batch, batches) for hashed in batch]
+    elapsed = time.perf_counter() - started
+    profiling.add_time("bcrypt", elapsed)
+    return hashes, len(hashes) / elapsed if elapsed > 0 else 0.0
+
+def reset_user_passwords(db: Session, targets: List[Tuple[int, str, str]]) -> Tuple[List[Dict], float]:
+    """
+    Генерирует и сохраняет новые пароли для пользователей targets (id, username, full_name).
+
+    Хэши считаются вне очереди записи, а в очередь попадает только пакетный UPDATE
+    одной транзакцией. Возвращает строки
+    с новыми учетными данными для выгрузки и скорость хэширования.
+    """
+    new_passwords = [generate_random_password() for _ in targets]
+    new_hashes, hash_rate = hash_passwords(new_passwords)
+    run_write(db, crud.bulk_update_passwords, [
+        {"id": user_id, "username": username, "hashed_password": new_hashed_password}
+        for (user_id, username, _), new_hashed_password in zip(targets, new_hashes)
+    ])
+    credentials = [
+        {"ФИО": full_name, "Логин (email)": username, "Новый пароль": new_password}
+        for (_, username, full_name), new_password in zip(targets, new_passwords)
+    ]
+    return credentials, hash_rate
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Проверяет, соответствует ли введенный пароль хэшированному паролю."""
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        profiling.add_time("bcrypt", time.perf_counter() - started)
+
+def _login_key(username: str, password: str) -> bytes:
+    """Ключ кэша проверок пароля; пароль в памяти процесса не хранится даже в виде быстрого хэша без секрета."""
+    message = username.encode() + b"\0" + password.encode()
+    return hmac.new(config.settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+
+def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
+    """
+    Проверяет логин и пароль, возвращает пользователя или None.
+
+    Успешные проверки запоминаются вместе с хэшем пароля на момент проверки, поэтому
+    повторный вход с тем же паролем не вычисляет bcrypt, а смена пароля сразу делает
+    запись недействительной. Неудачные попытки не кэшируются.
+    """
+    global _bcrypt_verifications, _bcrypt_seconds
+    user = crud.get_user_by_username(db, username)
+    if not user and username.strip().lower() != username:
+        # Импорт сохраняет email в нижнем регистре, а вводить его могут как угодно
+        user = crud.get_user_by_username(db, username.strip().lower())
+    if not user:
+        return None
+    key = _login_key(user.username, password)
+    cached_hash = login_cache.get(key)
+    if cached_hash is not None and hmac.compare_digest(cached_hash, user.hashed_password):
+        return user
+    started = time.perf_counter()
+    verified = verify_password(password, user.hashed_password)
+    with _login_lock:
+        _bcrypt_verifications += 1
+        _bcrypt_seconds += time.perf_counter() - started
+    if not verified:
+        return None
+    login_cache.set(key, user.hashed_password)
+    return user
+
+def login_stats() -> Dict:
+    """Возвращает счетчики кэша проверок пароля и оценку сэкономленного процессорного времени bcrypt."""
+    cache_stats = login_cache.stats()
+    with _login_lock:
+        verifications, seconds = _bcrypt_verifications, _bcrypt_seconds
+    average = seconds / verifications if verifications else 0.0
+    return {
+        "cache": cache_stats,
+        "bcrypt_verifications": verifications,
+        "bcrypt_seconds": round(seconds, 3),
+        "bcrypt_seconds_saved": round(cache_stats["hits"] * average, 3),
+    }
 
 def create_access_token(data: dict) -> str:
     """Создает JWT-токен с временем истечения, основанным на настройках."""
@@ -24,19 +158,79 @@ def create_access_token(data: dict) -> str:
     # Кодируем токен с использованием секретного ключа и алгоритма
     return jwt.encode(to_encode, config.settings.SECRET_KEY, algorithm=config.settings.ALGORITHM)
 
-def get_user_from_token(db: Session, token: str) -> Optional[models.User]:
-    """Извлекает пользователя из JWT-токена, если токен валиден."""
+def _password_fingerprint(hashed_password: str) -> str:
+    """Отпечаток хэша пароля для refresh-токена: после смены пароля старые refresh-токены перестают действовать."""
+    return hmac.new(config.settings.SECRET_KEY.encode(), hashed_password.encode(), hashlib.sha256).hexdigest()[:32]
+
+def create_refresh_token(user: models.User) -> str:
+    """Создает долгоживущий refresh-токен, по которому выдается новый токен доступа без ввода пароля."""
+    expire = datetime.now(timezone.utc) + timedelta(minutes=config.settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+    to_encode = {"sub": user.username, "type": "refresh", "pwd": _password_fingerprint(user.hashed_password), "exp": expire}
+    return jwt.encode(to_encode, config.settings.SECRET_KEY, algorithm=config.settings.ALGORITHM)
+
+def refresh_access_token(db: Session, refresh_token: Optional[str]) -> Optional[str]:
+    """Возвращает новый токен доступа по refresh-токену или None, если refresh-токен недействителен."""
+    if not refresh_token:
+        return None
+    try:
+        payload = jwt.decode(refresh_token, config.settings.SECRET_KEY, algorithms=[config.settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh":
+        return None
+    user = crud.get_user_by_username(db, payload.get("sub"))
+    if user is None or not hmac.compare_digest(payload.get("pwd", ""), _password_fingerprint(user.hashed_password)):
+        return None
+    return create_access_token(data={"sub": user.username})
+
+def get_username_from_token(token: str) -> Optional[str]:
+    """Возвращает имя пользователя (поле sub) из JWT-токена, если токен валиден."""
     if not token:
         return None
     try:
-        # Декодируем токен с использованием секретного ключа
         payload = jwt.decode(token, config.settings.SECRET_KEY, algorithms=[config.settings.ALGORITHM])
-        # Извлекаем имя пользователя из поля 'sub'
-        username: str = payload.get("sub")
-        if username is None:
-            return None
     except JWTError:
-        # Возвращаем None в случае ошибки декодирования
         return None
-    # Получаем пользователя из базы данных по имени пользователя
-    return crud.get_user_by_username(db, username=username)
+    # refresh-токен не заменяет токен доступа
+    if payload.get("type", "access") != "access":
+        return None
+    return payload.get("sub")
+
+def get_username_from_refresh_token(refresh_token: str) -> Optional[str]:
+    """Возвращает имя пользователя (поле sub) из refresh-токена, если подпись и срок действия верны."""
+    if not refresh_token:
+        return None
+    try:
+        payload = jwt.decode(refresh_token, config.settings.SECRET_KEY, algorithms=[config.settings.ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("type") != "refresh":
+        return None
+    return payload.get("sub")
+
+def get_principal_from_token(db: Session, token: str) -> Optional[schemas.Principal]:
+    """
+    Возвращает аутентифицированного пользователя по JWT-токену.
+
+    Данные пользователя берутся из кэша процесса; к базе обращаемся только при промахе.
+    """
+    username = get_username_from_token(token)
+    if username is None:
+        return None
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    user = crud.get_user_with_profiles(db, username=username)
+    if user is None:
+        return None
+    principal = schemas.Principal(
+        id=user.id,
+        username=user.username,
+        full_name=user.full_name,
+        role=user.role,
+        student_profile_id=user.student_profile.id if user.student_profile else None,
+        student_group=user.student_profile.group if user.student_profile else None,
+        teacher_profile_id=user.teacher_profile.id if user.teacher_profile else None,
+    )
+    principal_cache.set(username, principal)
+    return principal
@@ -0,0 +1,119 @@
+# app/cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import config, models
+
+class SettingsCache:
+    """
+    Кэш системных настроек в памяти процесса.
+
+    Пока не истек TTL, значения отдаются без обращения к базе. После истечения TTL
+    выполняется один запрос к строке версии data_versions: если версия не изменилась,
+    кэш продлевается, иначе таблица system_settings перечитывается целиком.
+    Так изменения, сделанные другим воркером, видны не позже чем через TTL секунд.
+    """
+
+    VERSION_NAME = "settings"
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._values: Dict[str, Optional[str]] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, name: str, default: Optional[str] = None) -> Optional[str]:
+        """Возвращает строковое значение настройки или default, если она не задана."""
+        if time.monotonic() - self._checked_at > self.ttl:
+            self._refresh(db)
+        value = self._values.get(name)
+        return value if value is not None else default
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш: следующее чтение перечитает настройки из базы."""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def _refresh(self, db: Session) -> None:
+        """Сверяет версию настроек с базой и при необходимости перечитывает их."""
+        version = db.scalar(select(models.DataVersion.version).where(models.DataVersion.name == self.VERSION_NAME)) or 0
+        with self._lock:
+            if version != self._version:
+                rows = db.execute(select(models.SystemSettings.setting_name, models.SystemSettings.setting_value))
+                self._values = dict(rows.all())
+                self._version = version
+            self._checked_at = time.monotonic()
+
+class LRUCache:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей и счетчиками попаданий.
+
+    Потокобезопасен: синхронные эндпоинты FastAPI выполняются в пуле потоков.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает значение по ключу или None, если записи нет или она устарела."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохраняет значение, вытесняя самую давно использованную запись при переполнении."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удаляет запись по ключу, если она есть."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Удаляет все записи, сохраняя счетчики."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает размер кэша и счетчики попаданий, промахов и вытеснений."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+# Кэш системных настроек процесса
+settings_cache = SettingsCache(ttl=config.settings.SETTINGS_CACHE_TTL_SECONDS)
+# Кэш аутентифицированных пользователей: имя пользователя (поле sub токена) -> schemas.Principal
+principal_cache = LRUCache(maxsize=config.settings.PRINCIPAL_CACHE_SIZE, ttl=config.settings.PRINCIPAL_CACHE_TTL_SECONDS)
+# Кэш успешных проверок пароля: HMAC(SECRET_KEY, логин и пароль) -> хэш пароля на момент проверки
+login_cache = LRUCache(maxsize=config.settings.LOGIN_CACHE_SIZE, ttl=config.settings.LOGIN_CACHE_TTL_SECONDS)
+# Кэш отрендеренных фрагментов страниц: ключ содержит версии данных, от которых зависит фрагмент
+fragment_cache = LRUCache(maxsize=config.settings.FRAGMENT_CACHE_SIZE, ttl=config.settings.FRAGMENT_CACHE_TTL_SECONDS)
@@ -1,13 +1,48 @@
 # app/crud.py
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from datetime import date
-from . import models, schemas
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from . import events, fulltext, models, report_snapshot, schemas
+from .cache import principal_cache, settings_cache
+
+# Размер пачки для массовых операций: ограничивает число параметров в одном SQL-запросе
+BULK_CHUNK_SIZE = 500
+# Количество тем на одной странице каталога свободных тем
+CATALOGUE_PAGE_SIZE = 50
+
+# Результаты атомарного назначения темы (совпадают с кодами ошибок в адресе перенаправления)
+ASSIGNED = "assigned"
+TOPIC_TAKEN = "topic_taken"
+ALREADY_ASSIGNED = "already_assigned"
+
+# Имена версий данных (таблица data_versions), по которым кэши узнают об изменениях
+TOPICS_VERSION = "topics"
+USERS_VERSION = "users"
+PREFERENCES_VERSION = "preferences"
+
+# Системная настройка режима выбора тем: по умолчанию темы занимаются в порядке очереди,
+# в режиме preferences студенты подают списки предпочтений и темы распределяет администратор
+SELECTION_MODE_SETTING = "topic_selection_mode"
+PREFERENCES_MODE = "preferences"
+# Тип темы, которая подходит и для курсовой работы, и для ВКР
+BOTH_WORK_TYPES = "vkr/coursework"
+# Типы работ, на которые студент может претендовать в списке предпочтений
+STUDENT_WORK_TYPES = ("coursework", "vkr")
 
 # --- CRUD операции для пользователей ---
 def get_user_by_username(db: Session, username: str):
     """Возвращает пользователя по его имени (email) из базы данных."""
     return db.query(models.User).filter(models.User.username == username).first()
 
+def get_user_with_profiles(db: Session, username: str):
+    """Возвращает пользователя по имени вместе с профилями студента и преподавателя одним запросом."""
+    return db.query(models.User).options(
+        joinedload(models.User.student_profile), joinedload(models.User.teacher_profile)
+    ).filter(models.User.username == username).first()
+
 def get_users_by_role(db: Session, role: str):
     """Возвращает список пользователей с указанной ролью."""
     return db.query(models.User).filter(models.User.role == role).all()
@@ -16,10 +51,50 @@ def create_user(db: Session, user_data: schemas.UserBase, hashed_password: str):
     """Создает нового пользователя в базе данных с хэшированным паролем."""
     db_user = models.User(**user_data.dict(), hashed_password=hashed_password)
     db.add(db_user)
+    bump_data_version(db, USERS_VERSION)
     db.commit()
     db.refresh(db_user)
     return db_user
 
+def get_existing_usernames(db: Session, usernames: Iterable[str]) -> Set[str]:
+    """
+    Возвращает множество имен пользователей из переданного набора (в нижнем регистре), которые уже есть в базе.
+
+    Сравнение без учета регистра: email, сохраненный ранее с заглавными буквами, тоже считается существующим.
+    """
+    usernames = list({username.lower() for username in usernames})
+    existing = set()
+    # Один запрос IN (...) на пачку вместо отдельного SELECT на каждую строку файла
+    for start in range(0, len(usernames), BULK_CHUNK_SIZE * 10):
+        chunk = usernames[start:start + BULK_CHUNK_SIZE * 10]
+        existing.update(db.scalars(select(func.lower(models.User.username)).where(func.lower(models.User.username).in_(chunk))))
+    return existing
+
+def bulk_create_users_with_profiles(db: Session, role: str, rows: List[Dict]) -> int:
+    """
+    Массово создает пользователей с указанной ролью и их профили (Student/Teacher).
+
+    Каждый элемент rows содержит username, full_name, hashed_password и словарь profile
+    с полями профиля. Вставка выполняется многострочными INSERT пачками по BULK_CHUNK_SIZE
+    в одной транзакции. Возвращает количество созданных пользователей.
+    """
+    profile_model = models.Student if role == 'student' else models.Teacher
+    for start in range(0, len(rows), BULK_CHUNK_SIZE):
+        batch = rows[start:start + BULK_CHUNK_SIZE]
+        user_rows = [
+            {"username": row["username"], "full_name": row["full_name"],
+             "role": role, "hashed_password": row["hashed_password"]}
+            for row in batch
+        ]
+        # INSERT ... RETURNING отдает идентификаторы новых пользователей для связи с профилями
+        result = db.execute(insert(models.User).returning(models.User.id, models.User.username), user_rows)
+        user_ids = {username: user_id for user_id, username in result}
+        profile_rows = [dict(row["profile"], user_id=user_ids[row["username"]]) for row in batch]
+        db.execute(insert(profile_model), profile_rows)
+    bump_data_version(db, USERS_VERSION)
+    db.commit()
+    return len(rows)
+
 # --- CRUD операции для тем ---
 def get_topic_by_id(db: Session, topic_id: int):
     """Возвращает тему по её идентификатору."""
@@ -32,18 +107,98 @@ def get_all_topics(db: Session, skip: int = 0, limit: int = 100):
         joinedload(models.Topic.student).joinedload(models.Student.user)
     ).offset(skip).limit(limit).all()
 
+def has_topics(db: Session) -> bool:
+    """Проверяет, есть ли в базе хотя бы одна тема."""
+    return db.query(models.Topic.id).first() is not None
+
+def iter_topics_chunked(db: Session, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[List[models.Topic]]:
+    """
+    Постранично возвращает все темы с данными о преподавателе и студенте.
+
+    Используется keyset-пагинация по идентификатору темы: каждая страница выбирается
+    условием id > последнего id, поэтому стоимость запроса не растет с номером страницы.
+    """
+    last_id = 0
+    while True:
+        chunk = db.query(models.Topic).options(
+            joinedload(models.Topic.teacher),
+            joinedload(models.Topic.student).joinedload(models.Student.user)
+        ).filter(models.Topic.id > last_id).order_by(models.Topic.id).limit(chunk_size).all()
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
 def get_topics_by_teacher(db: Session, teacher_id: int):
     """Возвращает список тем, созданных указанным преподавателем."""
     return db.query(models.Topic).filter(models.Topic.teacher_id == teacher_id).all()
 
+def get_free_topics_page(
+    db: Session,
+    after_id: int = 0,
+    limit: int = CATALOGUE_PAGE_SIZE,
+    work_type: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    search: Optional[str] = None
+) -> Tuple[List[models.Topic], Optional[int]]:
+    """
+    Возвращает страницу свободных тем каталога и значение after для следующей страницы.
+
+    Без поиска страницы выбираются keyset-пагинацией (id > after_id) по частичным индексам
+    свободных тем, поэтому стоимость запроса не зависит от номера страницы. С поиском темы
+    упорядочены по релевантности (полнотекстовый индекс, см. app/fulltext.py), и after_id
+    означает число уже показанных результатов. Тема с типом vkr/coursework попадает
+    в выборку при фильтре как по vkr, так и по coursework.
+    """
+    query = db.query(models.Topic).options(joinedload(models.Topic.teacher)).filter(
+        models.Topic.student_id.is_(None)
+    )
+    if work_type:
+        query = query.filter(models.Topic.work_type.in_({work_type, 'vkr/coursework'}))
+    if teacher_id:
+        query = query.filter(models.Topic.teacher_id == teacher_id)
+    if search:
+        # Запрашиваем на одну тему больше, чтобы узнать, есть ли следующая страница
+        topics = fulltext.apply_search(db, query, search).offset(after_id).limit(limit + 1).all()
+        if len(topics) > limit:
+            return topics[:limit], after_id + limit
+        return topics, None
+    topics = query.filter(models.Topic.id > after_id).order_by(models.Topic.id).limit(limit + 1).all()
+    if len(topics) > limit:
+        return topics[:limit], topics[limit - 1].id
+    return topics, None
+
+def get_teacher_dashboard_topics(db: Session, teacher_id: int, vkr_deadline: Optional[str]):
+    """
+    Возвращает темы преподавателя для панели управления одним запросом.
+
+    Студенты и их пользователи подгружаются через JOIN, а признак истекшего дедлайна
+    вычисляется один раз по уже прочитанному значению настройки vkr_deadline.
+    """
+    topics = db.query(models.Topic).options(
+        joinedload(models.Topic.student).joinedload(models.Student.user)
+    ).filter(models.Topic.teacher_id == teacher_id).order_by(models.Topic.id).all()
+    deadline_passed = is_deadline_value_passed(vkr_deadline)
+    for topic in topics:
+        topic.deadline_is_passed = deadline_passed and topic.work_type == 'vkr'
+    return topics
+
 def get_student_topic(db: Session, student_profile_id: int):
-    """Возвращает тему, назначенную указанному студенту."""
-    return db.query(models.Topic).filter(models.Topic.student_id == student_profile_id).first()
+    """Возвращает тему, назначенную указанному студенту, вместе с преподавателем."""
+    return db.query(models.Topic).options(joinedload(models.Topic.teacher)).filter(
+        models.Topic.student_id == student_profile_id
+    ).first()
 
 def create_teacher_topic(db: Session, topic: schemas.TopicCreate, teacher_id: int):
     """Создает новую тему для преподавателя."""
     db_topic = models.Topic(**topic.dict(), teacher_id=teacher_id)
     db.add(db_topic)
+    # flush присваивает теме идентификатор для события
+    db.flush()
+    fulltext.index_topic(db, db_topic)
+    report_snapshot.refresh(db, [db_topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.CREATED, db_topic.id, teacher_id)
     db.commit()
     db.refresh(db_topic)
     return db_topic
@@ -51,14 +206,47 @@ def create_teacher_topic(db: Session, topic: schemas.TopicCreate, teacher_id: in
 def assign_topic_to_student(db: Session, topic: models.Topic, student_profile_id: int):
     """Назначает тему студенту, обновляя поле student_id."""
     topic.student_id = student_profile_id
+    report_snapshot.refresh(db, [topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.ASSIGNED, topic.id, topic.teacher_id)
     db.commit()
     db.refresh(topic)
     return topic
 
+def try_assign_topic(db: Session, topic_id: int, student_profile_id: int) -> str:
+    """
+    Атомарно назначает свободную тему студенту одним условным UPDATE (compare-and-set).
+
+    Тема закрепляется, только если её student_id в момент записи пуст, поэтому два
+    студента не могут занять одну тему. Если у студента уже есть тема, запись
+    отклоняет уникальный индекс по student_id. Возвращает ASSIGNED, TOPIC_TAKEN
+    (тема занята или не существует) или ALREADY_ASSIGNED.
+    """
+    try:
+        # RETURNING отдает преподавателя темы для события без отдельного SELECT
+        assigned = db.execute(
+            update(models.Topic)
+            .where(models.Topic.id == topic_id, models.Topic.student_id.is_(None))
+            .values(student_id=student_profile_id)
+            .returning(models.Topic.teacher_id)
+        ).first()
+        if assigned is not None:
+            report_snapshot.refresh(db, [topic_id])
+            bump_data_version(db, TOPICS_VERSION)
+            events.publish(db, events.ASSIGNED, topic_id, assigned.teacher_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return ALREADY_ASSIGNED
+    return ASSIGNED if assigned is not None else TOPIC_TAKEN
+
 def unassign_topic_from_student(db: Session, topic: models.Topic):
     """Снимает назначение темы со студента и сбрасывает статус утверждения."""
     topic.student_id = None
     topic.is_approved = False
+    report_snapshot.refresh(db, [topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.FREED, topic.id, topic.teacher_id)
     db.commit()
     db.refresh(topic)
     return topic
@@ -66,6 +254,19 @@ def unassign_topic_from_student(db: Session, topic: models.Topic):
 def approve_topic_assignment(db: Session, topic: models.Topic):
     """Утверждает назначение темы преподавателем."""
     topic.is_approved = True
+    report_snapshot.refresh(db, [topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.APPROVED, topic.id, topic.teacher_id)
+    db.commit()
+    db.refresh(topic)
+    return topic
+
+def unapprove_topic_assignment(db: Session, topic: models.Topic):
+    """Снимает утверждение темы, оставляя студента закрепленным за ней."""
+    topic.is_approved = False
+    report_snapshot.refresh(db, [topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.UNAPPROVED, topic.id, topic.teacher_id)
     db.commit()
     db.refresh(topic)
     return topic
@@ -74,15 +275,141 @@ def reject_topic_assignment(db: Session, topic: models.Topic):
     """Отклоняет назначение темы, сбрасывая студента и статус утверждения."""
     topic.student_id = None
     topic.is_approved = False
+    report_snapshot.refresh(db, [topic.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.FREED, topic.id, topic.teacher_id)
     db.commit()
     db.refresh(topic)
     return topic
 
+# --- CRUD операции для списков предпочтений и распределения тем ---
+def is_work_type_compatible(topic_work_type: str, work_type: str) -> bool:
+    """Проверяет, что тему типа topic_work_type можно взять как работу типа work_type."""
+    return topic_work_type == work_type or topic_work_type == BOTH_WORK_TYPES
+
+def is_preferences_mode(db: Session) -> bool:
+    """Проверяет, что темы выбираются по спискам предпочтений, а не в порядке очереди."""
+    return get_setting_value(db, SELECTION_MODE_SETTING) == PREFERENCES_MODE
+
+def get_student_preferences(db: Session, student_profile_id: int) -> List[models.TopicPreference]:
+    """Возвращает список предпочтений студента в порядке мест вместе с темами и преподавателями."""
+    return db.query(models.TopicPreference).options(
+        joinedload(models.TopicPreference.topic).joinedload(models.Topic.teacher)
+    ).filter(models.TopicPreference.student_id == student_profile_id).order_by(models.TopicPreference.rank).all()
+
+def set_student_preferences(db: Session, student_profile_id: int, topic_ids: List[int], work_type: Optional[str]):
+    """Заменяет список предпочтений студента темами topic_ids (в порядке убывания желания)."""
+    db.execute(delete(models.TopicPreference).where(models.TopicPreference.student_id == student_profile_id))
+    if topic_ids:
+        db.execute(insert(models.TopicPreference), [
+            {"student_id": student_profile_id, "topic_id": topic_id, "rank": rank, "work_type": work_type}
+            for rank, topic_id in enumerate(topic_ids)
+        ])
+    bump_data_version(db, PREFERENCES_VERSION)
+    db.commit()
+
+def get_free_topic_rows(db: Session) -> List[Tuple[int, int, str]]:
+    """Возвращает (id, teacher_id, work_type) всех свободных тем."""
+    query = select(models.Topic.id, models.Topic.teacher_id, models.Topic.work_type).where(
+        models.Topic.student_id.is_(None)
+    ).order_by(models.Topic.id)
+    return [tuple(row) for row in db.execute(query)]
+
+def get_teacher_loads(db: Session) -> Dict[int, int]:
+    """Возвращает число уже закрепленных за каждым преподавателем студентов."""
+    query = select(models.Topic.teacher_id, func.count()).where(
+        models.Topic.student_id.is_not(None)
+    ).group_by(models.Topic.teacher_id)
+    return {teacher_id: count for teacher_id, count in db.execute(query)}
+
+def get_pending_preference_rows(db: Session) -> List[Tuple[int, int, str]]:
+    """
+    Возвращает (student_id, topic_id, work_type) из списков предпочтений студентов без темы.
+
+    Строки упорядочены по студенту и месту в списке.
+    """
+    assigned = select(models.Topic.student_id).where(models.Topic.student_id.is_not(None))
+    query = select(
+        models.TopicPreference.student_id, models.TopicPreference.topic_id, models.TopicPreference.work_type
+    ).where(models.TopicPreference.student_id.not_in(assigned)).order_by(
+        models.TopicPreference.student_id, models.TopicPreference.rank
+    )
+    return [tuple(row) for row in db.execute(query)]
+
+def apply_topic_allocation(db: Session, assignments: List[Tuple[int, int, int]]) -> int:
+    """
+    Закрепляет темы за студентами по результату распределения одной транзакцией.
+
+    Каждый элемент assignments — (topic_id, student_id, teacher_id). Каждое назначение
+    записывается условным UPDATE ... RETURNING id: тема закрепляется, только если она
+    все еще свободна. Если хотя бы одна тема успела измениться после расчета (ее id не
+    вернулся), транзакция откатывается целиком и выбрасывается ValueError. Rowcount
+    executemany для этого не годится: не все драйверы суммируют его по строкам.
+    """
+    if not assignments:
+        return 0
+    topics = models.Topic.__table__
+    statement = update(topics).where(
+        topics.c.id == bindparam("b_topic_id"), topics.c.student_id.is_(None)
+    ).values(student_id=bindparam("b_student_id")).returning(topics.c.id)
+    try:
+        updated = [
+            db.execute(statement, {"b_topic_id": topic_id, "b_student_id": student_id}).scalar()
+            for topic_id, student_id, _ in assignments
+        ]
+        if updated != [topic_id for topic_id, _, _ in assignments]:
+            raise ValueError("Темы изменились во время распределения, запустите его повторно.")
+        report_snapshot.refresh(db, [topic_id for topic_id, _, _ in assignments])
+        bump_data_version(db, TOPICS_VERSION)
+        for topic_id, _, teacher_id in assignments:
+            events.publish(db, events.ASSIGNED, topic_id, teacher_id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError("Студент получил тему во время распределения, запустите его повторно.")
+    except ValueError:
+        db.rollback()
+        raise
+    return len(assignments)
+
 # --- CRUD операции для системных настроек и дедлайнов ---
 def get_setting(db: Session, name: str):
     """Возвращает системную настройку по её имени."""
     return db.query(models.SystemSettings).filter(models.SystemSettings.setting_name == name).first()
 
+def get_setting_value(db: Session, name: str):
+    """Возвращает значение системной настройки из кэша процесса (None, если настройка не задана)."""
+    return settings_cache.get(db, name)
+
+# Диалекты с INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+def bump_data_version(db: Session, name: str):
+    """
+    Увеличивает версию набора данных name в текущей транзакции (без commit).
+
+    Используется INSERT ... ON CONFLICT DO UPDATE: при первом изменении набора
+    две параллельные транзакции не могут обе вставить строку версии.
+    """
+    versions = models.DataVersion.__table__
+    upsert_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if upsert_insert is not None:
+        db.execute(upsert_insert(versions).values(name=name, version=1).on_conflict_do_update(
+            index_elements=[versions.c.name], set_={"version": versions.c.version + 1}
+        ))
+        return
+    result = db.execute(update(versions).where(versions.c.name == name).values(version=versions.c.version + 1))
+    if result.rowcount == 0:
+        db.execute(insert(versions).values(name=name, version=1))
+
+def get_data_versions(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Возвращает текущие версии наборов данных одним запросом (0 для еще не изменявшихся)."""
+    names = list(names)
+    rows = db.execute(select(models.DataVersion.name, models.DataVersion.version).where(models.DataVersion.name.in_(names)))
+    versions = dict.fromkeys(names, 0)
+    versions.update(rows.all())
+    return versions
+
 def set_setting(db: Session, name: str, value: str):
     """Устанавливает или обновляет значение системной настройки."""
     setting = get_setting(db, name)
@@ -90,28 +417,97 @@ def set_setting(db: Session, name: str, value: str):
         setting.setting_value = value
     else:
         db.add(models.SystemSettings(setting_name=name, setting_value=value))
+    # Новая версия настроек сообщает кэшам других процессов, что их значения устарели
+    bump_data_version(db, settings_cache.VERSION_NAME)
     db.commit()
+    settings_cache.invalidate()
     return setting
 
-def is_vkr_deadline_passed(db: Session, topic: models.Topic) -> bool:
-    """Проверяет, истек ли дедлайн для редактирования ВКР."""
-    if topic.work_type != 'vkr':
-        return False
-    setting = get_setting(db, name="vkr_edit_deadline")
-    if setting and setting.setting_value:
+def is_deadline_value_passed(value: Optional[str]) -> bool:
+    """Проверяет, что дата дедлайна в формате ISO уже прошла."""
+    if value:
         try:
-            return date.today() > date.fromisoformat(setting.setting_value)
+            return date.today() > date.fromisoformat(value)
         except (ValueError, TypeError):
             return False
     return False
 
+def is_vkr_deadline_passed(db: Session, topic: models.Topic) -> bool:
+    """Проверяет, истек ли дедлайн для редактирования ВКР."""
+    if topic.work_type != 'vkr':
+        return False
+    return is_deadline_value_passed(get_setting_value(db, "vkr_edit_deadline"))
+
+# --- CRUD операции для фоновых задач ---
+def create_job(db: Session, kind: str, created_by: int, owner: str):
+    """Создает запись о фоновой задаче в состоянии queued."""
+    db_job = models.Job(kind=kind, status="queued", created_by=created_by, owner=owner)
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_job(db: Session, job_id: int):
+    """Возвращает фоновую задачу по её идентификатору."""
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+def update_job(db: Session, job_id: int, **fields):
+    """Обновляет поля фоновой задачи одним UPDATE без загрузки объекта."""
+    if fields.get("status") in ("done", "failed"):
+        fields.setdefault("finished_at", datetime.utcnow())
+    db.execute(update(models.Job).where(models.Job.id == job_id).values(**fields))
+    db.commit()
+
+def get_jobs_with_artifacts_finished_before(db: Session, finished_before: datetime):
+    """Возвращает завершенные до finished_before задачи, у которых сохранен файл-результат."""
+    return db.query(models.Job).filter(
+        models.Job.artifact_path.isnot(None), models.Job.finished_at < finished_before
+    ).all()
+
+def get_unfinished_jobs(db: Session):
+    """Возвращает задачи, которые еще не завершены (queued или running)."""
+    return db.query(models.Job).filter(models.Job.status.in_(("queued", "running"))).all()
+
 def change_user_password(db: Session, user: models.User, new_hashed_password: str):
     """Обновляет хэшированный пароль для указанного пользователя."""
     user.hashed_password = new_hashed_password
     db.add(user)
     db.commit()
+    principal_cache.invalidate(user.username)
     return True
 
+def get_password_reset_targets(db: Session, role: str, group: Optional[str] = None,
+                               user_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, str, str]]:
+    """
+    Возвращает (id, username, full_name) пользователей с ролью role для смены паролей.
+
+    Выборку можно ограничить учебной группой (только для студентов) и/или списком
+    идентификаторов. Объекты ORM не создаются: для смены пароля нужны только эти поля.
+    """
+    query = select(models.User.id, models.User.username, models.User.full_name).where(models.User.role == role)
+    if group is not None:
+        query = query.join(models.Student, models.Student.user_id == models.User.id).where(models.Student.group == group)
+    if user_ids is not None:
+        query = query.where(models.User.id.in_(list(user_ids)))
+    return [tuple(row) for row in db.execute(query.order_by(models.User.id))]
+
+def bulk_update_passwords(db: Session, rows: List[Dict]) -> int:
+    """
+    Заменяет хэши паролей пользователей одним executemany в одной транзакции.
+
+    Каждый элемент rows содержит id, username и hashed_password. Вместо отдельного
+    UPDATE и commit на пользователя выполняется один пакетный UPDATE по первичному ключу
+    и одна фиксация. Возвращает количество обновленных пользователей.
+    """
+    if not rows:
+        return 0
+    db.execute(update(models.User), [{"id": row["id"], "hashed_password": row["hashed_password"]} for row in rows])
+    db.commit()
+    # Кэш проверок входа привязан к хэшу пароля и устаревает сам, кэш пользователей по токену нужно сбросить
+    for row in rows:
+        principal_cache.invalidate(row["username"])
+    return len(rows)
+
 def update_topic(db: Session, topic_to_update: models.Topic, topic_data: schemas.TopicUpdate):
     """Обновляет данные темы на основе переданной Pydantic-схемы."""
     # Получаем данные из схемы, игнорируя неустановленные поля
@@ -120,6 +516,11 @@ def update_topic(db: Session, topic_to_update: models.Topic, topic_data: schemas
     for key, value in update_data.items():
         setattr(topic_to_update, key, value)
     db.add(topic_to_update)
+    if "title" in update_data or "description" in update_data:
+        fulltext.index_topic(db, topic_to_update)
+    report_snapshot.refresh(db, [topic_to_update.id])
+    bump_data_version(db, TOPICS_VERSION)
+    events.publish(db, events.EDITED, topic_to_update.id, topic_to_update.teacher_id)
     db.commit()
     db.refresh(topic_to_update)
     return topic_to_update
@@ -1,21 +1,164 @@
 # app/database.py
-from sqlalchemy import create_engine
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-# URL базы данных SQLite, указывающий на файл coursework.db в корне проекта
-SQLALCHEMY_DATABASE_URL = "sqlite:///./coursework.db"
+from .config import settings
 
-# Создаем движок SQLAlchemy для взаимодействия с базой данных
+# URL базы данных; по умолчанию SQLite-файл coursework.db в корне проекта
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+# База SQLite в памяти (sqlite://, sqlite:///:memory:) существует только внутри одного соединения
+IS_MEMORY_SQLITE = IS_SQLITE and make_url(SQLALCHEMY_DATABASE_URL).database in (None, "", ":memory:")
+
+def _async_url(url: str) -> str:
+    """Преобразует URL синхронного драйвера в URL асинхронного драйвера того же диалекта."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith(("postgresql:", "postgresql+psycopg2:")):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+def configure_sqlite(engine: Engine) -> None:
+    """
+    Включает производственный профиль SQLite для всех новых соединений движка.
+
+    WAL позволяет читателям работать параллельно с писателем, busy_timeout заставляет
+    писателей ждать блокировку вместо немедленной ошибки "database is locked",
+    а кэш страниц и mmap сокращают число системных вызовов при чтении.
+    """
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+def begin_immediate(engine: Engine) -> None:
+    """
+    Открывает транзакции движка командой BEGIN IMMEDIATE.
+
+    Блокировка записи берется в начале транзакции, а не при первом UPDATE, поэтому
+    писатель не может попасть во взаимоблокировку при повышении уровня блокировки,
+    которую SQLite сразу завершает ошибкой без ожидания busy_timeout.
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        # Отключаем неявный BEGIN драйвера pysqlite, чтобы управлять транзакцией самим
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+class WriteQueue:
+    """
+    Очередь записи: выполняет функции записи по одной в выделенном потоке.
+
+    Писатели процесса не конкурируют друг с другом за блокировку SQLite, а выстраиваются
+    в очередь, поэтому пропускная способность при всплесках записи не падает из-за
+    повторных ожиданий busy_timeout.
+    """
+
+    def __init__(self, session_factory: Callable):
+        self._session_factory = session_factory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._writer = threading.local()
+
+    def in_writer(self) -> bool:
+        """Проверяет, выполняется ли текущий код в потоке записи."""
+        return getattr(self._writer, "active", False)
+
+    def run(self, func: Callable, *args, **kwargs):
+        """Выполняет func(db, *args, **kwargs) в потоке записи и возвращает её результат."""
+        # Передаем контекст вызывающего потока, чтобы учет запросов (profiling) видел записи очереди
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._call, func, args, kwargs).result()
+
+    def _call(self, func: Callable, args, kwargs):
+        """
+        Создает сессию записи, вызывает функцию и закрывает сессию.
+
+        Объекты моделей из аргументов принадлежат сессии запроса, поэтому перед вызовом
+        они перечитываются в сессии записи по первичному ключу.
+        """
+        db = self._session_factory()
+        self._writer.active = True
+        try:
+            args = [_rebind(db, value) for value in args]
+            kwargs = {name: _rebind(db, value) for name, value in kwargs.items()}
+            return func(db, *args, **kwargs)
+        finally:
+            self._writer.active = False
+            db.close()
+
+def _rebind(db, value):
+    """Возвращает объект модели value, загруженный в сессии db; остальные значения возвращает как есть."""
+    if isinstance(value, Base):
+        return db.get(type(value), inspect(value).identity)
+    return value
+
+# Параметры пула соединений, общие для синхронного и асинхронного движков
+if IS_MEMORY_SQLITE:
+    # Пул по умолчанию для базы в памяти (SingletonThreadPool) не принимает pool_size и max_overflow
+    # и дает каждому потоку свою пустую базу, поэтому все сессии используют одно общее соединение
+    _pool_options = {"poolclass": StaticPool}
+else:
+    _pool_options = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW, "pool_pre_ping": True}
 # connect_args={"check_same_thread": False} отключает проверку потоков для SQLite
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+_connect_args = {"check_same_thread": False} if IS_SQLITE else {}
+
+# Создаем движок SQLAlchemy для взаимодействия с базой данных
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=_connect_args, **_pool_options)
 
 # Создаем фабрику сессий для работы с базой данных
 # autocommit=False и autoflush=False обеспечивают явное управление транзакциями
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для эндпоинтов, объявленных через async def: ожидание базы
+# не занимает поток из пула, поэтому один воркер обслуживает больше одновременных запросов
+async_engine = create_async_engine(_async_url(SQLALCHEMY_DATABASE_URL), **_pool_options)
+
+# Фабрика асинхронных сессий; expire_on_commit=False, чтобы объекты оставались
+# доступными при рендеринге шаблона после завершения транзакции
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Для базы в памяти отдельный движок записи видел бы другую, пустую базу
+if IS_SQLITE and settings.SQLITE_PRODUCTION and not IS_MEMORY_SQLITE:
+    configure_sqlite(engine)
+    configure_sqlite(async_engine.sync_engine)
+    # Отдельный движок с одним соединением для очереди записи
+    writer_engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=_connect_args, pool_size=1, max_overflow=0)
+    configure_sqlite(writer_engine)
+    begin_immediate(writer_engine)
+    write_queue = WriteQueue(sessionmaker(autocommit=False, autoflush=False, bind=writer_engine))
+else:
+    write_queue = None
+
+def run_write(db, func: Callable, *args, **kwargs):
+    """
+    Выполняет функцию записи func(db, *args, **kwargs) через очередь записи процесса.
+
+    Без очереди (не производственный профиль SQLite, другие СУБД) функция вызывается
+    в сессии db вызывающего кода. Вызов из самого потока записи тоже выполняется
+    напрямую: ожидание собственной очереди привело бы к взаимоблокировке.
+    """
+    if write_queue is None or write_queue.in_writer():
+        return func(db, *args, **kwargs)
+    return write_queue.run(func, *args, **kwargs)
+
 # Создаем базовый класс для моделей SQLAlchemy
 # Все модели (например, User, Student, Topic) будут наследоваться от этого класса
 Base = declarative_base()
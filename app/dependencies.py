@@ -1,5 +1,5 @@
 # app/dependencies.py
-from .database import SessionLocal
+from .database import AsyncSessionLocal, SessionLocal
 
 def get_db():
     """Создает сессию базы данных для запроса и закрывает её после завершения."""
@@ -8,3 +8,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """Создает асинхронную сессию базы данных для запроса и закрывает её после завершения."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,197 @@
+# app/events.py
+import asyncio
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import delete, event, func, select
+from sqlalchemy.orm import Session
+
+from . import config, models, schemas
+from .database import AsyncSessionLocal, SessionLocal, run_write
+
+# Типы событий тем
+CREATED = "created"
+EDITED = "edited"
+ASSIGNED = "assigned"
+FREED = "freed"
+APPROVED = "approved"
+UNAPPROVED = "unapproved"
+
+# Ключ в db.info, под которым сессия копит события до фиксации транзакции
+_PENDING_KEY = "pending_topic_events"
+
+class Subscription:
+    """Подписка одного SSE-клиента: ограниченная очередь событий в цикле событий сервера."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[schemas.TopicEvent]" = asyncio.Queue(maxsize=config.settings.EVENTS_QUEUE_SIZE)
+        # Клиент не успевал забирать события и пропустил часть из них
+        self.overflowed = False
+
+    def _put(self, topic_event: schemas.TopicEvent) -> None:
+        """Кладет событие в очередь (выполняется в потоке цикла событий)."""
+        try:
+            self.queue.put_nowait(topic_event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+class Broker:
+    """
+    Локальная рассылка событий подписчикам процесса.
+
+    Публиковать можно из любого потока (пул Starlette, очередь записи, фоновые задачи):
+    событие передается в цикл событий каждого подписчика через call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        """Создает подписку в текущем цикле событий."""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Удаляет подписку."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, topic_events: List[schemas.TopicEvent]) -> None:
+        """Передает события всем подписчикам процесса."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for topic_event in topic_events:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription._put, topic_event)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    self.unsubscribe(subscription)
+                    break
+
+class MemoryBackend:
+    """Шина событий внутри одного процесса: события доставляются сразу после фиксации транзакции."""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self._ids = itertools.count(1)
+
+    def stage(self, db: Session, topic_event: dict) -> None:
+        """Ничего не записывает: событию достаточно номера в памяти процесса."""
+
+    def committed(self, topic_events: List[dict]) -> None:
+        """Нумерует и рассылает события зафиксированной транзакции."""
+        self.broker.deliver([schemas.TopicEvent(id=next(self._ids), **topic_event) for topic_event in topic_events])
+
+    def start(self) -> None:
+        pass
+
+class DatabaseBackend:
+    """
+    Шина событий, общая для всех воркеров, работающих с одной базой.
+
+    Событие записывается в таблицу topic_events в той же транзакции, что и изменение
+    темы, поэтому откат изменения отменяет и событие. Каждый воркер раз в
+    EVENTS_POLL_INTERVAL_SECONDS читает новые строки по возрастанию id и рассылает их
+    своим подписчикам; задержка доставки не превышает интервал опроса. Раз в
+    EVENTS_PRUNE_INTERVAL_SECONDS (и сразу после запуска) воркер удаляет устаревшие
+    записи, чтобы таблица не росла в долгоживущем процессе.
+    """
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self._last_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_prune = 0.0
+
+    def stage(self, db: Session, topic_event: dict) -> None:
+        """Добавляет строку события в текущую транзакцию."""
+        db.add(models.TopicEvent(**topic_event))
+
+    def committed(self, topic_events: List[dict]) -> None:
+        """Доставка выполняется опросом таблицы, в том числе для событий этого же процесса."""
+
+    def start(self) -> None:
+        """Запускает опрос таблицы событий в текущем цикле событий."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def _poll(self) -> None:
+        interval = config.settings.EVENTS_POLL_INTERVAL_SECONDS
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    if self._last_id is None:
+                        # Подписчикам нужны только события, произошедшие после запуска процесса
+                        self._last_id = await db.scalar(select(func.coalesce(func.max(models.TopicEvent.id), 0)))
+                    rows = (await db.scalars(
+                        select(models.TopicEvent).where(models.TopicEvent.id > self._last_id)
+                        .order_by(models.TopicEvent.id).limit(500)
+                    )).all()
+                if rows:
+                    self._last_id = rows[-1].id
+                    self.broker.deliver([
+                        schemas.TopicEvent(id=row.id, kind=row.kind, topic_id=row.topic_id, teacher_id=row.teacher_id)
+                        for row in rows
+                    ])
+                if time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + config.settings.EVENTS_PRUNE_INTERVAL_SECONDS
+                    # Удаление идет через очередь записи, поэтому выполняется в отдельном потоке
+                    await asyncio.to_thread(_prune_in_new_session)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # База временно недоступна или таблица еще не создана: пробуем на следующем шаге
+                pass
+            await asyncio.sleep(interval)
+
+def _create_backend(broker: Broker):
+    """Создает шину событий, выбранную в настройке EVENTS_BACKEND."""
+    if config.settings.EVENTS_BACKEND == "database":
+        return DatabaseBackend(broker)
+    return MemoryBackend(broker)
+
+broker = Broker()
+backend = _create_backend(broker)
+
+def publish(db: Session, kind: str, topic_id: int, teacher_id: Optional[int] = None) -> None:
+    """
+    Регистрирует событие темы в текущей транзакции сессии db.
+
+    Вызывается функциями crud до commit: подписчики получат событие только после
+    успешной фиксации, а при откате оно будет отброшено.
+    """
+    topic_event = {"kind": kind, "topic_id": topic_id, "teacher_id": teacher_id}
+    db.info.setdefault(_PENDING_KEY, []).append(topic_event)
+    backend.stage(db, topic_event)
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    topic_events = session.info.pop(_PENDING_KEY, None)
+    if topic_events:
+        backend.committed(topic_events)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+def prune(db: Session) -> None:
+    """Удаляет из таблицы событий записи старше EVENTS_RETENTION_HOURS."""
+    cutoff = datetime.utcnow() - timedelta(hours=config.settings.EVENTS_RETENTION_HOURS)
+    db.execute(delete(models.TopicEvent).where(models.TopicEvent.created_at < cutoff))
+    db.commit()
+
+def _prune_in_new_session() -> None:
+    """Выполняет prune в собственной сессии (для фонового опроса DatabaseBackend)."""
+    db = SessionLocal()
+    try:
+        run_write(db, prune)
+    finally:
+        db.close()
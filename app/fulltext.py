@@ -0,0 +1,144 @@
+# app/fulltext.py
+import functools
+import re
+from typing import List, Optional
+
+import snowballstemmer
+from sqlalchemy import column, func, literal_column, select, table, text
+from sqlalchemy.orm import Query, Session
+
+from . import models
+
+# Веса колонок FTS5 для ранжирования bm25: совпадение в названии важнее совпадения в описании
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+# Максимальное число слов поискового запроса
+MAX_QUERY_WORDS = 8
+# Количество тем, индексируемых за один INSERT при перестроении индекса
+REBUILD_CHUNK_SIZE = 1000
+
+_WORD_PATTERN = re.compile(r"\w+")
+_CYRILLIC_PATTERN = re.compile(r"[а-я]")
+_russian_stemmer = snowballstemmer.stemmer("russian")
+_english_stemmer = snowballstemmer.stemmer("english")
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _is_sqlite(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+def words(value: Optional[str]) -> List[str]:
+    """Разбивает текст на слова в нижнем регистре (ё приводится к е)."""
+    return _WORD_PATTERN.findall((value or "").lower().replace("ё", "е"))
+
+@functools.lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Возвращает основу слова стеммером Snowball: русским для кириллицы, английским для латиницы."""
+    stemmer = _russian_stemmer if _CYRILLIC_PATTERN.search(word) else _english_stemmer
+    return stemmer.stemWord(word)
+
+def stemmed_text(value: Optional[str]) -> str:
+    """Заменяет слова текста их основами для записи в индекс FTS5."""
+    return " ".join(stem(word) for word in words(value))
+
+def _fts_query(search: str) -> Optional[str]:
+    """
+    Строит запрос FTS5: все основы слов должны встретиться в теме.
+
+    Каждая основа ищется как префикс, поэтому недописанное последнее слово тоже находит тему.
+    """
+    stems = [stem(word) for word in words(search)[:MAX_QUERY_WORDS]]
+    return " ".join(f'"{value}"*' for value in stems) or None
+
+def _tsquery(search: str) -> Optional[str]:
+    """Строит запрос to_tsquery для PostgreSQL: слова через И, каждое как префикс."""
+    return " & ".join(f"{word}:*" for word in words(search)[:MAX_QUERY_WORDS]) or None
+
+def index_topic(db: Session, topic: models.Topic) -> None:
+    """
+    Обновляет запись темы в полнотекстовом индексе в текущей транзакции (без commit).
+
+    В PostgreSQL индекс строится по выражению над колонками темы и обновляется самой
+    базой, поэтому функция ничего не делает.
+    """
+    if not _is_sqlite(db):
+        return
+    db.execute(text(f"DELETE FROM {models.TOPIC_SEARCH_TABLE} WHERE rowid = :id"), {"id": topic.id})
+    db.execute(
+        text(f"INSERT INTO {models.TOPIC_SEARCH_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"),
+        {"id": topic.id, "title": stemmed_text(topic.title), "description": stemmed_text(topic.description)}
+    )
+
+def rebuild_index(db: Session) -> int:
+    """Заново заполняет индекс FTS5 всеми темами. Возвращает количество проиндексированных тем."""
+    db.execute(text(f"DELETE FROM {models.TOPIC_SEARCH_TABLE}"))
+    statement = text(
+        f"INSERT INTO {models.TOPIC_SEARCH_TABLE} (rowid, title, description) VALUES (:id, :title, :description)"
+    )
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(models.Topic.id, models.Topic.title, models.Topic.description)
+            .where(models.Topic.id > last_id).order_by(models.Topic.id).limit(REBUILD_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        db.execute(statement, [
+            {"id": topic_id, "title": stemmed_text(title), "description": stemmed_text(description)}
+            for topic_id, title, description in rows
+        ])
+        count += len(rows)
+        last_id = rows[-1].id
+    db.commit()
+    return count
+
+def ensure_index(db: Session) -> None:
+    """
+    Создает полнотекстовый индекс в базе, созданной до его появления.
+
+    Для SQLite индекс FTS5 перестраивается, если число записей в нем расходится
+    с числом тем (например, темы добавлялись в обход crud).
+    """
+    if _is_postgresql(db):
+        index = next(index for index in models.Topic.__table__.indexes if index.name == "ix_topics_search")
+        index.create(bind=db.connection(), checkfirst=True)
+        db.commit()
+        return
+    if not _is_sqlite(db):
+        return
+    db.execute(text(models.TOPIC_SEARCH_DDL))
+    indexed = db.execute(text(f"SELECT count(*) FROM {models.TOPIC_SEARCH_TABLE}")).scalar()
+    if indexed != db.execute(select(func.count(models.Topic.id))).scalar():
+        rebuild_index(db)
+    else:
+        db.commit()
+
+def apply_search(db: Session, query: Query, search: str) -> Query:
+    """
+    Ограничивает запрос тем совпадениями с поисковой строкой и упорядочивает по релевантности.
+
+    SQLite ищет основы слов в индексе FTS5 и ранжирует по bm25, PostgreSQL — по GIN-индексу
+    tsvector с ранжированием ts_rank_cd. В остальных базах используется поиск подстроки
+    в названии. Темы с одинаковой релевантностью упорядочиваются по id.
+    """
+    if _is_sqlite(db):
+        fts_query = _fts_query(search)
+        if fts_query is None:
+            return query.order_by(models.Topic.id)
+        name = models.TOPIC_SEARCH_TABLE
+        search_table = table(name, column("rowid"))
+        return query.join(search_table, search_table.c.rowid == models.Topic.id).filter(
+            text(f"{name} MATCH :fts_query").bindparams(fts_query=fts_query)
+        ).order_by(literal_column(f"bm25({name}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT})"), models.Topic.id)
+    if _is_postgresql(db):
+        tsquery = _tsquery(search)
+        if tsquery is None:
+            return query.order_by(models.Topic.id)
+        vector = models.topic_search_vector(models.Topic.title, models.Topic.description)
+        condition = func.to_tsquery(models.RUSSIAN_SEARCH_CONFIG, tsquery)
+        return query.filter(vector.op("@@")(condition)).order_by(
+            func.ts_rank_cd(vector, condition).desc(), models.Topic.id
+        )
+    return query.filter(models.Topic.title.ilike(f"%{search}%")).order_by(models.Topic.id)
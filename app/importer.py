@@ -0,0 +1,237 @@
+# app/importer.py
+import time
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy.orm import Session
+
+from . import auth, crud, schemas, tabular
+from .database import run_write
+
+# Модуль зависит от pandas и openpyxl, поэтому подключается только задачами импорта
+# (см. app/tasks.py), а не при запуске воркера приложения
+
+# Обязательные колонки файлов импорта для каждой роли
+REQUIRED_COLUMNS = {
+    'student': {'full_name', 'email', 'group'},
+    'teacher': {'full_name', 'email', 'position'},
+}
+# Необязательные колонки профиля для каждой роли
+OPTIONAL_COLUMNS = {
+    'student': ('profile',),
+    'teacher': ('degree', 'title'),
+}
+
+def _check_columns(columns: Iterable, role: str) -> None:
+    """Проверяет, что в заголовке файла есть все обязательные колонки."""
+    if not REQUIRED_COLUMNS[role].issubset(columns):
+        raise ValueError("Отсутствуют колонки")
+
+def count_upload_rows(path: str, filename: str) -> int:
+    """
+    Возвращает число строк данных в файле для отчета о прогрессе (0, если неизвестно).
+
+    Для CSV считаются переводы строк поблочно, без разбора файла; для Excel берется
+    размер листа из его заголовка.
+    """
+    if filename.endswith('.xlsx'):
+        workbook = load_workbook(path, read_only=True)
+        try:
+            max_row = workbook.active.max_row
+        finally:
+            workbook.close()
+        return max(max_row - 1, 0) if max_row else 0
+    with open(path, 'rb') as upload:
+        lines = sum(block.count(b"\n") for block in iter(lambda: upload.read(1 << 20), b""))
+    return max(lines - 1, 0)
+
+def iter_upload(path: str, filename: str, role: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Читает сохраненный CSV/Excel файл пачками по chunk_size строк.
+
+    Читаются только колонки, нужные для импорта, поэтому объем памяти ограничен размером
+    пачки, а не размером файла. Индекс каждой пачки продолжает нумерацию строк файла.
+    """
+    columns = REQUIRED_COLUMNS[role] | set(OPTIONAL_COLUMNS[role])
+    if filename.endswith('.xlsx'):
+        yield from _iter_xlsx(path, role, columns, chunk_size)
+        return
+    _check_columns(pd.read_csv(path, nrows=0).columns, role)
+    # Все колонки читаются как строки: вывод типов по отдельным пачкам давал бы разные результаты
+    yield from pd.read_csv(path, usecols=lambda column: column in columns, dtype=str, chunksize=chunk_size)
+
+def _iter_xlsx(path: str, role: str, columns: Set[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Читает первый лист Excel-файла построчно в режиме read-only и собирает строки в пачки."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        _check_columns(header, role)
+        positions = {name: index for index, name in enumerate(header) if name in columns}
+        batch: List[tuple] = []
+        start = 0
+        for row in rows:
+            batch.append(tuple(row[index] if index < len(row) else None for index in positions.values()))
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=list(positions), index=range(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=list(positions), index=range(start, start + len(batch)))
+    finally:
+        workbook.close()
+
+# Допустимый формат email: одна @, непустые части без пробелов и точка в домене
+EMAIL_PATTERN = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+
+# Причины отклонения строк в порядке проверки: строке назначается первая подходящая
+INVALID_REASONS = {
+    'missing_full_name': "Не указано ФИО",
+    'missing_email': "Не указан email",
+    'invalid_email': "Некорректный email",
+    'missing_group': "Не указана группа",
+    'missing_position': "Не указана должность",
+}
+DUPLICATE_REASONS = {
+    'duplicate_in_file': "Email повторяется в файле",
+    'already_exists': "Пользователь с таким email уже существует",
+}
+
+# Граница, до которой целое число из ячейки безопасно приводится к int64
+INT64_BOUND = 2.0 ** 63
+
+def _normalize_text(series: pd.Series) -> pd.Series:
+    """
+    Приводит колонку к строкам без лишних пробелов; пустые ячейки и строки — к NA.
+
+    Целые числа, прочитанные Excel как float (например, номер группы 101.0),
+    записываются без дробной части.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        numeric = series.notna()
+    elif pd.api.types.is_object_dtype(series):
+        # .str дает NA для нестроковых значений, поэтому числа отбираются без обхода колонки в Python
+        numeric = series.notna() & series.str.len().isna()
+    else:
+        numeric = pd.Series(False, index=series.index)
+    numbers = pd.to_numeric(series.where(numeric), errors="coerce")
+    # Числа вне диапазона int64 (длинные коды, случайно попавшие в ячейку) остаются как есть
+    whole = numbers.notna() & (numbers % 1 == 0) & (numbers.abs() < INT64_BOUND)
+    text = series.astype("string")
+    text[whole] = numbers[whole].astype("int64").astype("string")
+    text = text.str.strip().str.replace(r"\s+", " ", regex=True)
+    return text.mask(text == "")
+
+def normalize(df: pd.DataFrame, role: str) -> pd.DataFrame:
+    """Возвращает колонки файла, нужные для импорта, в нормализованном виде (email — в нижнем регистре)."""
+    columns = sorted(REQUIRED_COLUMNS[role]) + list(OPTIONAL_COLUMNS[role])
+    normalized = pd.DataFrame(index=df.index)
+    for column in columns:
+        normalized[column] = _normalize_text(df[column]) if column in df.columns else pd.Series(pd.NA, index=df.index, dtype="string")
+    normalized['email'] = normalized['email'].str.lower()
+    return normalized
+
+def validate_users(
+    db: Session, df: pd.DataFrame, role: str, seen: Optional[Set[str]] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Проверяет строки файла импорта целыми колонками, до любой записи в базу.
+
+    Возвращает нормализованные строки, пригодные для импорта, и таблицу отклоненных строк
+    с номером строки в файле, email, ФИО и причиной. Повторы email внутри файла и уже
+    существующие пользователи находятся операциями над множествами, база запрашивается
+    одним набором запросов IN на всю пачку. seen — email, принятые из предыдущих пачек
+    того же файла; множество дополняется email принятых строк.
+    """
+    rows = normalize(df, role)
+    email = rows['email']
+    profile_field = 'group' if role == 'student' else 'position'
+    has_email = email.notna()
+    valid_email = has_email & email.str.fullmatch(EMAIL_PATTERN).fillna(False).astype(bool)
+    # Повтором считаем все вхождения email, кроме первого корректного
+    duplicate = valid_email & email.duplicated(keep='first')
+    if seen:
+        duplicate |= valid_email & email.isin(seen)
+    existing = crud.get_existing_usernames(db, email[valid_email & ~duplicate].unique())
+    checks = [
+        ('missing_full_name', rows['full_name'].isna()),
+        ('missing_email', ~has_email),
+        ('invalid_email', has_email & ~valid_email),
+        (f'missing_{profile_field}', rows[profile_field].isna()),
+        ('duplicate_in_file', duplicate),
+        ('already_exists', email.isin(existing)),
+    ]
+    reason = pd.Series(np.select([mask.to_numpy() for _, mask in checks], [code for code, _ in checks], default=""),
+                       index=rows.index)
+    rejected_mask = reason != ""
+    rejected = pd.DataFrame({
+        # Номер строки как в табличном редакторе: первая строка файла — заголовок
+        "Строка": rows.index[rejected_mask] + 2,
+        "Email": email[rejected_mask].fillna(""),
+        "ФИО": rows['full_name'][rejected_mask].fillna(""),
+        "Код причины": reason[rejected_mask],
+        "Причина": reason[rejected_mask].map({**INVALID_REASONS, **DUPLICATE_REASONS}),
+    })
+    if seen is not None:
+        seen.update(email[~rejected_mask])
+    return rows[~rejected_mask], rejected
+
+def write_rejected_rows(rejected: pd.DataFrame, output) -> None:
+    """Записывает отчет об отклоненных строках импорта в Excel-файл."""
+    # NA заменяется на None, чтобы ячейка осталась пустой
+    values = rejected.astype(object).where(rejected.notna(), None)
+    tabular.write_xlsx(values.itertuples(index=False), output, sheet_name='Отклоненные строки',
+                       headers=list(rejected.columns))
+
+def import_users(db: Session, chunks: Iterable[pd.DataFrame], role: str, total: int = 0,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 on_rejected: Optional[Callable[[pd.DataFrame], None]] = None) -> schemas.ImportSummary:
+    """
+    Импортирует пользователей с ролью role из последовательности пачек строк файла.
+
+    Каждая пачка проходит проверку validate_users, получает хэши паролей и вставляется
+    отдельной транзакцией: длинная транзакция на весь файл удерживала бы блокировку
+    записи SQLite на всё время хэширования. Повторный запуск прерванного импорта
+    безопасен — уже созданные пользователи будут пропущены как существующие.
+    Отклоненные строки всех пачек передаются в on_rejected одной таблицей. Если передан
+    progress, он вызывается после каждой пачки с числом обработанных строк и total.
+    """
+    summary = schemas.ImportSummary()
+    seen: Set[str] = set()
+    rejected_parts: List[pd.DataFrame] = []
+    processed = 0
+    started = time.perf_counter()
+    hashing_seconds = 0.0
+    profile_columns = list(OPTIONAL_COLUMNS[role]) + ['group' if role == 'student' else 'position']
+    for chunk in chunks:
+        valid, rejected = validate_users(db, chunk, role, seen=seen)
+        if len(rejected):
+            rejected_parts.append(rejected)
+        # NA заменяется на None, чтобы в базу попадал NULL
+        records = valid.astype(object).where(valid.notna(), None).to_dict('records')
+        # bcrypt — самая дорогая часть импорта, поэтому хэши пачки считаются параллельно
+        hashing_started = time.perf_counter()
+        hashes, _ = auth.hash_passwords([auth.generate_random_password() for _ in records])
+        hashing_seconds += time.perf_counter() - hashing_started
+        new_rows = [
+            {"username": record['email'], "full_name": record['full_name'], "hashed_password": hashed_password,
+             "profile": {column: record[column] for column in profile_columns}}
+            for record, hashed_password in zip(records, hashes)
+        ]
+        summary.created += run_write(db, crud.bulk_create_users_with_profiles, role=role, rows=new_rows)
+        processed += len(chunk)
+        if progress:
+            progress(processed, max(total, processed))
+
+    rejected = pd.concat(rejected_parts) if rejected_parts else pd.DataFrame()
+    if len(rejected):
+        reasons = rejected["Код причины"].value_counts()
+        summary.invalid = int(reasons.reindex(list(INVALID_REASONS), fill_value=0).sum())
+        summary.skipped = int(reasons.reindex(list(DUPLICATE_REASONS), fill_value=0).sum())
+        summary.rejected_reasons = {code: int(count) for code, count in reasons.items()}
+        if on_rejected:
+            on_rejected(rejected)
+    summary.hashes_per_second = summary.created / hashing_seconds if hashing_seconds > 0 else 0.0
+    return summary
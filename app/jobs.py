@@ -0,0 +1,143 @@
+# app/jobs.py
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import config, crud, models
+from .database import SessionLocal, run_write
+
+# Идентификатор текущего процесса, записывается в задачи, которые он выполняет
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Реестр обработчиков фоновых задач: тип задачи -> функция
+TASKS: Dict[str, Callable] = {}
+# Типы задач, результат которых содержит пароли в открытом виде: файл удаляется после первого скачивания
+ONE_TIME_ARTIFACT_KINDS: Set[str] = set()
+
+# Локальный пул воркеров, выполняющих задачи вне потока HTTP-запроса
+_executor = ThreadPoolExecutor(max_workers=config.settings.JOB_WORKERS, thread_name_prefix="job")
+
+class JobContext:
+    """Контекст выполняемой задачи: путь для результата и отчет о прогрессе."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.artifact_path: Optional[str] = None
+        self.artifact_name: Optional[str] = None
+
+    def artifact(self, name: str) -> str:
+        """Регистрирует файл-результат задачи и возвращает путь, по которому его нужно записать."""
+        os.makedirs(config.settings.JOBS_DIR, exist_ok=True)
+        self.artifact_name = name
+        self.artifact_path = os.path.join(config.settings.JOBS_DIR, f"job_{self.job_id}_{name}")
+        return self.artifact_path
+
+    def progress(self, done: int, total: int) -> None:
+        """Сохраняет прогресс задачи отдельной короткой транзакцией."""
+        db = SessionLocal()
+        try:
+            run_write(db, crud.update_job, self.job_id, progress=done, total=total)
+        except OperationalError:
+            # Прогресс носит справочный характер: если база занята записью самой задачи, пропускаем обновление
+            db.rollback()
+        finally:
+            db.close()
+
+def task(kind: str, one_time_artifact: bool = False):
+    """
+    Декоратор, регистрирующий функцию как обработчик задач типа kind.
+
+    one_time_artifact=True означает, что файл-результат удаляется после первого скачивания.
+    """
+    def register(func: Callable) -> Callable:
+        TASKS[kind] = func
+        if one_time_artifact:
+            ONE_TIME_ARTIFACT_KINDS.add(kind)
+        return func
+    return register
+
+def enqueue(db: Session, kind: str, created_by: int, **params) -> models.Job:
+    """Ставит задачу в очередь локального пула и возвращает её запись."""
+    if kind not in TASKS:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    job = run_write(db, crud.create_job, kind=kind, created_by=created_by, owner=OWNER)
+    _executor.submit(_run, job.id, kind, params)
+    return job
+
+def _run(job_id: int, kind: str, params: Dict) -> None:
+    """Выполняет задачу в потоке пула, сохраняя её состояние и результат."""
+    db = SessionLocal()
+    context = JobContext(job_id)
+    try:
+        run_write(db, crud.update_job, job_id, status="running")
+        message = TASKS[kind](db, context, **params)
+        run_write(db, crud.update_job, job_id, status="done", message=message,
+                        artifact_path=context.artifact_path, artifact_name=context.artifact_name)
+    except Exception:
+        db.rollback()
+        run_write(db, crud.update_job, job_id, status="failed", message=traceback.format_exc(limit=5))
+    finally:
+        db.close()
+
+def fail_orphaned_jobs(db: Session) -> None:
+    """Помечает как failed незавершенные задачи, процесс-владелец которых на этом хосте уже не работает."""
+    hostname = socket.gethostname()
+    for job in crud.get_unfinished_jobs(db):
+        host, _, pid = (job.owner or "").rpartition(":")
+        if host != hostname or not pid.isdigit() or _process_alive(int(pid)):
+            continue
+        crud.update_job(db, job.id, status="failed", message="Задача прервана перезапуском сервера.")
+
+def discard_artifact(job_id: int, path: str) -> None:
+    """Удаляет файл-результат задачи и отмечает в задаче, что результата больше нет."""
+    _remove_file(path)
+    db = SessionLocal()
+    try:
+        run_write(db, crud.update_job, job_id, artifact_path=None)
+    finally:
+        db.close()
+
+def sweep_expired_files(db: Session) -> int:
+    """
+    Удаляет файлы каталога задач старше JOB_ARTIFACT_TTL_HOURS и возвращает их число.
+
+    Вместе с результатами задач удаляются загрузки, оставшиеся от прерванных импортов;
+    у задач с удаленными результатами путь к файлу очищается.
+    """
+    ttl = timedelta(hours=config.settings.JOB_ARTIFACT_TTL_HOURS)
+    for job in crud.get_jobs_with_artifacts_finished_before(db, datetime.utcnow() - ttl):
+        _remove_file(job.artifact_path)
+        crud.update_job(db, job.id, artifact_path=None)
+    if not os.path.isdir(config.settings.JOBS_DIR):
+        return 0
+    removed = 0
+    cutoff = time.time() - ttl.total_seconds()
+    for entry in os.scandir(config.settings.JOBS_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            _remove_file(entry.path)
+            removed += 1
+    return removed
+
+def _remove_file(path: str) -> None:
+    """Удаляет файл, если он еще существует."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _process_alive(pid: int) -> bool:
+    """Проверяет, существует ли процесс с указанным pid."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,21 +1,29 @@
 # app/main.py
-import io
+import asyncio
+import hashlib
 import os
-import secrets
-import string
+import shutil
+import uuid
 from datetime import date
-from typing import Optional, List
+from typing import Dict, Optional, List
 
-import pandas as pd
-from fastapi import (Depends, FastAPI, File, Form, HTTPException, Request,
+from fastapi import (Depends, FastAPI, File, Form, HTTPException, Query, Request,
                      Response, UploadFile, status)
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-from . import auth, crud, models, schemas
-from .dependencies import get_db
+from . import admission, auth, config, crud, events, fulltext, jobs, profiling, report_snapshot, reports, schemas, tabular, tasks
+from .cache import fragment_cache, principal_cache, settings_cache
+from .database import AsyncSessionLocal, SessionLocal, run_write
+from .dependencies import get_async_db, get_db
 
 # --- Инициализация приложения ---
 # Создаем FastAPI приложение с названием
@@ -27,20 +35,172 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR)
 app.mount("/static", StaticFiles(directory=os.path.join(PROJECT_ROOT, "static")), name="static")
 # Настраиваем Jinja2 для рендеринга HTML-шаблонов
 templates = Jinja2Templates(directory=os.path.join(PROJECT_ROOT, "templates"))
+# Скомпилированные шаблоны сохраняются на диск, и новые воркеры не компилируют их заново
+if config.settings.TEMPLATE_BYTECODE_CACHE_DIR:
+    os.makedirs(config.settings.TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(config.settings.TEMPLATE_BYTECODE_CACHE_DIR)
+
+# Подстановка вместо токена в кэшируемых фрагментах: фрагмент общий для всех пользователей,
+# а токен конкретного пользователя вставляется при выдаче
+TOKEN_PLACEHOLDER = "__TOKEN_PLACEHOLDER__"
+
+@app.on_event("startup")
+def fail_orphaned_jobs():
+    """
+    Помечает задачи, прерванные предыдущим перезапуском сервера, как завершившиеся с ошибкой,
+    и удаляет файлы задач, срок хранения которых истек.
+    """
+    db = SessionLocal()
+    try:
+        jobs.fail_orphaned_jobs(db)
+        jobs.sweep_expired_files(db)
+    except OperationalError:
+        # Таблица задач еще не создана (init_db.py не запускался после обновления)
+        pass
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def ensure_search_index():
+    """Создает полнотекстовый индекс тем, если база создана до его появления, и догоняет его содержимое."""
+    db = SessionLocal()
+    try:
+        fulltext.ensure_index(db)
+    except OperationalError:
+        # Таблица тем еще не создана (init_db.py не запускался)
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def ensure_report_snapshot():
+    """Создает таблицу снимка итогового отчета, если база создана до ее появления, и заполняет ее."""
+    db = SessionLocal()
+    try:
+        report_snapshot.ensure(db)
+    except OperationalError:
+        # Таблица тем еще не создана (init_db.py не запускался)
+        db.rollback()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_topic_events():
+    """Запускает шину событий тем (при EVENTS_BACKEND=database она же периодически чистит таблицу событий)."""
+    events.backend.start()
 
 # --- Вспомогательные функции ---
-def generate_random_password(length=12):
-    """Генерирует случайный пароль длиной length из букв, цифр и символов."""
-    alphabet = string.ascii_letters + string.digits + string.punctuation
-    return ''.join(secrets.choice(alphabet) for i in range(length))
-
-def get_user_or_redirect(token: str, db: Session):
+def get_user_or_redirect(token: str, db: Session) -> schemas.Principal:
     """Проверяет токен, возвращает пользователя или перенаправляет на страницу логина."""
-    user = auth.get_user_from_token(db, token)
+    user = auth.get_principal_from_token(db, token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_303_SEE_OTHER, headers={"Location": "/token/refresh"})
+    return user
+
+async def get_user_or_redirect_async(token: str, db: AsyncSession) -> schemas.Principal:
+    """Асинхронный вариант get_user_or_redirect для эндпоинтов, работающих через get_async_db."""
+    # run_sync выполняет синхронный код аутентификации поверх асинхронного соединения;
+    # при попадании в кэш пользователей обращения к базе не происходит
+    user = await db.run_sync(auth.get_principal_from_token, token)
     if not user:
-        raise HTTPException(status_code=status.HTTP_303_SEE_OTHER, headers={"Location": "/login?error=auth"})
+        raise HTTPException(status_code=status.HTTP_303_SEE_OTHER, headers={"Location": "/token/refresh"})
     return user
 
+async def render_page(template_name: str, context: dict) -> Response:
+    """Рендерит страницу в пуле потоков, не занимая цикл событий (потоки SSE и другие запросы воркера)."""
+    return await run_in_threadpool(templates.TemplateResponse, template_name, context)
+
+async def _render_fragment(db: AsyncSession, key: tuple, template_name: str, load_context, token: str) -> Markup:
+    """
+    Возвращает HTML фрагмента из кэша или рендерит его и сохраняет в кэш.
+
+    load_context(db) вызывается только при промахе через run_sync и возвращает контекст
+    шаблона, который рендерится уже в пуле потоков. Поэтому шаблон должен обращаться
+    только к загруженным атрибутам. Ключ должен содержать версии данных, от которых
+    зависит фрагмент.
+    """
+    html = fragment_cache.get(key)
+    if html is None:
+        context = await db.run_sync(load_context)
+        context["token"] = TOKEN_PLACEHOLDER
+        html = await run_in_threadpool(templates.get_template(template_name).render, context)
+        fragment_cache.set(key, html)
+    return Markup(html.replace(TOKEN_PLACEHOLDER, str(escape(token))))
+
+async def render_topic_catalogue(
+    db: AsyncSession, token: str, versions: Dict[str, int], after_id: int, work_type: Optional[str],
+    teacher_id: Optional[int], search: Optional[str], has_topic: bool, preferences_mode: bool
+) -> Markup:
+    """Рендерит каталог свободных тем для панели студента; фрагмент общий для всех студентов с теми же фильтрами."""
+    key = ("catalogue", versions[crud.TOPICS_VERSION], versions[crud.USERS_VERSION],
+           after_id, work_type, teacher_id, search, has_topic, preferences_mode)
+
+    def load_context(db: Session):
+        free_topics, next_after = crud.get_free_topics_page(
+            db, after_id=after_id, work_type=work_type, teacher_id=teacher_id, search=search
+        )
+        return {
+            "free_topics": free_topics,
+            "next_after": next_after,
+            "filters": {"work_type": work_type or "", "teacher_id": teacher_id or "", "q": search or ""},
+            "teachers": crud.get_users_by_role(db, role="teacher"),
+            "my_topic": has_topic,
+            "preferences_mode": preferences_mode,
+        }
+
+    return await _render_fragment(db, key, "topic_catalogue.html", load_context, token)
+
+async def render_teacher_topic_cards(
+    db: AsyncSession, token: str, versions: Dict[str, int], teacher_id: int, vkr_deadline: Optional[str]
+) -> Markup:
+    """Рендерит карточки тем преподавателя; фрагмент обновляется при изменении тем, пользователей или дедлайна."""
+    # Признак истекшего дедлайна зависит от текущей даты, поэтому она тоже входит в ключ
+    key = ("teacher_topics", teacher_id, versions[crud.TOPICS_VERSION], versions[crud.USERS_VERSION],
+           vkr_deadline, date.today())
+
+    def load_context(db: Session):
+        topics = crud.get_teacher_dashboard_topics(db, teacher_id=teacher_id, vkr_deadline=vkr_deadline)
+        return {"topics": topics}
+
+    return await _render_fragment(db, key, "teacher_topic_cards.html", load_context, token)
+
+def make_etag(*parts) -> str:
+    """Строит сильный ETag из значений, однозначно определяющих содержимое ответа."""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверяет заголовок If-None-Match (список ETag через запятую или *)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Для If-None-Match применяется слабое сравнение: префикс W/ не учитывается
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+def with_etag(response: Response, etag: str) -> Response:
+    """Добавляет к ответу ETag; no-cache заставляет браузер каждый раз переспрашивать сервер с If-None-Match."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def not_modified(etag: str) -> Response:
+    """Ответ 304 Not Modified для условного запроса с совпавшим ETag."""
+    return with_etag(Response(status_code=status.HTTP_304_NOT_MODIFIED), etag)
+
+def set_refresh_cookie(response: Response, user) -> None:
+    """Сохраняет refresh-токен пользователя в cookie, недоступной скриптам страницы."""
+    response.set_cookie(
+        auth.REFRESH_COOKIE, auth.create_refresh_token(user),
+        max_age=config.settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60, httponly=True, samesite="lax",
+        secure=config.settings.REFRESH_COOKIE_SECURE,
+    )
+
+def delete_refresh_cookie(response: Response) -> None:
+    """Удаляет refresh-cookie с теми же атрибутами, с которыми она была установлена."""
+    response.delete_cookie(auth.REFRESH_COOKIE, httponly=True, samesite="lax",
+                           secure=config.settings.REFRESH_COOKIE_SECURE)
+
 # =================================================================
 # ЭНДПОИНТЫ ДЛЯ ОТОБРАЖЕНИЯ СТРАНИЦ (GET-запросы)
 # =================================================================
@@ -48,12 +208,15 @@ def get_user_or_redirect(token: str, db: Session):
 @app.get("/", response_class=HTMLResponse, tags=["Pages"])
 def page_home(request: Request, token: Optional[str] = None, db: Session = Depends(get_db)):
     """Отображает главную страницу, показывая информацию о текущем пользователе, если он авторизован."""
-    user = auth.get_user_from_token(db, token) if token else None
+    user = auth.get_principal_from_token(db, token) if token else None
     return templates.TemplateResponse("home.html", {"request": request, "current_user": user, "token": token})
 
 @app.get("/login", response_class=HTMLResponse, tags=["Pages"])
 def page_login_form(request: Request, error: Optional[str] = None):
     """Отображает форму логина с возможными сообщениями об ошибках."""
+    # Пользователь с refresh-токеном входит без пароля
+    if error is None and request.cookies.get(auth.REFRESH_COOKIE):
+        return RedirectResponse(url="/token/refresh", status_code=status.HTTP_302_FOUND)
     context = {"request": request}
     if error == "1": context["error_message"] = "Неверный логин или пароль."
     if error == "auth": context["error_message"] = "Требуется авторизация. Пожалуйста, войдите."
@@ -62,15 +225,49 @@ def page_login_form(request: Request, error: Optional[str] = None):
 @app.get("/logout", response_class=RedirectResponse, tags=["Pages"])
 def page_logout():
     """Обрабатывает выход пользователя, перенаправляя на главную страницу."""
-    return RedirectResponse(url="/")
+    response = RedirectResponse(url="/")
+    delete_refresh_cookie(response)
+    return response
+
+@app.get("/token/refresh", response_class=RedirectResponse, tags=["Pages"])
+def page_token_refresh(request: Request, db: Session = Depends(get_db)):
+    """Выдает новый токен доступа по refresh-токену из cookie и перенаправляет на dashboard."""
+    access_token = auth.refresh_access_token(db, request.cookies.get(auth.REFRESH_COOKIE))
+    if access_token is None:
+        response = RedirectResponse(url="/login?error=auth", status_code=status.HTTP_302_FOUND)
+        delete_refresh_cookie(response)
+        return response
+    return RedirectResponse(url=f"/dashboard?token={access_token}", status_code=status.HTTP_302_FOUND)
 
 @app.get("/dashboard", response_class=HTMLResponse, tags=["Pages"])
-def page_dashboard(request: Request, token: str, db: Session = Depends(get_db)):
+async def page_dashboard(
+    request: Request,
+    token: str,
+    after: int = 0,
+    work_type: Optional[str] = None,
+    teacher_id: Optional[str] = None,
+    q: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """Отображает панель управления в зависимости от роли пользователя (админ, преподаватель, студент)."""
-    user = get_user_or_redirect(token, db)
+    user = await get_user_or_redirect_async(token, db)
+    # Страница определяется пользователем, параметрами запроса, версиями тем, пользователей, настроек
+    # и списков предпочтений и текущей датой (от нее зависит признак истекшего дедлайна);
+    # при совпадении ETag ORM не используется
+    versions = await db.run_sync(
+        crud.get_data_versions,
+        (crud.TOPICS_VERSION, crud.USERS_VERSION, settings_cache.VERSION_NAME, crud.PREFERENCES_VERSION)
+    )
+    etag = make_etag(
+        user.id, user.role, versions[crud.TOPICS_VERSION], versions[crud.USERS_VERSION],
+        versions[settings_cache.VERSION_NAME], versions[crud.PREFERENCES_VERSION], date.today(),
+        sorted(request.query_params.multi_items())
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
     # Получаем дедлайн для ВКР из настроек
-    deadline_setting = crud.get_setting(db, "vkr_edit_deadline")
-    deadline = deadline_setting.setting_value if deadline_setting else "не установлен"
+    deadline_value = await db.run_sync(crud.get_setting_value, "vkr_edit_deadline")
+    deadline = deadline_value or "не установлен"
     
     context = {"request": request, "current_user": user, "token": token, "vkr_deadline": deadline}
     
@@ -83,39 +280,54 @@ def page_dashboard(request: Request, token: str, db: Session = Depends(get_db)):
             "deadline_passed": "Дедлайн прошел.", 
             "no_topic": "У вас нет темы.", 
             "approved": "Нельзя отписаться от утвержденной темы.", 
-            "file_read_error": "Ошибка чтения файла." 
+            "file_read_error": "Ошибка чтения файла.",
+            "preferences_mode": "Темы распределяются по спискам предпочтений: добавьте тему в свой список.",
+            "work_type_mismatch": "Тема не подходит для выбранного типа работы.",
+            "preferences_full": f"В списке предпочтений может быть не больше {config.settings.PREFERENCES_MAX_LENGTH} тем."
         }
         context["error_message"] = error_map.get(query_params['error'], "Произошла ошибка.")
     if "success" in query_params:
         success_map = { 
             "students_uploaded": "Студенты успешно загружены.", 
             "teachers_uploaded": "Преподаватели успешно загружены.", 
-            "deadline_set": "Дедлайн установлен." 
+            "deadline_set": "Дедлайн установлен.", 
+            "selection_mode_set": "Режим выбора тем изменен.", 
+            "job_queued": f"Задача №{query_params.get('job_id')} поставлена в очередь." 
         }
         context["success_message"] = success_map.get(query_params['success'], "Операция выполнена.")
 
     if user.role == "admin":
-        return templates.TemplateResponse("admin_dashboard.html", context)
+        context["preferences_mode"] = await db.run_sync(crud.is_preferences_mode)
+        return with_etag(await render_page("admin_dashboard.html", context), etag)
     
     if user.role == "teacher":
-        # Получаем список тем преподавателя
-        teacher_topics = crud.get_topics_by_teacher(db, teacher_id=user.id)
-        # Проверяем, прошел ли дедлайн для каждой темы
-        for topic in teacher_topics:
-            topic.deadline_is_passed = crud.is_vkr_deadline_passed(db, topic)
-        context["topics"] = teacher_topics
-        return templates.TemplateResponse("teacher_dashboard.html", context)
+        # Карточки тем преподавателя вместе со студентами и признаком истекшего дедлайна
+        context["topic_cards_html"] = await render_teacher_topic_cards(
+            db, token=token, versions=versions, teacher_id=user.id, vkr_deadline=deadline_value
+        )
+        return with_etag(await render_page("teacher_dashboard.html", context), etag)
     
     if user.role == "student":
         # Проверяем наличие профиля студента
-        if not user.student_profile: 
-            return templates.TemplateResponse("error_page.html", context)
-        # Получаем все доступные темы и текущую тему студента
-        context["all_topics"] = crud.get_all_topics(db)
-        context["my_topic"] = crud.get_student_topic(db, student_profile_id=user.student_profile.id)
-        return templates.TemplateResponse("student_dashboard.html", context)
+        if not user.student_profile_id: 
+            return with_etag(await render_page("error_page.html", context), etag)
+        # Получаем текущую тему студента и страницу свободных тем каталога с учетом фильтров
+        context["my_topic"] = await db.run_sync(crud.get_student_topic, student_profile_id=user.student_profile_id)
+        # В режиме списков предпочтений студент видит свой список вместо кнопок немедленного выбора
+        context["preferences_mode"] = await db.run_sync(crud.is_preferences_mode)
+        if context["preferences_mode"]:
+            context["preferences"] = await db.run_sync(crud.get_student_preferences, user.student_profile_id)
+            context["preferences_max"] = config.settings.PREFERENCES_MAX_LENGTH
+        # Форма фильтров отправляет пустую строку, если руководитель не выбран
+        teacher_filter = int(teacher_id) if teacher_id and teacher_id.isdigit() else None
+        context["catalogue_html"] = await render_topic_catalogue(
+            db, token=token, versions=versions, after_id=after, work_type=work_type or None,
+            teacher_id=teacher_filter, search=q or None, has_topic=context["my_topic"] is not None,
+            preferences_mode=context["preferences_mode"]
+        )
+        return with_etag(await render_page("student_dashboard.html", context), etag)
     
-    return templates.TemplateResponse("error_page.html", context)
+    return with_etag(await render_page("error_page.html", context), etag)
 
 @app.get("/topics/create", response_class=HTMLResponse, tags=["Pages"])
 def page_create_topic_form(request: Request, token: str, db: Session = Depends(get_db)):
@@ -148,6 +360,66 @@ def page_edit_topic_form(
     }
     return templates.TemplateResponse("edit_topic.html", context)
 
+@app.get("/api/topics/free", response_model=schemas.TopicCataloguePage, tags=["API"])
+async def api_free_topics(
+    token: str,
+    after: int = 0,
+    limit: int = crud.CATALOGUE_PAGE_SIZE,
+    work_type: Optional[str] = None,
+    teacher_id: Optional[int] = None,
+    q: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Возвращает страницу каталога свободных тем с фильтрами по типу работы, преподавателю и полнотекстовым поиском."""
+    await get_user_or_redirect_async(token, db)
+    topics, next_after = await db.run_sync(
+        crud.get_free_topics_page, after_id=after, limit=max(1, min(limit, 200)),
+        work_type=work_type or None, teacher_id=teacher_id, search=q or None
+    )
+    items = [
+        schemas.CatalogueTopic(
+            id=topic.id, title=topic.title, description=topic.description, work_type=topic.work_type,
+            teacher_id=topic.teacher_id, teacher_name=topic.teacher.full_name
+        )
+        for topic in topics
+    ]
+    return schemas.TopicCataloguePage(items=items, next_after=next_after)
+
+@app.get("/events/topics", tags=["API"])
+async def stream_topic_events(token: str):
+    """
+    Передает изменения тем (created, edited, assigned, freed, approved, unapproved) через Server-Sent Events.
+
+    Если клиент не успевает получать события, он получает событие resync и должен перезагрузить страницу.
+    """
+    # Сессия нужна только для проверки токена и не удерживается на время потока
+    async with AsyncSessionLocal() as db:
+        await get_user_or_redirect_async(token, db)
+
+    async def event_stream():
+        subscription = events.broker.subscribe()
+        try:
+            # Браузер переподключается через 3 секунды после обрыва соединения
+            yield "retry: 3000\n\n"
+            while True:
+                if subscription.overflowed:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                try:
+                    topic_event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=config.settings.EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Комментарий SSE не дает прокси закрыть простаивающее соединение
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {topic_event.id}\nevent: topic\ndata: {topic_event.model_dump_json()}\n\n"
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
 # =================================================================
 # ЭНДПОИНТЫ ДЛЯ ОБРАБОТКИ HTML-ФОРМ (POST-запросы)
 # =================================================================
@@ -155,11 +427,13 @@ def page_edit_topic_form(
 @app.post("/login", response_class=RedirectResponse, tags=["Forms"])
 def handle_login_form(username: str = Form(), password: str = Form(), db: Session = Depends(get_db)):
     """Обрабатывает форму логина, создает токен и перенаправляет на dashboard."""
-    user = crud.get_user_by_username(db, username)
-    if not user or not auth.verify_password(password, user.hashed_password):
+    user = auth.authenticate_user(db, username, password)
+    if not user:
         return RedirectResponse(url="/login?error=1", status_code=status.HTTP_302_FOUND)
     access_token = auth.create_access_token(data={"sub": user.username})
-    return RedirectResponse(url=f"/dashboard?token={access_token}", status_code=status.HTTP_302_FOUND)
+    response = RedirectResponse(url=f"/dashboard?token={access_token}", status_code=status.HTTP_302_FOUND)
+    set_refresh_cookie(response, user)
+    return response
 
 @app.post("/topics/create", response_class=RedirectResponse, tags=["Forms"])
 def handle_create_topic(token: str = Form(), title: str = Form(), description: str = Form(""), work_type: str = Form(), db: Session = Depends(get_db)):
@@ -171,21 +445,21 @@ def handle_create_topic(token: str = Form(), title: str = Form(), description: s
     if work_type not in VALID_WORK_TYPES: 
         raise HTTPException(status_code=400)
     topic_data = schemas.TopicCreate(title=title, description=description, work_type=work_type)
-    crud.create_teacher_topic(db, topic=topic_data, teacher_id=user.id)
+    run_write(db, crud.create_teacher_topic, topic=topic_data, teacher_id=user.id)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/student/assign-topic/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
 def handle_assign_topic(topic_id: int, token: str = Form(), db: Session = Depends(get_db)):
     """Назначает тему студенту, проверяя доступность темы и наличие у студента других тем."""
     user = get_user_or_redirect(token, db)
-    if not user.student_profile: 
+    if not user.student_profile_id: 
         raise HTTPException(status_code=403)
-    if crud.get_student_topic(db, student_profile_id=user.student_profile.id):
-        return RedirectResponse(url=f"/dashboard?token={token}&error=already_assigned", status_code=status.HTTP_302_FOUND)
-    topic = crud.get_topic_by_id(db, topic_id=topic_id)
-    if not topic or topic.student_id is not None:
-        return RedirectResponse(url=f"/dashboard?token={token}&error=topic_taken", status_code=status.HTTP_302_FOUND)
-    crud.assign_topic_to_student(db, topic=topic, student_profile_id=user.student_profile.id)
+    if crud.is_preferences_mode(db):
+        return RedirectResponse(url=f"/dashboard?token={token}&error=preferences_mode", status_code=status.HTTP_302_FOUND)
+    # Проверка доступности темы и запись выполняются одним условным UPDATE
+    result = run_write(db, crud.try_assign_topic, topic_id=topic_id, student_profile_id=user.student_profile_id)
+    if result != crud.ASSIGNED:
+        return RedirectResponse(url=f"/dashboard?token={token}&error={result}", status_code=status.HTTP_302_FOUND)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/teacher/edit-topic/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
@@ -216,7 +490,7 @@ def handle_edit_topic_form(
         description=description,
         work_type=work_type
     )
-    crud.update_topic(db, topic_to_update=topic_to_update, topic_data=topic_data)
+    run_write(db, crud.update_topic, topic_to_update=topic_to_update, topic_data=topic_data)
     
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
@@ -224,18 +498,94 @@ def handle_edit_topic_form(
 def handle_unassign_topic(token: str = Form(), db: Session = Depends(get_db)):
     """Отменяет назначение темы студенту, если она не утверждена и дедлайн не прошел."""
     user = get_user_or_redirect(token, db)
-    if not user.student_profile: 
+    if not user.student_profile_id: 
         raise HTTPException(status_code=403)
-    topic = crud.get_student_topic(db, student_profile_id=user.student_profile.id)
+    topic = crud.get_student_topic(db, student_profile_id=user.student_profile_id)
     if not topic: 
         return RedirectResponse(url=f"/dashboard?token={token}&error=no_topic")
     if topic.is_approved: 
         return RedirectResponse(url=f"/dashboard?token={token}&error=approved")
     if crud.is_vkr_deadline_passed(db, topic): 
         return RedirectResponse(url=f"/dashboard?token={token}&error=deadline_passed")
-    crud.unassign_topic_from_student(db, topic=topic)
+    run_write(db, crud.unassign_topic_from_student, topic=topic)
+    return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
+
+def update_preferences(db: Session, user: schemas.Principal, token: str, change) -> RedirectResponse:
+    """
+    Применяет изменение change к списку предпочтений студента и возвращает на dashboard.
+
+    change получает текущий список идентификаторов тем и тип работы и возвращает новый
+    список и тип либо код ошибки для адреса перенаправления.
+    """
+    if not user.student_profile_id:
+        raise HTTPException(status_code=403)
+    if not crud.is_preferences_mode(db):
+        raise HTTPException(status_code=400, detail="Темы выбираются в порядке очереди.")
+    preferences = crud.get_student_preferences(db, student_profile_id=user.student_profile_id)
+    work_type = preferences[0].work_type if preferences else None
+    result = change([preference.topic for preference in preferences], work_type)
+    if isinstance(result, str):
+        return RedirectResponse(url=f"/dashboard?token={token}&error={result}", status_code=status.HTTP_302_FOUND)
+    topics, work_type = result
+    run_write(db, crud.set_student_preferences, user.student_profile_id, [topic.id for topic in topics], work_type)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
+@app.post("/student/preferences/add/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
+def handle_add_preference(topic_id: int, token: str = Form(), db: Session = Depends(get_db)):
+    """Добавляет свободную тему в конец списка предпочтений студента."""
+    user = get_user_or_redirect(token, db)
+    topic = crud.get_topic_by_id(db, topic_id)
+
+    def change(topics, work_type):
+        if topic is None or topic.student_id is not None:
+            return crud.TOPIC_TAKEN
+        if any(listed.id == topic.id for listed in topics):
+            return topics, work_type
+        if len(topics) >= config.settings.PREFERENCES_MAX_LENGTH:
+            return "preferences_full"
+        # Тип работы списка задает первая добавленная тема; тема двойного типа считается курсовой,
+        # пока студент не выберет ВКР в форме списка
+        if work_type is None:
+            work_type = "coursework" if topic.work_type == crud.BOTH_WORK_TYPES else topic.work_type
+        if not crud.is_work_type_compatible(topic.work_type, work_type):
+            return "work_type_mismatch"
+        return topics + [topic], work_type
+
+    return update_preferences(db, user, token, change)
+
+@app.post("/student/preferences/remove/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
+def handle_remove_preference(topic_id: int, token: str = Form(), db: Session = Depends(get_db)):
+    """Убирает тему из списка предпочтений студента."""
+    user = get_user_or_redirect(token, db)
+    return update_preferences(
+        db, user, token, lambda topics, work_type: ([topic for topic in topics if topic.id != topic_id], work_type)
+    )
+
+@app.post("/student/preferences/raise/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
+def handle_raise_preference(topic_id: int, token: str = Form(), db: Session = Depends(get_db)):
+    """Поднимает тему на одно место выше в списке предпочтений студента."""
+    user = get_user_or_redirect(token, db)
+
+    def change(topics, work_type):
+        ids = [topic.id for topic in topics]
+        if topic_id in ids and ids.index(topic_id) > 0:
+            index = ids.index(topic_id)
+            topics[index - 1], topics[index] = topics[index], topics[index - 1]
+        return topics, work_type
+
+    return update_preferences(db, user, token, change)
+
+@app.post("/student/preferences/work-type", response_class=RedirectResponse, tags=["Forms"])
+def handle_set_preferences_work_type(token: str = Form(), work_type: str = Form(), db: Session = Depends(get_db)):
+    """Меняет тип работы, на который претендует студент; неподходящие темы убираются из списка."""
+    user = get_user_or_redirect(token, db)
+    if work_type not in crud.STUDENT_WORK_TYPES:
+        raise HTTPException(status_code=400, detail="Неверный тип работы.")
+    return update_preferences(
+        db, user, token,
+        lambda topics, _: ([topic for topic in topics if crud.is_work_type_compatible(topic.work_type, work_type)], work_type)
+    )
+
 @app.post("/teacher/approve-topic/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
 def handle_approve_topic(topic_id: int, token: str = Form(), db: Session = Depends(get_db)):
     """Утверждает назначение темы преподавателем."""
@@ -243,7 +593,7 @@ def handle_approve_topic(topic_id: int, token: str = Form(), db: Session = Depen
     topic = crud.get_topic_by_id(db, topic_id)
     if not topic or user.role != 'teacher' or topic.teacher_id != user.id: 
         raise HTTPException(status_code=403)
-    crud.approve_topic_assignment(db, topic=topic)
+    run_write(db, crud.approve_topic_assignment, topic=topic)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/teacher/unapprove-topic/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
@@ -255,7 +605,7 @@ def handle_unapprove_topic(topic_id: int, token: str = Form(), db: Session = Dep
         raise HTTPException(status_code=403)
     if crud.is_vkr_deadline_passed(db, topic): 
         return RedirectResponse(url=f"/dashboard?token={token}&error=deadline_passed")
-    crud.unapprove_topic_assignment(db, topic=topic)
+    run_write(db, crud.unapprove_topic_assignment, topic=topic)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/teacher/reject-topic/{topic_id}", response_class=RedirectResponse, tags=["Forms"])
@@ -267,58 +617,58 @@ def handle_reject_topic(topic_id: int, token: str = Form(), db: Session = Depend
         raise HTTPException(status_code=403)
     if crud.is_vkr_deadline_passed(db, topic): 
         return RedirectResponse(url=f"/dashboard?token={token}&error=deadline_passed")
-    crud.reject_topic_assignment(db, topic=topic)
+    run_write(db, crud.reject_topic_assignment, topic=topic)
     return RedirectResponse(url=f"/dashboard?token={token}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/admin/upload/students", response_class=RedirectResponse, tags=["Forms"])
 def handle_upload_students(token: str = Form(), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Загружает данные студентов из CSV/Excel файла, создает пользователей и профили."""
+    """Ставит в очередь импорт студентов из CSV/Excel файла."""
     user = get_user_or_redirect(token, db)
     if user.role != 'admin': 
         raise HTTPException(status_code=403)
-    try:
-        df = pd.read_excel(file.file) if file.filename.endswith('.xlsx') else pd.read_csv(file.file)
-        required_cols = {'full_name', 'email', 'group'}
-        if not required_cols.issubset(df.columns): 
-            raise ValueError("Отсутствуют колонки")
-    except Exception:
-        return RedirectResponse(url=f"/dashboard?token={token}&error=file_read_error", status_code=status.HTTP_302_FOUND)
-    
-    for _, row in df.iterrows():
-        if crud.get_user_by_username(db, username=row['email']): 
-            continue
-        hashed_password = auth.pwd_context.hash(generate_random_password())
-        user_data = schemas.UserBase(username=row['email'], full_name=row['full_name'], role='student')
-        new_user = crud.create_user(db, user_data=user_data, hashed_password=hashed_password)
-        student_profile = models.Student(user_id=new_user.id, group=row['group'], profile=row.get('profile', ''))
-        db.add(student_profile)
-        db.commit()
-    return RedirectResponse(url=f"/dashboard?token={token}&success=students_uploaded", status_code=status.HTTP_302_FOUND)
+    return _enqueue_upload(file, kind="import_students", user=user, token=token, db=db)
 
 @app.post("/admin/upload/teachers", response_class=RedirectResponse, tags=["Forms"])
 def handle_upload_teachers(token: str = Form(), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Загружает данные преподавателей из CSV/Excel файла, создает пользователей и профили."""
+    """Ставит в очередь импорт преподавателей из CSV/Excel файла."""
     user = get_user_or_redirect(token, db)
     if user.role != 'admin': 
         raise HTTPException(status_code=403)
-    try:
-        df = pd.read_excel(file.file) if file.filename.endswith('.xlsx') else pd.read_csv(file.file)
-        required_cols = {'full_name', 'email', 'position'}
-        if not required_cols.issubset(df.columns): 
-            raise ValueError("Отсутствуют колонки")
-    except Exception:
+    return _enqueue_upload(file, kind="import_teachers", user=user, token=token, db=db)
+
+def _enqueue_upload(file: UploadFile, kind: str, user, token: str, db: Session):
+    """Сохраняет загруженный файл на диск и ставит задачу импорта в очередь."""
+    if not file.filename or not file.filename.endswith(('.xlsx', '.csv')):
         return RedirectResponse(url=f"/dashboard?token={token}&error=file_read_error", status_code=status.HTTP_302_FOUND)
-    
-    for _, row in df.iterrows():
-        if crud.get_user_by_username(db, username=row['email']): 
-            continue
-        hashed_password = auth.pwd_context.hash(generate_random_password())
-        user_data = schemas.UserBase(username=row['email'], full_name=row['full_name'], role='teacher')
-        new_user = crud.create_user(db, user_data=user_data, hashed_password=hashed_password)
-        teacher_profile = models.Teacher(user_id=new_user.id, degree=row.get('degree',''), title=row.get('title', ''), position=row.get('position',''))
-        db.add(teacher_profile)
-        db.commit()
-    return RedirectResponse(url=f"/dashboard?token={token}&success=teachers_uploaded", status_code=status.HTTP_302_FOUND)
+    os.makedirs(config.settings.JOBS_DIR, exist_ok=True)
+    # Расширение сохраняется: openpyxl открывает по пути только файлы с расширением Excel
+    path = os.path.join(config.settings.JOBS_DIR, f"upload_{uuid.uuid4().hex}{os.path.splitext(file.filename)[1]}")
+    with open(path, 'wb') as saved:
+        shutil.copyfileobj(file.file, saved)
+    job = jobs.enqueue(db, kind, created_by=user.id, path=path, filename=file.filename)
+    return RedirectResponse(url=f"/dashboard?token={token}&success=job_queued&job_id={job.id}", status_code=status.HTTP_302_FOUND)
+
+@app.post("/admin/jobs/report", response_class=RedirectResponse, tags=["Forms"])
+def handle_enqueue_report(token: str = Form(), db: Session = Depends(get_db)):
+    """Ставит в очередь формирование итогового отчета."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    job = jobs.enqueue(db, "report", created_by=user.id)
+    return RedirectResponse(url=f"/dashboard?token={token}&success=job_queued&job_id={job.id}", status_code=status.HTTP_302_FOUND)
+
+@app.post("/admin/jobs/reset-passwords/{role}", response_class=RedirectResponse, tags=["Forms"])
+def handle_enqueue_reset_passwords(role: str, token: str = Form(), group: Optional[str] = Form(None),
+                                   db: Session = Depends(get_db)):
+    """Ставит в очередь сброс паролей студентов (всех или одной группы) или преподавателей."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    if role not in ("students", "teachers"):
+        raise HTTPException(status_code=404)
+    params = {"group": group} if role == "students" and group else {}
+    job = jobs.enqueue(db, f"reset_passwords_{role}", created_by=user.id, **params)
+    return RedirectResponse(url=f"/dashboard?token={token}&success=job_queued&job_id={job.id}", status_code=status.HTTP_302_FOUND)
 
 @app.post("/admin/settings/vkr-deadline", response_class=RedirectResponse, tags=["Forms"])
 def handle_set_vkr_deadline(token: str = Form(), deadline: date = Form(), db: Session = Depends(get_db)):
@@ -326,94 +676,147 @@ def handle_set_vkr_deadline(token: str = Form(), deadline: date = Form(), db: Se
     user = get_user_or_redirect(token, db)
     if user.role != 'admin': 
         raise HTTPException(status_code=403)
-    crud.set_setting(db, name="vkr_edit_deadline", value=deadline.isoformat())
+    run_write(db, crud.set_setting, name="vkr_edit_deadline", value=deadline.isoformat())
     return RedirectResponse(url=f"/dashboard?token={token}&success=deadline_set", status_code=status.HTTP_302_FOUND)
 
+@app.post("/admin/settings/selection-mode", response_class=RedirectResponse, tags=["Forms"])
+def handle_set_selection_mode(token: str = Form(), mode: str = Form(), db: Session = Depends(get_db)):
+    """Переключает выбор тем между очередью (fcfs) и списками предпочтений (preferences)."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    if mode not in ("fcfs", crud.PREFERENCES_MODE):
+        raise HTTPException(status_code=400, detail="Неизвестный режим выбора тем.")
+    run_write(db, crud.set_setting, name=crud.SELECTION_MODE_SETTING, value=mode)
+    return RedirectResponse(url=f"/dashboard?token={token}&success=selection_mode_set", status_code=status.HTTP_302_FOUND)
+
+@app.post("/admin/jobs/allocate", response_class=RedirectResponse, tags=["Forms"])
+def handle_enqueue_allocation(token: str = Form(), capacity: Optional[str] = Form(None), db: Session = Depends(get_db)):
+    """Ставит в очередь распределение свободных тем по спискам предпочтений студентов."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    # Пустое поле означает, что число студентов у преподавателя не ограничено
+    params = {"capacity": int(capacity)} if capacity and capacity.isdigit() else {}
+    job = jobs.enqueue(db, "allocate_topics", created_by=user.id, **params)
+    return RedirectResponse(url=f"/dashboard?token={token}&success=job_queued&job_id={job.id}", status_code=status.HTTP_302_FOUND)
+
 # --- Эндпоинты для скачивания файлов ---
 
 @app.get("/admin/report/download", tags=["Downloads"])
-def download_report(token: str, db: Session = Depends(get_db)):
-    """Генерирует и возвращает Excel-отчет по всем темам."""
+def download_report(request: Request, token: str, format: str = "xlsx", db: Session = Depends(get_db)):
+    """Потоково формирует и возвращает отчет по всем темам в формате Excel или CSV."""
     user = get_user_or_redirect(token, db)
     if user.role != 'admin': 
         raise HTTPException(status_code=403)
-    all_topics = crud.get_all_topics(db, limit=2000)
-    if not all_topics: 
+    # Отчет одинаков для всех администраторов и меняется только вместе с темами или пользователями
+    versions = crud.get_data_versions(db, (crud.TOPICS_VERSION, crud.USERS_VERSION))
+    etag = make_etag("report", format, versions[crud.TOPICS_VERSION], versions[crud.USERS_VERSION])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if not crud.has_topics(db): 
         return Response(content="Нет данных для отчета.", status_code=404)
-
-    report_data = []
-    for topic in all_topics:
-        student_name = topic.student.user.full_name if topic.student and topic.student.user else ""
-        student_status = "Тема закреплена" if topic.student else "Тема свободна"
-        teacher_status = "Студент и тема согласованы" if topic.is_approved else "Ожидает согласования"
-        if not topic.student: 
-            teacher_status = ""
-        report_data.append({
-            "Тип работы": topic.work_type, 
-            "ФИО преподавателя": topic.teacher.full_name,
-            "Тема от преподавателя": topic.title, 
-            "Описание темы": topic.description or "",
-            "ФИО студента": student_name, 
-            "Текущий статус для студента": student_status,
-            "Статус от преподавателя": teacher_status, 
-            "Корректировка темы": ""
-        })
-    df = pd.DataFrame(report_data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Report')
-    output.seek(0)
+    if format == "csv":
+        headers = {'Content-Disposition': 'attachment; filename="coursework_report.csv"'}
+        return with_etag(
+            StreamingResponse(reports.stream_report_csv(), media_type="text/csv; charset=utf-8", headers=headers), etag
+        )
     headers = {'Content-Disposition': 'attachment; filename="coursework_report.xlsx"'}
-    return StreamingResponse(output, headers=headers)
+    return with_etag(StreamingResponse(
+        reports.stream_report_xlsx(),
+        media_type=tabular.XLSX_MEDIA_TYPE,
+        headers=headers
+    ), etag)
+
+def credentials_response(credentials: List[Dict], hash_rate: float, filename: str,
+                         sheet_name: str = 'Sheet1') -> StreamingResponse:
+    """Потоково отдает Excel-файл с новыми учетными данными."""
+    headers = {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        # Скорость хэширования новых паролей (хэшей в секунду)
+        'X-Hash-Rate': f"{hash_rate:.0f}"
+    }
+    return StreamingResponse(
+        reports.stream_credentials_xlsx(credentials, sheet_name=sheet_name),
+        media_type=tabular.XLSX_MEDIA_TYPE,
+        headers=headers
+    )
 
 @app.get("/admin/reset-passwords/students", tags=["Downloads"])
-def download_reset_student_passwords(token: str, db: Session = Depends(get_db)):
-    """Сбрасывает пароли студентов и возвращает Excel-файл с новыми учетными данными."""
+def download_reset_student_passwords(token: str, group: Optional[str] = None, user_ids: Optional[List[int]] = Query(None),
+                                     db: Session = Depends(get_db)):
+    """
+    Сбрасывает пароли студентов и возвращает Excel-файл с новыми учетными данными.
+
+    Параметры group и user_ids ограничивают сброс одной группой или списком пользователей.
+    """
     user = get_user_or_redirect(token, db)
     if user.role != 'admin': 
         raise HTTPException(status_code=403)
-    users_to_reset = crud.get_users_by_role(db, role="student")
+    users_to_reset = crud.get_password_reset_targets(db, role="student", group=group or None, user_ids=user_ids)
     if not users_to_reset: 
         return RedirectResponse(url=f"/dashboard?token={token}&error=no_students_found")
-
-    report_data = []
-    for u in users_to_reset:
-        new_password = generate_random_password()
-        new_hashed_password = auth.pwd_context.hash(new_password)
-        crud.change_user_password(db, user=u, new_hashed_password=new_hashed_password)
-        report_data.append({"ФИО": u.full_name, "Логин (email)": u.username, "Новый пароль": new_password})
-    
-    df = pd.DataFrame(report_data)
-    output = io.BytesIO()
-    df.to_excel(output, index=False)
-    output.seek(0)
-    headers = {'Content-Disposition': 'attachment; filename="students_new_credentials.xlsx"'}
-    return StreamingResponse(output, headers=headers)
+    credentials, hash_rate = auth.reset_user_passwords(db, users_to_reset)
+    return credentials_response(credentials, hash_rate, filename="students_new_credentials.xlsx")
 
 @app.get("/admin/reset-passwords/teachers", tags=["Downloads"])
-def download_reset_teacher_passwords(token: str, db: Session = Depends(get_db)):
-    """Сбрасывает пароли преподавателей и возвращает Excel-файл с новыми учетными данными."""
+def download_reset_teacher_passwords(token: str, user_ids: Optional[List[int]] = Query(None),
+                                     db: Session = Depends(get_db)):
+    """Сбрасывает пароли преподавателей (всех или из списка user_ids) и возвращает Excel-файл с новыми учетными данными."""
     user = get_user_or_redirect(token, db)
     if user.role != 'admin':
         raise HTTPException(status_code=403, detail="Действие доступно только для администраторов")
-    users_to_reset = crud.get_users_by_role(db, role="teacher")
+    users_to_reset = crud.get_password_reset_targets(db, role="teacher", user_ids=user_ids)
     if not users_to_reset:
         return RedirectResponse(url=f"/dashboard?token={token}&error=no_teachers_found")
+    credentials, hash_rate = auth.reset_user_passwords(db, users_to_reset)
+    return credentials_response(credentials, hash_rate, filename="teachers_new_credentials.xlsx",
+                                sheet_name='Teacher Credentials')
 
-    report_data = []
-    for u in users_to_reset:
-        new_password = generate_random_password()
-        new_hashed_password = auth.pwd_context.hash(new_password)
-        crud.change_user_password(db, user=u, new_hashed_password=new_hashed_password)
-        report_data.append({
-            "ФИО": u.full_name,
-            "Логин (email)": u.username,
-            "Новый пароль": new_password
-        })
-    
-    df = pd.DataFrame(report_data)
-    output = io.BytesIO()
-    df.to_excel(output, index=False, sheet_name='Teacher Credentials')
-    output.seek(0)
-    headers = {'Content-Disposition': 'attachment; filename="teachers_new_credentials.xlsx"'}
-    return StreamingResponse(output, headers=headers)
+# --- Эндпоинты для фоновых задач ---
+
+@app.get("/admin/jobs/{job_id}", response_model=schemas.Job, tags=["Jobs"])
+def get_job_status(job_id: int, token: str, db: Session = Depends(get_db)):
+    """Возвращает состояние и прогресс фоновой задачи."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    job = crud.get_job(db, job_id)
+    if not job: 
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+@app.get("/admin/jobs/{job_id}/download", tags=["Jobs"])
+def download_job_artifact(job_id: int, token: str, db: Session = Depends(get_db)):
+    """Возвращает файл-результат завершенной фоновой задачи."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    job = crud.get_job(db, job_id)
+    if not job or job.status != "done" or not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=404, detail="Результат задачи недоступен")
+    # Файл с новыми паролями отдается один раз и удаляется сразу после отправки
+    background = (BackgroundTask(jobs.discard_artifact, job.id, job.artifact_path)
+                  if job.kind in jobs.ONE_TIME_ARTIFACT_KINDS else None)
+    return FileResponse(job.artifact_path, filename=job.artifact_name, background=background)
+
+# --- Служебные эндпоинты ---
+
+@app.get("/admin/cache/stats", tags=["Service"])
+def get_cache_stats(token: str, db: Session = Depends(get_db)):
+    """Возвращает счетчики кэшей пользователей, фрагментов страниц, проверок пароля и контроля допуска."""
+    user = get_user_or_redirect(token, db)
+    if user.role != 'admin': 
+        raise HTTPException(status_code=403)
+    return {"principals": principal_cache.stats(), "fragments": fragment_cache.stats(), "logins": auth.login_stats(),
+            "admission": admission.controller.stats()}
+
+# --- Контроль допуска ---
+# Профилирование подключается позже и оказывается снаружи, поэтому учитывает и время ожидания в очереди
+if config.settings.ADMISSION_ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware)
+
+# --- Профилирование ---
+# Подключается последним: оборачивает обработчики всех объявленных выше маршрутов
+if config.settings.PROFILING_ENABLED:
+    profiling.install(app, templates)
@@ -1,8 +1,23 @@
 # app/models.py
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Text
+from datetime import datetime
+from sqlalchemy import (DDL, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint,
+                        event, func, literal_column)
 from sqlalchemy.orm import relationship
 from .database import Base
 
+# Константы выражения полнотекстового поиска PostgreSQL: выражение в запросе должно совпадать
+# с индексным дословно, поэтому они подставляются в SQL как литералы, а не параметры
+RUSSIAN_SEARCH_CONFIG = literal_column("'russian'::regconfig")
+_EMPTY = literal_column("''")
+
+def topic_search_vector(title, description):
+    """Выражение tsvector темы для PostgreSQL: слова названия весят больше слов описания."""
+    return func.setweight(
+        func.to_tsvector(RUSSIAN_SEARCH_CONFIG, func.coalesce(title, _EMPTY)), literal_column("'A'")
+    ).op("||")(func.setweight(
+        func.to_tsvector(RUSSIAN_SEARCH_CONFIG, func.coalesce(description, _EMPTY)), literal_column("'B'")
+    ))
+
 class User(Base):
     """Модель пользователя, представляющая таблицу users в базе данных."""
     __tablename__ = "users"
@@ -81,6 +96,74 @@ class Topic(Base):
     # Связь со студентом
     student = relationship("Student", back_populates="topic")
 
+    # Частичные индексы по свободным темам для постраничного каталога студентов:
+    # keyset-пагинация по id с необязательными фильтрами по типу работы и преподавателю
+    __table_args__ = (
+        Index("ix_topics_free_id", "id",
+              sqlite_where=student_id.is_(None), postgresql_where=student_id.is_(None)),
+        Index("ix_topics_free_work_type", "work_type", "id",
+              sqlite_where=student_id.is_(None), postgresql_where=student_id.is_(None)),
+        Index("ix_topics_free_teacher", "teacher_id", "id",
+              sqlite_where=student_id.is_(None), postgresql_where=student_id.is_(None)),
+        # GIN-индекс полнотекстового поиска (только PostgreSQL; для SQLite см. TOPIC_SEARCH_TABLE)
+        Index("ix_topics_search", topic_search_vector(title, description),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+# --- Полнотекстовый индекс тем (поиск выполняет app/fulltext.py) ---
+
+# SQLite: таблица FTS5 с основами слов названия и описания, rowid совпадает с id темы.
+# Основы вычисляет приложение (русский стеммер Snowball), поэтому таблица синхронизируется
+# функциями crud при создании и изменении темы
+TOPIC_SEARCH_TABLE = "topic_search"
+TOPIC_SEARCH_DDL = f"CREATE VIRTUAL TABLE IF NOT EXISTS {TOPIC_SEARCH_TABLE} USING fts5(title, description)"
+event.listen(Topic.__table__, "after_create", DDL(TOPIC_SEARCH_DDL).execute_if(dialect="sqlite"))
+event.listen(Topic.__table__, "after_drop",
+             DDL(f"DROP TABLE IF EXISTS {TOPIC_SEARCH_TABLE}").execute_if(dialect="sqlite"))
+
+class TopicPreference(Base):
+    """Модель позиции в списке предпочтений студента, представляющая таблицу topic_preferences в базе данных."""
+    __tablename__ = "topic_preferences"
+
+    # Уникальный идентификатор записи
+    id = Column(Integer, primary_key=True, index=True)
+    # Внешний ключ, связывающий со студентом
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    # Внешний ключ, связывающий с темой
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    # Место темы в списке (0 — самая желанная)
+    rank = Column(Integer, nullable=False)
+    # Тип работы, на который претендует студент (coursework или vkr)
+    work_type = Column(String, nullable=False)
+    # Связь с темой
+    topic = relationship("Topic")
+
+    # Распределение читает списки по студентам в порядке мест
+    __table_args__ = (
+        UniqueConstraint("student_id", "topic_id"),
+        Index("ix_topic_preferences_student_rank", "student_id", "rank"),
+    )
+
+class ReportRow(Base):
+    """
+    Модель строки итогового отчета, представляющая таблицу report_rows в базе данных.
+
+    Денормализованный снимок темы с именами преподавателя и студента и текстами статусов.
+    Поддерживается изменяющими функциями crud (см. app/report_snapshot.py), поэтому
+    отчет формируется одним последовательным чтением таблицы без соединений.
+    """
+    __tablename__ = "report_rows"
+
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    work_type = Column(String)
+    teacher_name = Column(String)
+    title = Column(String)
+    description = Column(Text)
+    student_name = Column(String)
+    student_status = Column(String)
+    teacher_status = Column(String)
+    correction = Column(String)
+
 class SystemSettings(Base):
     """Модель системных настроек, представляющая таблицу system_settings в базе данных."""
     __tablename__ = "system_settings"
@@ -89,3 +172,56 @@ class SystemSettings(Base):
     setting_name = Column(String, primary_key=True, index=True)
     # Значение настройки
     setting_value = Column(String)
+
+class DataVersion(Base):
+    """Модель счетчика версий данных, представляющая таблицу data_versions в базе данных."""
+    __tablename__ = "data_versions"
+
+    # Имя набора данных (например, settings)
+    name = Column(String, primary_key=True)
+    # Номер версии, увеличивается при каждом изменении набора данных
+    version = Column(Integer, nullable=False, default=0)
+
+class Job(Base):
+    """Модель фоновой задачи администратора, представляющая таблицу jobs в базе данных."""
+    __tablename__ = "jobs"
+
+    # Уникальный идентификатор задачи
+    id = Column(Integer, primary_key=True, index=True)
+    # Тип задачи (import_students, import_teachers, report, reset_passwords_students, ...)
+    kind = Column(String, index=True)
+    # Состояние задачи (queued, running, done, failed)
+    status = Column(String, index=True, default="queued")
+    # Количество обработанных элементов
+    progress = Column(Integer, default=0)
+    # Общее количество элементов (0, если неизвестно)
+    total = Column(Integer, default=0)
+    # Итог выполнения или текст ошибки (опционально)
+    message = Column(Text, nullable=True)
+    # Путь к файлу-результату задачи (опционально)
+    artifact_path = Column(String, nullable=True)
+    # Имя файла-результата для скачивания (опционально)
+    artifact_name = Column(String, nullable=True)
+    # Процесс, выполняющий задачу, в формате "хост:pid"
+    owner = Column(String, nullable=True)
+    # Внешний ключ, связывающий с администратором, поставившим задачу
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Время постановки задачи в очередь
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Время завершения задачи (опционально)
+    finished_at = Column(DateTime, nullable=True)
+
+class TopicEvent(Base):
+    """Модель события изменения темы, представляющая таблицу topic_events (общая шина событий воркеров)."""
+    __tablename__ = "topic_events"
+
+    # Уникальный идентификатор события, возрастающий порядок доставки
+    id = Column(Integer, primary_key=True, index=True)
+    # Тип события (created, edited, assigned, freed, approved, unapproved)
+    kind = Column(String, nullable=False)
+    # Идентификатор темы
+    topic_id = Column(Integer, nullable=False)
+    # Идентификатор преподавателя темы (опционально)
+    teacher_id = Column(Integer, nullable=True)
+    # Время события
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
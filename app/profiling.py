@@ -0,0 +1,266 @@
+# app/profiling.py
+import asyncio
+import contextvars
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import jinja2
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from fastapi.templating import Jinja2Templates
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import config, database
+
+# Границы корзин гистограммы длительности запросов (в секундах)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    """Показатели одного HTTP-запроса, накапливаемые по ходу его обработки."""
+
+    __slots__ = ("sql_count", "sql_time", "template_time", "bcrypt_time", "sample", "profile")
+
+    def __init__(self, sample: bool = False):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.bcrypt_time = 0.0
+        # Нужно ли снять профиль cProfile с обработчика этого запроса
+        self.sample = sample
+        self.profile: Optional[cProfile.Profile] = None
+
+# Показатели текущего запроса. Объект изменяемый: потоки пула Starlette и очереди записи
+# получают копию контекста и пишут в тот же объект, что видит middleware
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def add_time(kind: str, seconds: float) -> None:
+    """Добавляет время к показателю kind ("template", "bcrypt") текущего запроса, если профилирование включено."""
+    stats = _current.get()
+    if stats is not None:
+        setattr(stats, f"{kind}_time", getattr(stats, f"{kind}_time") + seconds)
+
+class Metrics:
+    """Накопленные показатели по маршрутам в формате, пригодном для Prometheus."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.buckets: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.sql_count: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.sql_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.template_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.bcrypt_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.slow_profiles: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def observe(self, key: Tuple[str, str], wall: float, stats: RequestStats) -> None:
+        """Учитывает завершенный запрос."""
+        self.requests[key] += 1
+        self.duration[key] += wall
+        buckets = self.buckets[key]
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if wall <= bound:
+                buckets[index] += 1
+        self.sql_count[key] += stats.sql_count
+        self.sql_time[key] += stats.sql_time
+        self.template_time[key] += stats.template_time
+        self.bcrypt_time[key] += stats.bcrypt_time
+
+    def render(self) -> str:
+        """Возвращает показатели в текстовом формате экспозиции Prometheus."""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str, values: Dict[Tuple[str, str], float]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{{{_labels(key)}}} {value}")
+
+        family("app_requests_total", "counter", "Number of handled HTTP requests.", self.requests)
+        lines.append("# HELP app_request_duration_seconds Wall time of HTTP requests.")
+        lines.append("# TYPE app_request_duration_seconds histogram")
+        for key in sorted(self.requests):
+            labels = _labels(key)
+            for bound, count in zip(DURATION_BUCKETS, self.buckets[key]):
+                lines.append(f'app_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}} {self.requests[key]}')
+            lines.append(f"app_request_duration_seconds_sum{{{labels}}} {self.duration[key]}")
+            lines.append(f"app_request_duration_seconds_count{{{labels}}} {self.requests[key]}")
+        family("app_sql_queries_total", "counter", "SQL statements executed while handling requests.", self.sql_count)
+        family("app_sql_duration_seconds_total", "counter", "Time spent executing SQL statements.", self.sql_time)
+        family("app_template_duration_seconds_total", "counter", "Time spent rendering Jinja2 templates.", self.template_time)
+        family("app_bcrypt_duration_seconds_total", "counter", "Time spent hashing and verifying passwords.", self.bcrypt_time)
+        family("app_slow_profiles_total", "counter", "cProfile dumps saved for slow requests.", self.slow_profiles)
+        return "\n".join(lines) + "\n"
+
+def _labels(key: Tuple[str, str]) -> str:
+    """Форматирует метки method и route."""
+    method, route = key
+    return f'method="{method}",route="{route}"'
+
+metrics = Metrics()
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware, измеряющее каждый запрос.
+
+    Заголовок Server-Timing добавляется в начало ответа, поэтому для потоковых ответов
+    он отражает время до первого байта; в /metrics учитывается полное время запроса.
+    Доля запросов PROFILING_SAMPLE_RATE профилируется cProfile, и профиль сохраняется
+    в PROFILING_DIR, только если запрос оказался медленнее PROFILING_SLOW_REQUEST_MS.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sample = config.settings.PROFILING_SLOW_REQUEST_MS > 0 and random.random() < config.settings.PROFILING_SAMPLE_RATE
+        stats = RequestStats(sample=sample)
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(time.perf_counter() - started, stats).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            wall = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "other"
+            key = (scope["method"], route)
+            metrics.observe(key, wall, stats)
+            if stats.profile is not None and wall * 1000 >= config.settings.PROFILING_SLOW_REQUEST_MS:
+                _dump_profile(stats.profile, key, wall)
+                metrics.slow_profiles[key] += 1
+
+def _server_timing(wall: float, stats: RequestStats) -> str:
+    """Формирует значение заголовка Server-Timing (длительности в миллисекундах)."""
+    parts = [
+        f"app;dur={wall * 1000:.1f}",
+        f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"',
+        f"tpl;dur={stats.template_time * 1000:.1f}",
+    ]
+    if stats.bcrypt_time:
+        parts.append(f"bcrypt;dur={stats.bcrypt_time * 1000:.1f}")
+    return ", ".join(parts)
+
+def _dump_profile(profile: cProfile.Profile, key: Tuple[str, str], wall: float) -> None:
+    """Сохраняет профиль медленного запроса в PROFILING_DIR (открывается через pstats или snakeviz)."""
+    os.makedirs(config.settings.PROFILING_DIR, exist_ok=True)
+    method, route = key
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{slug}-{int(wall * 1000)}ms.prof"
+    pstats.Stats(profile).dump_stats(os.path.join(config.settings.PROFILING_DIR, name))
+
+# Профилировщик обработчика асинхронного маршрута работает в потоке цикла событий;
+# одновременно в потоке может быть активен только один профилировщик
+_loop_profiler_busy = False
+
+def _profiled(call):
+    """Оборачивает обработчик маршрута: при выборке запроса выполняет его под cProfile."""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(*args, **kwargs):
+            global _loop_profiler_busy
+            stats = _current.get()
+            if stats is None or not stats.sample or _loop_profiler_busy:
+                return await call(*args, **kwargs)
+            # Пока обработчик ждет await, в этом же потоке выполняются другие запросы,
+            # поэтому профиль асинхронного маршрута может содержать и их вызовы
+            _loop_profiler_busy = True
+            stats.profile = cProfile.Profile()
+            stats.profile.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                stats.profile.disable()
+                _loop_profiler_busy = False
+        return async_wrapper
+
+    @functools.wraps(call)
+    def sync_wrapper(*args, **kwargs):
+        stats = _current.get()
+        if stats is None or not stats.sample:
+            return call(*args, **kwargs)
+        # Синхронный обработчик выполняется в отдельном потоке пула, профиль потока не смешивается с другими
+        stats.profile = cProfile.Profile()
+        stats.profile.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            stats.profile.disable()
+    return sync_wrapper
+
+# Время начала хранится в контексте выполнения запроса, а не в соединении: при ошибке
+# after_cursor_execute не вызывается, и контекст отбрасывается вместе с ней
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profiling_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profiling_started", None)
+    stats = _current.get()
+    if stats is not None and started is not None:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - started
+
+def instrument_engine(engine: Engine) -> None:
+    """Подписывает учет SQL-запросов на события движка."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class _TimedTemplate(jinja2.Template):
+    """Шаблон Jinja2, учитывающий время рендеринга в показателях текущего запроса."""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            add_time("template", time.perf_counter() - started)
+
+async def metrics_endpoint(request: Request):
+    """
+    Отдает накопленные показатели в текстовом формате Prometheus.
+
+    Доступ есть только с адресов PROFILING_METRICS_ALLOWED_HOSTS: показатели раскрывают
+    маршруты и нагрузку, а токены доступа сборщику метрик не выдаются.
+    """
+    allowed = {host.strip() for host in config.settings.PROFILING_METRICS_ALLOWED_HOSTS.split(",") if host.strip()}
+    if request.client is None or request.client.host not in allowed:
+        return PlainTextResponse("Доступ запрещен.", status_code=403)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def install(app: FastAPI, templates: Jinja2Templates) -> None:
+    """
+    Включает профилирование приложения: middleware, учет SQL и шаблонов, эндпоинт /metrics.
+
+    Вызывается после объявления всех маршрутов, чтобы обернуть их обработчики для cProfile.
+    """
+    instrument_engine(database.engine)
+    instrument_engine(database.async_engine.sync_engine)
+    if database.write_queue is not None:
+        instrument_engine(database.writer_engine)
+    templates.env.template_class = _TimedTemplate
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            # FastAPI выбирает способ вызова (await или пул потоков) при создании маршрута,
+            # поэтому обертка сохраняет синхронность исходного обработчика
+            route.dependant.call = _profiled(route.dependant.call)
+    app.add_middleware(ProfilingMiddleware)
@@ -0,0 +1,115 @@
+# app/report_snapshot.py
+from typing import Iterable, Iterator, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, union
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+
+# Тексты статусов в итоговом отчете
+STUDENT_ASSIGNED = "Тема закреплена"
+STUDENT_FREE = "Тема свободна"
+TEACHER_APPROVED = "Студент и тема согласованы"
+TEACHER_PENDING = "Ожидает согласования"
+# Колонки снимка в порядке колонок отчета
+SNAPSHOT_COLUMNS = (
+    "topic_id", "work_type", "teacher_name", "title", "description",
+    "student_name", "student_status", "teacher_status", "correction",
+)
+# Размер пачки тем при обновлении снимка: ограничивает число параметров в одном SQL-запросе
+REFRESH_CHUNK_SIZE = 500
+# Количество строк, которые драйвер выбирает за раз при чтении снимка
+SCAN_BATCH_SIZE = 1000
+
+def _source_select():
+    """Запрос, вычисляющий строки снимка по текущим данным тем и пользователей."""
+    teacher = aliased(models.User)
+    student_user = aliased(models.User)
+    has_student = models.Topic.student_id.isnot(None)
+    return select(
+        models.Topic.id,
+        models.Topic.work_type,
+        func.coalesce(teacher.full_name, ""),
+        models.Topic.title,
+        func.coalesce(models.Topic.description, ""),
+        func.coalesce(student_user.full_name, ""),
+        case((has_student, STUDENT_ASSIGNED), else_=STUDENT_FREE),
+        case((~has_student, ""), (models.Topic.is_approved, TEACHER_APPROVED), else_=TEACHER_PENDING),
+        literal(""),
+    ).select_from(models.Topic).outerjoin(
+        teacher, teacher.id == models.Topic.teacher_id
+    ).outerjoin(
+        models.Student, models.Student.id == models.Topic.student_id
+    ).outerjoin(
+        student_user, student_user.id == models.Student.user_id
+    )
+
+def _stored_select():
+    """Запрос, читающий строки снимка из таблицы report_rows."""
+    return select(*(getattr(models.ReportRow, name) for name in SNAPSHOT_COLUMNS))
+
+# Запросы обновления снимка строятся один раз: построение выражения SQLAlchemy заметно
+# дороже самого запроса по первичному ключу, а готовый запрос берется из кэша компиляции
+_SOURCE = _source_select()
+_REPORT_ROWS = models.ReportRow.__table__
+_DELETE_TOPICS = delete(_REPORT_ROWS).where(_REPORT_ROWS.c.topic_id.in_(bindparam("topic_ids", expanding=True)))
+_INSERT_TOPICS = insert(_REPORT_ROWS).from_select(
+    SNAPSHOT_COLUMNS, _SOURCE.where(models.Topic.id.in_(bindparam("topic_ids", expanding=True)))
+)
+
+def refresh(db: Session, topic_ids: Iterable[int]) -> None:
+    """
+    Пересчитывает строки снимка для тем topic_ids в текущей транзакции.
+
+    Вызывается изменяющими функциями crud перед фиксацией: строка темы удаляется
+    и заново вставляется одним INSERT ... SELECT, поэтому снимок меняется атомарно
+    вместе с самой темой. Несохраненные изменения сессии предварительно сбрасываются в базу.
+    """
+    topic_ids = list(topic_ids)
+    db.flush()
+    for start in range(0, len(topic_ids), REFRESH_CHUNK_SIZE):
+        params = {"topic_ids": topic_ids[start:start + REFRESH_CHUNK_SIZE]}
+        db.execute(_DELETE_TOPICS, params)
+        db.execute(_INSERT_TOPICS, params)
+
+def rebuild(db: Session) -> int:
+    """Полностью пересобирает снимок по текущим данным и возвращает количество строк."""
+    db.execute(delete(_REPORT_ROWS))
+    db.execute(insert(_REPORT_ROWS).from_select(SNAPSHOT_COLUMNS, _SOURCE))
+    count = db.execute(select(func.count()).select_from(models.ReportRow)).scalar()
+    db.commit()
+    return count
+
+def count_mismatches(db: Session) -> int:
+    """
+    Возвращает количество тем, строки которых в снимке расходятся с данными.
+
+    Учитываются строки, которые отличаются, отсутствуют в снимке или остались
+    в нем после удаления темы. 0 означает, что снимок согласован.
+    """
+    missing = _SOURCE.except_(_stored_select()).subquery()
+    stale = _stored_select().except_(_SOURCE).subquery()
+    topics = union(select(missing.c[0]), select(stale.c[0])).subquery()
+    return db.execute(select(func.count()).select_from(topics)).scalar()
+
+def ensure(db: Session) -> None:
+    """
+    Создает таблицу снимка в базе, созданной до ее появления.
+
+    Снимок перестраивается, если он расходится с данными (та же проверка count_mismatches,
+    что и у rebuild_report.py --check): например, темы или пользователи менялись в обход crud.
+    """
+    models.ReportRow.__table__.create(bind=db.connection(), checkfirst=True)
+    if count_mismatches(db):
+        rebuild(db)
+    else:
+        db.commit()
+
+def iter_rows(db: Session) -> Iterator[Tuple]:
+    """Возвращает строки отчета (без идентификатора темы) одним последовательным чтением снимка."""
+    columns = (getattr(models.ReportRow, name) for name in SNAPSHOT_COLUMNS[1:])
+    result = db.execute(
+        select(*columns).order_by(models.ReportRow.topic_id).execution_options(yield_per=SCAN_BATCH_SIZE)
+    )
+    for row in result:
+        yield tuple(row)
@@ -0,0 +1,58 @@
+# app/reports.py
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import report_snapshot, tabular
+from .database import SessionLocal
+
+# Заголовки колонок итогового отчета
+REPORT_HEADERS = (
+    "Тип работы", "ФИО преподавателя", "Тема от преподавателя", "Описание темы",
+    "ФИО студента", "Текущий статус для студента", "Статус от преподавателя", "Корректировка темы",
+)
+# Размер блока при отдаче файла клиенту
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def iter_report_rows(db: Session) -> Iterator[Tuple]:
+    """Построчно возвращает итоговый отчет по всем темам из снимка report_rows (см. app/report_snapshot.py)."""
+    return report_snapshot.iter_rows(db)
+
+def write_report_xlsx(rows: Iterable[Tuple], output) -> int:
+    """
+    Записывает строки отчета в Excel-файл output (путь или файловый объект).
+
+    Строки сразу сериализуются в сжатый лист (см. app/tabular.py) и не накапливаются
+    в памяти. Возвращает количество записанных строк.
+    """
+    return tabular.write_xlsx(rows, output, sheet_name='Report', headers=REPORT_HEADERS)
+
+# Потоковые генераторы открывают собственную сессию: сессия запроса закрывается
+# зависимостью get_db до того, как тело ответа начинает отправляться клиенту
+
+def stream_report_xlsx() -> Iterator[bytes]:
+    """Построчно отдает Excel-отчет: сжатые части архива уходят клиенту по мере чтения снимка."""
+    db = SessionLocal()
+    try:
+        yield from tabular.iter_xlsx(iter_report_rows(db), STREAM_CHUNK_SIZE, sheet_name='Report', headers=REPORT_HEADERS)
+    finally:
+        db.close()
+
+def stream_report_csv() -> Iterator[bytes]:
+    """Построчно отдает итоговый отчет в формате CSV, первая порция уходит сразу после первой страницы тем."""
+    db = SessionLocal()
+    try:
+        yield from tabular.iter_csv(iter_report_rows(db), REPORT_HEADERS, STREAM_CHUNK_SIZE)
+    finally:
+        db.close()
+
+def write_credentials_xlsx(credentials: List[Dict], output, sheet_name: str = 'Sheet1') -> None:
+    """Записывает новые учетные данные пользователей в Excel-файл output."""
+    headers = list(credentials[0]) if credentials else None
+    tabular.write_xlsx((list(row.values()) for row in credentials), output, sheet_name=sheet_name, headers=headers)
+
+def stream_credentials_xlsx(credentials: List[Dict], sheet_name: str = 'Sheet1') -> Iterator[bytes]:
+    """Отдает Excel-файл с учетными данными блоками, не сохраняя его на диск."""
+    headers = list(credentials[0]) if credentials else None
+    yield from tabular.iter_xlsx((list(row.values()) for row in credentials), STREAM_CHUNK_SIZE,
+                                 sheet_name=sheet_name, headers=headers)
@@ -1,6 +1,7 @@
 # app/schemas.py
 from pydantic import BaseModel
-from typing import Optional, List
+from datetime import datetime
+from typing import Dict, Optional, List
 
 # --- Схемы для пользователей ---
 class UserBase(BaseModel):
@@ -19,6 +20,18 @@ class User(UserBase):
     class Config:
         from_attributes = True  # Позволяет создавать экземпляры из ORM-объектов
 
+class Principal(BaseModel):
+    """Схема аутентифицированного пользователя, кэшируемая между запросами вместо ORM-объекта."""
+    id: int  # Уникальный идентификатор пользователя
+    username: str  # Имя пользователя (email)
+    full_name: str  # Полное имя пользователя
+    role: str  # Роль пользователя (admin, teacher, student)
+    student_profile_id: Optional[int] = None  # Идентификатор профиля студента (опционально)
+    student_group: Optional[str] = None  # Учебная группа студента (опционально)
+    teacher_profile_id: Optional[int] = None  # Идентификатор профиля преподавателя (опционально)
+    class Config:
+        frozen = True  # Экземпляр разделяется между запросами и не должен изменяться
+
 # --- Схемы для профилей ---
 class Student(BaseModel):
     """Схема профиля студента."""
@@ -54,3 +67,59 @@ class Topic(TopicBase):
     student: Optional[Student] = None  # Студент, назначенный на тему (опционально)
     class Config:
         from_attributes = True  # Позволяет создавать экземпляры из ORM-объектов
+
+class CatalogueTopic(BaseModel):
+    """Схема свободной темы в каталоге для студентов."""
+    id: int  # Уникальный идентификатор темы
+    title: str  # Название темы
+    description: Optional[str] = None  # Описание темы (опционально)
+    work_type: str  # Тип работы
+    teacher_id: int  # Идентификатор преподавателя
+    teacher_name: str  # ФИО преподавателя
+
+class TopicCataloguePage(BaseModel):
+    """Схема страницы каталога свободных тем."""
+    items: List[CatalogueTopic]  # Темы текущей страницы
+    next_after: Optional[int] = None  # Значение after для следующей страницы (None, если страница последняя)
+
+# --- Схемы для импорта ---
+class ImportSummary(BaseModel):
+    """Итог массового импорта пользователей из файла."""
+    created: int = 0  # Количество созданных пользователей
+    skipped: int = 0  # Количество строк с уже существующим email
+    invalid: int = 0  # Количество строк с пустыми обязательными полями
+    hashes_per_second: float = 0.0  # Скорость хэширования паролей новых пользователей
+    rejected_reasons: Dict[str, int] = {}  # Количество отклоненных строк по кодам причин
+
+# --- Схемы для распределения тем ---
+class AllocationSummary(BaseModel):
+    """Итог распределения тем по спискам предпочтений."""
+    students: int = 0  # Количество студентов без темы, подавших списки
+    assigned: int = 0  # Количество студентов, получивших тему
+    unassigned: int = 0  # Количество студентов, которым не досталась ни одна тема из списка
+    by_rank: Dict[int, int] = {}  # Количество студентов по месту полученной темы в списке (1 — первая)
+    seed: int = 0  # Зерно жеребьевки приоритета студентов
+    solve_seconds: float = 0.0  # Время расчета распределения
+    total_seconds: float = 0.0  # Время с учетом чтения данных и записи результата
+
+# --- Схемы для фоновых задач ---
+class Job(BaseModel):
+    """Схема состояния фоновой задачи для возврата данных."""
+    id: int  # Уникальный идентификатор задачи
+    kind: str  # Тип задачи
+    status: str  # Состояние задачи (queued, running, done, failed)
+    progress: int  # Количество обработанных элементов
+    total: int  # Общее количество элементов
+    message: Optional[str] = None  # Итог выполнения или текст ошибки
+    artifact_name: Optional[str] = None  # Имя файла-результата
+    created_at: datetime  # Время постановки в очередь
+    finished_at: Optional[datetime] = None  # Время завершения
+    class Config:
+        from_attributes = True  # Позволяет создавать экземпляры из ORM-объектов
+
+class TopicEvent(BaseModel):
+    """Схема события изменения темы, передаваемого клиентам через Server-Sent Events."""
+    id: int  # Порядковый номер события
+    kind: str  # Тип события (created, edited, assigned, freed, approved, unapproved)
+    topic_id: int  # Идентификатор темы
+    teacher_id: Optional[int] = None  # Идентификатор преподавателя темы
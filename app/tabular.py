@@ -0,0 +1,209 @@
+# app/tabular.py
+import csv
+import io
+import math
+import numbers
+import re
+import zipfile
+from typing import Iterable, Iterator, Optional, Sequence
+from xml.sax.saxutils import escape
+
+# Легкая запись таблиц в XLSX и CSV без pandas и openpyxl: модуль загружается вместе
+# с приложением, поэтому зависит только от стандартной библиотеки. Чтение загружаемых
+# файлов (pandas, openpyxl) вынесено в app/importer.py и подключается только фоновыми задачами.
+
+# MIME-тип Excel-файла
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Количество строк листа, сериализуемых в XML за одну запись в архив
+XLSX_ROWS_PER_WRITE = 1000
+# Максимальная длина имени листа в Excel
+MAX_SHEET_NAME_LENGTH = 31
+# Символы, недопустимые в XML 1.0 (кроме табуляции и переводов строк)
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# Символы, недопустимые в имени листа Excel
+_ILLEGAL_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Минимальная таблица стилей: без нее часть версий Excel предлагает "восстановить" файл
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+def _xlsx_cell(value) -> str:
+    """Сериализует значение в ячейку листа: числа — числовые ячейки, остальное — строки."""
+    if isinstance(value, str):
+        text = escape(_ILLEGAL_XML_CHARS.sub("", value))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    # numbers учитывает и числовые типы numpy из таблиц pandas
+    if isinstance(value, numbers.Integral):
+        return f'<c><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        # NaN и бесконечности в Excel не представимы
+        if not math.isfinite(value):
+            return '<c/>'
+        return f'<c><v>{value!r}</v></c>'
+    return _xlsx_cell(str(value))
+
+def _xlsx_row(row: Iterable) -> str:
+    """Сериализует строку таблицы в элемент row листа."""
+    return '<row>' + ''.join(map(_xlsx_cell, row)) + '</row>'
+
+def _sheet_name(name: str) -> str:
+    """Приводит имя листа к ограничениям Excel."""
+    name = _ILLEGAL_SHEET_CHARS.sub("_", name)[:MAX_SHEET_NAME_LENGTH]
+    return escape(name or "Sheet1", {'"': "&quot;"})
+
+class _ChunkBuffer:
+    """
+    Файловый объект только для записи, накапливающий байты до передачи клиенту.
+
+    Метода tell нет, поэтому zipfile пишет архив без перемотки назад: размеры
+    и контрольные суммы записываются после данных каждого файла (data descriptor).
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        """Возвращает накопленные байты и очищает буфер."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+def write_xlsx(rows: Iterable[Sequence], output, sheet_name: str = 'Sheet1',
+               headers: Optional[Sequence[str]] = None) -> int:
+    """
+    Записывает строки в Excel-файл output (путь или файловый объект) с одним листом.
+
+    Лист сериализуется напрямую в сжатый поток ZIP-архива порциями по XLSX_ROWS_PER_WRITE
+    строк, поэтому память не растет с размером таблицы. Строки записываются как
+    встроенные (inlineStr), без таблицы общих строк. Возвращает количество строк данных.
+    """
+    count = 0
+    for count in _write_xlsx_portions(rows, output, sheet_name, headers):
+        pass
+    return count
+
+def iter_xlsx(rows: Iterable[Sequence], chunk_size: int, sheet_name: str = 'Sheet1',
+              headers: Optional[Sequence[str]] = None) -> Iterator[bytes]:
+    """
+    Формирует Excel-файл с одним листом и отдает его блоками около chunk_size байт.
+
+    Архив пишется в поток без перемотки, поэтому первый блок уходит клиенту, как только
+    накопится chunk_size сжатых байт, а не после сборки всего файла.
+    """
+    buffer = _ChunkBuffer()
+    for _ in _write_xlsx_portions(rows, buffer, sheet_name, headers):
+        if buffer.size >= chunk_size:
+            yield buffer.drain()
+    yield buffer.drain()
+
+def _write_xlsx_portions(rows: Iterable[Sequence], output, sheet_name: str,
+                         headers: Optional[Sequence[str]]) -> Iterator[int]:
+    """Записывает книгу в output; после каждой записанной порции листа и в конце возвращает число строк данных."""
+    count = 0
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _WORKBOOK.format(name=_sheet_name(sheet_name)))
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/styles.xml", _STYLES)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            parts = [_SHEET_START]
+            if headers is not None:
+                parts.append(_xlsx_row(headers))
+            for row in rows:
+                parts.append(_xlsx_row(row))
+                count += 1
+                if len(parts) >= XLSX_ROWS_PER_WRITE:
+                    sheet.write(''.join(parts).encode("utf-8"))
+                    parts.clear()
+                    yield count
+            parts.append(_SHEET_END)
+            sheet.write(''.join(parts).encode("utf-8"))
+    yield count
+
+def iter_csv(rows: Iterable[Sequence], headers: Sequence[str], chunk_size: int) -> Iterator[bytes]:
+    """
+    Построчно формирует CSV в кодировке UTF-8 с BOM и отдает его блоками около chunk_size байт.
+
+    BOM нужен, чтобы Excel правильно определил кодировку UTF-8.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
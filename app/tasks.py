@@ -0,0 +1,73 @@
+# app/tasks.py
+import json
+import os
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from . import auth, config, crud, reports
+from .jobs import JobContext, task
+
+@task("import_students")
+def import_students(db: Session, context: JobContext, path: str, filename: str):
+    """Импортирует студентов из загруженного файла."""
+    return _import_users(db, context, path, filename, role='student')
+
+@task("import_teachers")
+def import_teachers(db: Session, context: JobContext, path: str, filename: str):
+    """Импортирует преподавателей из загруженного файла."""
+    return _import_users(db, context, path, filename, role='teacher')
+
+def _import_users(db: Session, context: JobContext, path: str, filename: str, role: str):
+    """Читает сохраненный файл загрузки пачками, импортирует пользователей и удаляет файл."""
+    # pandas и openpyxl загружаются только при первом импорте, а не при запуске воркера
+    from . import importer
+    try:
+        total = importer.count_upload_rows(path, filename)
+        context.progress(0, total)
+        chunks = importer.iter_upload(path, filename, role=role, chunk_size=config.settings.IMPORT_CHUNK_SIZE)
+        # Отклоненные строки сохраняются как результат задачи, доступный для скачивания
+        summary = importer.import_users(
+            db, chunks, role=role, total=total, progress=context.progress,
+            on_rejected=lambda rejected: importer.write_rejected_rows(rejected, context.artifact("rejected_rows.xlsx"))
+        )
+    finally:
+        os.remove(path)
+    return json.dumps(summary.dict(), ensure_ascii=False)
+
+@task("report")
+def build_report(db: Session, context: JobContext):
+    """Формирует Excel-отчет по всем темам."""
+    rows = reports.write_report_xlsx(reports.iter_report_rows(db), context.artifact("coursework_report.xlsx"))
+    context.progress(rows, rows)
+    return json.dumps({"rows": rows})
+
+@task("allocate_topics")
+def allocate_topics(db: Session, context: JobContext, capacity: Optional[int] = None):
+    """Распределяет свободные темы по спискам предпочтений студентов без темы."""
+    from . import allocation
+    summary = allocation.run_allocation(db, capacity=capacity)
+    context.progress(summary.students, summary.students)
+    return json.dumps(summary.dict(), ensure_ascii=False)
+
+@task("reset_passwords_students", one_time_artifact=True)
+def reset_student_passwords(db: Session, context: JobContext, group: Optional[str] = None):
+    """Сбрасывает пароли студентов (всех или одной группы) и сохраняет файл с новыми учетными данными."""
+    return _reset_passwords(db, context, role="student", filename="students_new_credentials.xlsx",
+                            sheet_name='Sheet1', group=group)
+
+@task("reset_passwords_teachers", one_time_artifact=True)
+def reset_teacher_passwords(db: Session, context: JobContext):
+    """Сбрасывает пароли всех преподавателей и сохраняет файл с новыми учетными данными."""
+    return _reset_passwords(db, context, role="teacher", filename="teachers_new_credentials.xlsx",
+                            sheet_name='Teacher Credentials')
+
+def _reset_passwords(db: Session, context: JobContext, role: str, filename: str, sheet_name: str,
+                     group: Optional[str] = None):
+    """Сбрасывает пароли пользователей с ролью role и записывает учетные данные в файл."""
+    targets = crud.get_password_reset_targets(db, role=role, group=group)
+    context.progress(0, len(targets))
+    credentials, hash_rate = auth.reset_user_passwords(db, targets)
+    reports.write_credentials_xlsx(credentials, context.artifact(filename), sheet_name=sheet_name)
+    context.progress(len(credentials), len(credentials))
+    return json.dumps({"users": len(credentials), "hashes_per_second": round(hash_rate)})
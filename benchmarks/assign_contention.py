@@ -0,0 +1,136 @@
+# benchmarks/assign_contention.py
+"""
+Нагрузочная проверка атомарного назначения тем.
+
+Множество потоков одновременно пытаются записать студентов на небольшой набор
+популярных тем через crud.try_assign_topic. После прогона проверяется, что ни одна
+тема не закреплена за двумя студентами и ни один студент не получил две темы.
+Та же проверка в меньшем масштабе выполняется тестом tests/test_assign_contention.py.
+
+Запуск из корня проекта: python -m benchmarks.assign_contention --students 500 --topics 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append('.')
+
+from app import crud, models
+from app.database import Base
+
+def seed(SessionLocal, students: int, topics: int):
+    """Создает преподавателя, студентов и свободные темы; возвращает их идентификаторы."""
+    db = SessionLocal()
+    try:
+        teacher = models.User(username="teacher@bench", full_name="Преподаватель", role="teacher", hashed_password="-")
+        db.add(teacher)
+        db.flush()
+        topic_ids = []
+        for i in range(topics):
+            topic = models.Topic(title=f"Популярная тема {i}", work_type="coursework", teacher_id=teacher.id)
+            db.add(topic)
+            db.flush()
+            topic_ids.append(topic.id)
+        student_ids = []
+        for i in range(students):
+            user = models.User(username=f"student{i}@bench", full_name=f"Студент {i}", role="student", hashed_password="-")
+            db.add(user)
+            db.flush()
+            profile = models.Student(user_id=user.id, group="БЕНЧ-1")
+            db.add(profile)
+            db.flush()
+            student_ids.append(profile.id)
+        db.commit()
+        return student_ids, topic_ids
+    finally:
+        db.close()
+
+def run(SessionLocal, student_ids, topic_ids, threads: int, attempts: int):
+    """Запускает конкурентные попытки записи и возвращает счетчик результатов и время прогона."""
+    results = Counter()
+    lock = threading.Lock()
+    queue = list(student_ids)
+    random.shuffle(queue)
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        db = SessionLocal()
+        barrier.wait()
+        try:
+            while True:
+                with lock:
+                    if not queue:
+                        return
+                    student_id = queue.pop()
+                # Каждый студент пытается занять несколько популярных тем подряд, как при обновлении страницы
+                for topic_id in random.sample(topic_ids, min(attempts, len(topic_ids))):
+                    try:
+                        result = crud.try_assign_topic(db, topic_id=topic_id, student_profile_id=student_id)
+                    except OperationalError:
+                        db.rollback()
+                        result = "database_locked"
+                    with lock:
+                        results[result] += 1
+                    if result == crud.ASSIGNED:
+                        break
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return results, time.perf_counter() - started
+
+def verify(SessionLocal, topics: int) -> bool:
+    """Проверяет отсутствие двойных назначений."""
+    db = SessionLocal()
+    try:
+        assigned = db.query(models.Topic.student_id).filter(models.Topic.student_id.isnot(None)).all()
+        student_ids = [row[0] for row in assigned]
+        duplicates = [sid for sid, count in Counter(student_ids).items() if count > 1]
+        taken = db.query(func.count(models.Topic.id)).filter(models.Topic.student_id.isnot(None)).scalar()
+        print(f"Занято тем: {taken} из {topics}; студентов с несколькими темами: {len(duplicates)}")
+        return not duplicates and taken <= topics
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Конкурентная запись студентов на популярные темы")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=3, help="Сколько тем пробует каждый студент")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            connect_args={"check_same_thread": False, "timeout": 30}
+        )
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        student_ids, topic_ids = seed(SessionLocal, args.students, args.topics)
+        results, elapsed = run(SessionLocal, student_ids, topic_ids, args.threads, args.attempts)
+        total = sum(results.values())
+        print(f"Попыток: {total} за {elapsed:.2f} с ({total / elapsed:.0f} в секунду)")
+        for result, count in sorted(results.items()):
+            print(f"  {result}: {count}")
+        ok = verify(SessionLocal, args.topics)
+        engine.dispose()
+    print("[УСПЕХ] Двойных назначений нет." if ok else "[ОШИБКА] Обнаружены двойные назначения!")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
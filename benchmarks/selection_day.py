@@ -0,0 +1,308 @@
+# benchmarks/selection_day.py
+"""
+Нагрузочный сценарий "день выбора тем".
+
+Скрипт создает отдельную базу во временном каталоге, заполняет её студентами и
+преподавателями из students1.xlsx и teachers.xlsx (синтетически размноженными в
+--scale раз) и прогоняет реальные маршруты приложения через ASGI-клиент в том же
+процессе:
+
+  1. все студенты входят через POST /login;
+  2. каждый студент несколько раз открывает /dashboard (повторно — с If-None-Match);
+  3. все студенты одновременно записываются на темы (POST /student/assign-topic/{id});
+  4. преподаватели входят, открывают /dashboard и утверждают заявки (POST /teacher/approve-topic/{id});
+  5. администратор скачивает /admin/report/download.
+
+Для каждого маршрута выводятся p50/p95/p99 задержки, пропускная способность и число
+SQL-запросов на запрос. Результаты можно сохранить как эталон (--save-baseline)
+и сравнивать с ним последующие прогоны.
+
+Запуск из корня проекта: python -m benchmarks.selection_day --scale 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.append('.')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+# Пароль всех синтетических пользователей
+PASSWORD = "selection-day"
+
+# Число SQL-запросов, выполненных всеми движками приложения. Запросы идут из потоков
+# aiosqlite, пула Starlette и очереди записи, поэтому контекст запроса туда не доходит;
+# фазы сценария выполняются по очереди, и запросы фазы делятся на число её HTTP-запросов
+_queries = [0]
+
+def _count_query(*args):
+    """Обработчик события before_cursor_execute: увеличивает общий счетчик запросов."""
+    _queries[0] += 1
+
+class Recorder:
+    """Накапливает задержки, статусы и число SQL-запросов по маршрутам."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.elapsed = defaultdict(float)
+
+    async def request(self, client, route: str, method: str, url: str, **kwargs):
+        """Выполняет запрос, измеряя время."""
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def summary(self):
+        """Возвращает сводку по маршрутам: перцентили задержки в мс, запросы в секунду, SQL на запрос."""
+        result = {}
+        for route, values in self.latencies.items():
+            ordered = sorted(values)
+            result[route] = {
+                "requests": len(values),
+                "errors": self.errors[route],
+                "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+                "throughput_rps": round(len(values) / self.elapsed[route], 1) if self.elapsed[route] else 0.0,
+                "queries_per_request": round(self.queries[route] / len(values), 2),
+            }
+        return result
+
+def _percentile(ordered, percent):
+    """Возвращает перцентиль отсортированного списка методом ближайшего ранга."""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def seed(scale: int):
+    """Заполняет базу синтетическими пользователями; возвращает списки логинов студентов и преподавателей."""
+    import pandas as pd
+    from app import auth, crud, models
+    from app.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    hashed_password = auth.pwd_context.hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        def replicate(df, profile_columns):
+            rows = []
+            for copy in range(scale):
+                for record in df.to_dict('records'):
+                    local, _, domain = str(record['email']).partition('@')
+                    rows.append({
+                        "username": f"{local}+{copy}@{domain}",
+                        "full_name": record['full_name'],
+                        "hashed_password": hashed_password,
+                        "profile": {column: (None if pd.isna(record.get(column)) else record.get(column))
+                                    for column in profile_columns},
+                    })
+            return rows
+
+        students = replicate(pd.read_excel(os.path.join(PROJECT_ROOT, "students1.xlsx")), ("group", "profile"))
+        teachers = replicate(pd.read_excel(os.path.join(PROJECT_ROOT, "teachers.xlsx")), ("degree", "title", "position"))
+        crud.bulk_create_users_with_profiles(db, role="student", rows=students)
+        crud.bulk_create_users_with_profiles(db, role="teacher", rows=teachers)
+        admin = {"username": "admin@bench", "full_name": "Администратор", "role": "admin", "hashed_password": hashed_password}
+        db.add(models.User(**admin))
+        db.commit()
+        return [row["username"] for row in students], [row["username"] for row in teachers]
+    finally:
+        db.close()
+
+async def run_phase(recorder: Recorder, route: str, coroutines, concurrency: int):
+    """Выполняет корутины фазы с ограничением параллелизма, засекает время и число SQL-запросов фазы."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    queries_before = _queries[0]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(coroutine) for coroutine in coroutines))
+    recorder.elapsed[route] += time.perf_counter() - started
+    recorder.queries[route] += _queries[0] - queries_before
+    return results
+
+async def login(recorder: Recorder, client, route: str, username: str):
+    """Входит в систему и возвращает токен из адреса перенаправления."""
+    response = await recorder.request(client, route, "POST", "/login",
+                                      data={"username": username, "password": PASSWORD})
+    location = response.headers.get("location", "")
+    return location.split("token=", 1)[1] if "token=" in location else None
+
+async def scenario(args, students, teachers):
+    """Прогоняет сценарий дня выбора тем и возвращает сводку по маршрутам."""
+    import httpx
+    from sqlalchemy import event
+    from app import crud
+    from app import database
+    from app.database import SessionLocal
+    from app.main import app
+
+    engines = [database.engine, database.async_engine.sync_engine]
+    if database.write_queue is not None:
+        engines.append(database.writer_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _count_query)
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", follow_redirects=False) as client:
+        student_tokens = await run_phase(
+            recorder, "POST /login", (login(recorder, client, "POST /login", name) for name in students), args.concurrency
+        )
+        student_tokens = [token for token in student_tokens if token]
+
+        async def refresh(token):
+            # Как браузер, повторные обновления страницы отправляют If-None-Match с полученным ETag
+            etag = None
+            for _ in range(args.refreshes):
+                headers = {"If-None-Match": etag} if etag else {}
+                response = await recorder.request(client, "GET /dashboard (student)", "GET", "/dashboard",
+                                                  params={"token": token}, headers=headers)
+                etag = response.headers.get("etag", etag)
+
+        await run_phase(recorder, "GET /dashboard (student)",
+                        (refresh(token) for token in student_tokens), args.concurrency)
+
+        db = SessionLocal()
+        topic_ids = [topic.id for chunk in crud.iter_topics_chunked(db) for topic in chunk]
+        db.close()
+        # Часть тем популярна: за них одновременно борется большинство студентов
+        popular = random.sample(topic_ids, max(1, len(topic_ids) // 10))
+
+        async def assign(token):
+            for _ in range(3):
+                topic_id = random.choice(popular) if random.random() < 0.7 else random.choice(topic_ids)
+                response = await recorder.request(client, "POST /student/assign-topic/{id}", "POST",
+                                                  f"/student/assign-topic/{topic_id}", data={"token": token})
+                if "error=" not in response.headers.get("location", ""):
+                    return
+
+        await run_phase(recorder, "POST /student/assign-topic/{id}",
+                        (assign(token) for token in student_tokens), args.concurrency)
+
+        teacher_tokens = await run_phase(
+            recorder, "POST /login", (login(recorder, client, "POST /login", name) for name in teachers), args.concurrency
+        )
+        teacher_tokens = [token for token in teacher_tokens if token]
+        await run_phase(recorder, "GET /dashboard (teacher)", (
+            recorder.request(client, "GET /dashboard (teacher)", "GET", "/dashboard", params={"token": token})
+            for token in teacher_tokens
+        ), args.concurrency)
+
+        db = SessionLocal()
+        approvals = []
+        for token, name in zip(teacher_tokens, teachers):
+            teacher = crud.get_user_by_username(db, name)
+            approvals += [(token, topic.id) for topic in crud.get_topics_by_teacher(db, teacher.id) if topic.student_id]
+        db.close()
+        await run_phase(recorder, "POST /teacher/approve-topic/{id}", (
+            recorder.request(client, "POST /teacher/approve-topic/{id}", "POST",
+                             f"/teacher/approve-topic/{topic_id}", data={"token": token})
+            for token, topic_id in approvals
+        ), args.concurrency)
+
+        admin_token, = await run_phase(recorder, "POST /login",
+                                       [login(recorder, client, "POST /login", "admin@bench")], 1)
+        await run_phase(recorder, "GET /admin/report/download", (
+            recorder.request(client, "GET /admin/report/download", "GET", "/admin/report/download",
+                             params={"token": admin_token})
+            for _ in range(args.reports)
+        ), 2)
+    return recorder.summary()
+
+def compare(results, baseline, threshold: float) -> bool:
+    """Печатает отклонения p95 и пропускной способности от эталона; возвращает False при регрессии."""
+    ok = True
+    print("\nСравнение с эталоном (p95, пропускная способность):")
+    for route, current in results.items():
+        reference = baseline.get(route)
+        if not reference:
+            print(f"  {route}: нет в эталоне")
+            continue
+        p95_change = (current["p95_ms"] - reference["p95_ms"]) / reference["p95_ms"] * 100 if reference["p95_ms"] else 0.0
+        rps_change = ((current["throughput_rps"] - reference["throughput_rps"]) / reference["throughput_rps"] * 100
+                      if reference["throughput_rps"] else 0.0)
+        regressed = p95_change > threshold or rps_change < -threshold
+        ok = ok and not regressed
+        mark = "РЕГРЕССИЯ" if regressed else "ok"
+        print(f"  {route}: p95 {p95_change:+.1f}%, rps {rps_change:+.1f}% [{mark}]")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный сценарий дня выбора тем")
+    parser.add_argument("--scale", type=int, default=5, help="Во сколько раз размножить списки из xlsx")
+    parser.add_argument("--topics-per-teacher", type=int, default=0,
+                        help="Тем на преподавателя (по умолчанию — на 20%% больше, чем студентов)")
+    parser.add_argument("--refreshes", type=int, default=3, help="Сколько раз каждый студент открывает /dashboard")
+    parser.add_argument("--reports", type=int, default=3, help="Сколько раз администратор скачивает отчет")
+    parser.add_argument("--concurrency", type=int, default=50, help="Одновременных клиентов")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4,
+                        help="Стоимость bcrypt для синтетических паролей (в продакшене 12)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как эталон")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Допустимое ухудшение относительно эталона, %%")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="selection_day_")
+    # Настройки приложения читаются при импорте, поэтому окружение задается до импорта app
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["JOBS_DIR"] = os.path.join(workdir, "jobs")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    random.seed(42)
+
+    students, teachers = seed(args.scale)
+    topics_per_teacher = args.topics_per_teacher or max(1, int(len(students) * 1.2 / max(1, len(teachers))) + 1)
+    _add_topics(topics_per_teacher)
+    print(f"База: {len(students)} студентов, {len(teachers)} преподавателей, "
+          f"{topics_per_teacher * len(teachers)} тем ({workdir})")
+
+    started = time.perf_counter()
+    results = asyncio.run(scenario(args, students, teachers))
+    print(f"Сценарий выполнен за {time.perf_counter() - started:.1f} с\n")
+    print(f"{'Маршрут':<36}{'запросов':>9}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'rps':>9}{'SQL/запр':>10}")
+    for route, row in results.items():
+        print(f"{route:<36}{row['requests']:>9}{row['errors']:>8}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+              f"{row['p99_ms']:>10}{row['throughput_rps']:>9}{row['queries_per_request']:>10}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(results, baseline_file, ensure_ascii=False, indent=2)
+        print(f"\nЭталон сохранен в {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            if not compare(results, json.load(baseline_file), args.threshold):
+                sys.exit(1)
+
+def _add_topics(topics_per_teacher: int):
+    """Создает темы для всех преподавателей базы."""
+    from app import crud, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        work_types = ('coursework', 'vkr', 'vkr/coursework')
+        db.add_all([
+            models.Topic(title=f"Тема {teacher.id}-{i}", description="Синтетическая тема для нагрузочного теста",
+                         work_type=work_types[i % len(work_types)], teacher_id=teacher.id)
+            for teacher in crud.get_users_by_role(db, role="teacher") for i in range(topics_per_teacher)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/startup.py
+"""
+Время запуска и память воркера: импорт модулей приложения в чистом интерпретаторе.
+
+Каждый модуль импортируется в отдельном процессе (как при старте воркера uvicorn или
+служебного скрипта) несколько раз; выводятся медианное время импорта, пиковый RSS
+процесса и прирост RSS относительно пустого интерпретатора, а также тяжелые
+библиотеки (pandas, numpy, openpyxl), которые оказались загружены.
+
+Запуск из корня проекта: python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Модули, импортируемые воркером приложения и служебными скриптами (create_admin.py, list_users.py)
+DEFAULT_MODULES = ("app.main", "app.crud", "app.models")
+# Библиотеки, которые не должны загружаться при запуске воркера
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+# Код, выполняемый в дочернем процессе: импорт модуля и замер времени и пикового RSS
+CHILD_CODE = """
+import importlib, json, resource, sys, time
+started = time.perf_counter()
+if sys.argv[1]:
+    importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - started
+heavy = [name for name in sys.argv[2].split(",") if name in sys.modules]
+print(json.dumps({"seconds": elapsed, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "heavy": heavy}))
+"""
+
+def measure(module: str, env: dict) -> dict:
+    """Импортирует module в новом интерпретаторе и возвращает время, пиковый RSS (КиБ) и тяжелые библиотеки."""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, module, ",".join(HEAVY_MODULES)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта и память воркера приложения")
+    parser.add_argument("--runs", type=int, default=5, help="Сколько раз импортировать каждый модуль")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES), help="Модули для замера")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Импорт приложения не должен трогать рабочую базу и кэш шаблонов проекта
+        env = dict(os.environ, PYTHONPATH=os.getcwd(), DATABASE_URL=f"sqlite:///{workdir}/startup.db",
+                   TEMPLATE_BYTECODE_CACHE_DIR="")
+        base_rss = statistics.median(measure("", env)["rss_kb"] for _ in range(args.runs))
+        print(f"Пустой интерпретатор: {base_rss / 1024:.1f} МБ\n")
+        print(f"{'Модуль':<16}{'импорт, мс':>12}{'RSS, МБ':>10}{'прирост, МБ':>14}  тяжелые библиотеки")
+        for module in args.modules:
+            runs = [measure(module, env) for _ in range(args.runs)]
+            seconds = statistics.median(run["seconds"] for run in runs)
+            rss = statistics.median(run["rss_kb"] for run in runs)
+            heavy = ", ".join(runs[-1]["heavy"]) or "—"
+            print(f"{module:<16}{seconds * 1000:12.0f}{rss / 1024:10.1f}{(rss - base_rss) / 1024:14.1f}  {heavy}")
+
+if __name__ == "__main__":
+    main()
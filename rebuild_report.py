@@ -0,0 +1,40 @@
+# rebuild_report.py
+import argparse
+import sys
+
+sys.path.append('.')
+
+# --- Импорты из нашего FastAPI приложения ---
+from app import report_snapshot
+from app.database import Base, SessionLocal, engine
+
+def main():
+    """
+    Пересобирает снимок итогового отчета (таблица report_rows) по текущим данным тем.
+
+    С флагом --check только сверяет снимок с данными и завершается с кодом 1,
+    если найдены расхождения (например, после правки тем напрямую в базе).
+    """
+    parser = argparse.ArgumentParser(description="Пересборка и проверка снимка итогового отчета")
+    parser.add_argument("--check", action="store_true", help="Только проверить согласованность снимка")
+    args = parser.parse_args()
+
+    # Таблица снимка создается, если база создана до ее появления
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.check:
+            mismatches = report_snapshot.count_mismatches(db)
+            if mismatches:
+                print(f"[ОШИБКА] Снимок отчета расходится с данными тем: {mismatches} тем. "
+                      "Запустите python rebuild_report.py без --check.")
+                sys.exit(1)
+            print("Снимок отчета согласован с данными тем.")
+            return
+        rows = report_snapshot.rebuild(db)
+        print(f"Снимок отчета пересобран: {rows} строк.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+// static/topic_events.js
+// Обновление панели по событиям тем (Server-Sent Events) без перезагрузки страницы.
+// Скрипт подключается с атрибутами data-token (JWT-токен) и data-teacher-id (для панели преподавателя).
+(function () {
+    var script = document.currentScript;
+    var token = script.dataset.token;
+    var teacherId = script.dataset.teacherId ? Number(script.dataset.teacherId) : null;
+    var notice = document.getElementById("topic-events-notice");
+    if (!token || !window.EventSource) {
+        return;
+    }
+
+    // Показывает сообщение со ссылкой на обновление страницы
+    function showNotice() {
+        if (notice) {
+            notice.hidden = false;
+        }
+    }
+
+    // Помечает карточку темы в каталоге как занятую и отключает кнопку выбора
+    function markTaken(topicId) {
+        var card = document.querySelector('.topics-list [data-topic-id="' + topicId + '"]');
+        if (!card) {
+            return;
+        }
+        card.classList.add("topic-taken");
+        var button = card.querySelector("button");
+        if (button) {
+            button.disabled = true;
+            button.title = "Тему уже выбрал другой студент";
+            button.textContent = "Тема занята";
+        }
+    }
+
+    var source = new EventSource("/events/topics?token=" + encodeURIComponent(token));
+    source.addEventListener("topic", function (message) {
+        var event = JSON.parse(message.data);
+        if (teacherId !== null) {
+            // Панель преподавателя: важны только изменения его собственных тем
+            if (event.teacher_id === teacherId) {
+                showNotice();
+            }
+            return;
+        }
+        if (event.kind === "assigned") {
+            markTaken(event.topic_id);
+        } else if (event.kind === "freed" || event.kind === "created" || event.kind === "edited") {
+            // Новые и освободившиеся темы появятся в списке после обновления страницы
+            showNotice();
+        }
+    });
+    source.addEventListener("resync", function () {
+        // Сервер пропустил часть событий для этого клиента: состояние страницы могло устареть
+        source.close();
+        showNotice();
+    });
+})();
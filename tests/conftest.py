@@ -0,0 +1,67 @@
+# tests/conftest.py
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+# Настройки читаются при импорте приложения, поэтому окружение задается до импорта app:
+# временная файловая база, быстрый bcrypt и без кэша шаблонов на диске. База в памяти
+# не подходит: асинхронный движок (aiosqlite) открывает свое соединение и не видит ее
+_DATABASE_DIR = tempfile.mkdtemp(prefix="coursework-tests-")
+atexit.register(shutil.rmtree, _DATABASE_DIR, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DATABASE_DIR}/test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("TEMPLATE_BYTECODE_CACHE_DIR", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import models  # noqa: E402  (регистрирует таблицы в Base.metadata)
+from app.cache import fragment_cache, login_cache, principal_cache, settings_cache  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+
+class QueryCounter:
+    """Контекст, собирающий SQL-запросы, отправленные движком приложения."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+def create_user(db, username: str, role: str, full_name: str = None, hashed_password: str = "-",
+                group: str = "ТЕСТ-1") -> models.User:
+    """Создает пользователя с ролью role и профиль студента или преподавателя."""
+    user = models.User(username=username, full_name=full_name or username, role=role, hashed_password=hashed_password)
+    if role == "student":
+        user.student_profile = models.Student(group=group)
+    elif role == "teacher":
+        user.teacher_profile = models.Teacher(position="Доцент")
+    db.add(user)
+    db.commit()
+    return user
+
+@pytest.fixture
+def db():
+    """Сессия чистой базы: таблицы создаются перед тестом и удаляются после него, кэши процесса очищаются."""
+    for cache in (fragment_cache, login_cache, principal_cache):
+        cache.clear()
+    settings_cache.invalidate()
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
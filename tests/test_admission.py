@@ -0,0 +1,44 @@
+# tests/test_admission.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app import admission, auth, config, models
+from app.main import app
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """Клиент приложения с чистым состоянием контроля допуска; все запросы приходят с одного адреса."""
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController())
+    with TestClient(app) as test_client:
+        yield test_client
+
+def refresh_cookie(username: str) -> dict:
+    """Заголовок с refresh-cookie пользователя username."""
+    token = auth.create_refresh_token(models.User(username=username, hashed_password="-"))
+    return {"cookie": f"{auth.REFRESH_COOKIE}={token}"}
+
+def test_anonymous_page_requests_from_one_address_are_not_throttled_together(client):
+    requests = 3 * config.settings.ADMISSION_BURST
+    statuses = [client.get(path, follow_redirects=False).status_code for path in ("/", "/login") * requests]
+
+    assert 429 not in statuses
+    assert admission.controller.throttled == 0
+
+def test_token_refresh_is_throttled_per_user(client):
+    burst = config.settings.ADMISSION_BURST
+    first = [client.get("/token/refresh", headers=refresh_cookie("first@test"), follow_redirects=False).status_code
+             for _ in range(burst + 5)]
+    second = client.get("/token/refresh", headers=refresh_cookie("second@test"), follow_redirects=False)
+
+    assert 429 not in first[:burst]
+    assert set(first[burst:]) == {429}
+    assert second.status_code != 429
+
+def test_forwarded_address_is_used_only_behind_trusted_proxy(monkeypatch):
+    controller = admission.AdmissionController()
+    controller.trusted_proxies = {"10.0.0.1"}
+    monkeypatch.setattr(admission, "controller", controller)
+    headers = [(b"x-forwarded-for", b"1.2.3.4, 203.0.113.7, 10.0.0.1")]
+
+    assert admission._client_address({"client": ("10.0.0.1", 5000), "headers": headers}) == "203.0.113.7"
+    assert admission._client_address({"client": ("198.51.100.2", 5000), "headers": headers}) == "198.51.100.2"
@@ -0,0 +1,91 @@
+# tests/test_allocation.py
+import numpy as np
+import pytest
+from conftest import create_user
+from sqlalchemy import select
+
+from app import allocation, crud, models
+
+def solve(preferences, order, topic_teacher, teacher_capacity):
+    return allocation.serial_dictatorship(
+        np.array(preferences, dtype=np.int64), np.array(order, dtype=np.int64),
+        np.array(topic_teacher, dtype=np.int64), np.array(teacher_capacity, dtype=np.int64),
+    ).tolist()
+
+def test_students_choose_in_priority_order():
+    # Все хотят тему 0; первым выбирает студент 2, затем 0, затем 1
+    preferences = [[0, 1, 2], [0, 1, -1], [0, 2, -1]]
+
+    assert solve(preferences, [2, 0, 1], [0, 0, 0], [3]) == [1, -1, 0]
+    assert solve(preferences, [0, 1, 2], [0, 0, 0], [3]) == [0, 1, 1]
+
+def test_teacher_capacity_limits_assignments():
+    # Темы 0 и 1 у преподавателя 0 (одно место), тема 2 у преподавателя 1
+    preferences = [[0, 2], [1, -1], [1, 2]]
+
+    assert solve(preferences, [0, 1, 2], [0, 0, 1], [1, 5]) == [0, -1, 1]
+
+def test_taken_topics_and_empty_places_are_skipped():
+    preferences = [[-1, 0, 1], [0, -1, 1]]
+
+    assert solve(preferences, [0, 1], [0, 0], [2]) == [1, 2]
+
+def seed(db):
+    """Два преподавателя, четыре свободные темы, одна закрепленная и четыре студента со списками."""
+    teachers = [create_user(db, f"teacher{i}@test", "teacher") for i in range(2)]
+    students = [create_user(db, f"student{i}@test", "student") for i in range(5)]
+    topics = [models.Topic(title=f"Тема {i}", work_type="coursework", teacher_id=teachers[i % 2].id) for i in range(5)]
+    # Тема 4 уже закреплена за студентом 4, у преподавателя 0 занято одно место
+    topics[4].student_id = students[4].student_profile.id
+    db.add_all(topics)
+    db.flush()
+    lists = [[4, 0, 1], [0, 2, 3], [0, 1, 2], [2, 0, 3]]
+    for student, wanted in zip(students, lists):
+        db.add_all([models.TopicPreference(student_id=student.student_profile.id, topic_id=topics[index].id,
+                                           rank=rank, work_type="coursework") for rank, index in enumerate(wanted)])
+    db.commit()
+    return topics
+
+def assignments(db):
+    return dict(db.execute(select(models.Topic.id, models.Topic.student_id)
+                           .where(models.Topic.student_id.is_not(None))).all())
+
+def test_same_seed_gives_same_allocation(db):
+    topics = seed(db)
+    taken = topics[4].id
+
+    summary = allocation.run_allocation(db, seed=7)
+    first = assignments(db)
+    db.execute(models.Topic.__table__.update().where(models.Topic.id != taken).values(student_id=None))
+    db.commit()
+    repeated = allocation.run_allocation(db, seed=7)
+
+    assert (repeated.seed, repeated.assigned, repeated.by_rank) == (summary.seed, summary.assigned, summary.by_rank)
+    assert assignments(db) == first
+    assert (summary.students, summary.assigned, summary.unassigned) == (4, 4, 0)
+    # Уже закрепленная тема не передается другому студенту
+    assert first[taken] == topics[4].student_id
+
+def test_capacity_counts_existing_assignments(db):
+    topics = seed(db)
+
+    summary = allocation.run_allocation(db, capacity=2, seed=1)
+
+    loads = crud.get_teacher_loads(db)
+    assert all(load <= 2 for load in loads.values())
+    assert sum(loads.values()) == 1 + summary.assigned
+    assert summary.assigned == 3
+    assert topics[4].id in assignments(db)
+
+def test_apply_rejects_whole_allocation_if_a_topic_was_taken(db):
+    topics = seed(db)
+    free = [topic for topic in topics if topic.student_id is None]
+    student_ids = [create_user(db, f"late{i}@test", "student").student_profile.id for i in range(2)]
+    before = assignments(db)
+
+    with pytest.raises(ValueError):
+        crud.apply_topic_allocation(db, [(free[0].id, student_ids[0], free[0].teacher_id),
+                                         (topics[4].id, student_ids[1], topics[4].teacher_id)])
+
+    assert assignments(db) == before
+    assert crud.apply_topic_allocation(db, [(free[0].id, student_ids[0], free[0].teacher_id)]) == 1
@@ -0,0 +1,87 @@
+# tests/test_assign_contention.py
+import threading
+from collections import Counter
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base, begin_immediate, configure_sqlite
+
+THREADS = 16
+
+@pytest.fixture(params=["default", "production"])
+def session_factory(request, tmp_path):
+    """
+    Фабрика сессий файловой базы SQLite, общей для нескольких потоков.
+
+    База в памяти не подходит: все сессии делили бы одно соединение. Профиль
+    production включает WAL и BEGIN IMMEDIATE, как у движка очереди записи.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'contention.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30},
+                           pool_size=THREADS, max_overflow=0)
+    if request.param == "production":
+        configure_sqlite(engine)
+        begin_immediate(engine)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+def seed(SessionLocal, students: int):
+    """Создает одну свободную тему и students студентов; возвращает их идентификаторы."""
+    db = SessionLocal()
+    try:
+        teacher = models.User(username="teacher@test", full_name="Преподаватель", role="teacher", hashed_password="-")
+        db.add(teacher)
+        db.flush()
+        topic = models.Topic(title="Популярная тема", work_type="coursework", teacher_id=teacher.id)
+        db.add(topic)
+        student_ids = []
+        for i in range(students):
+            user = models.User(username=f"student{i}@test", full_name=f"Студент {i}", role="student", hashed_password="-")
+            db.add(user)
+            db.flush()
+            profile = models.Student(user_id=user.id, group="ТЕСТ-1")
+            db.add(profile)
+            db.flush()
+            student_ids.append(profile.id)
+        db.commit()
+        return topic.id, student_ids
+    finally:
+        db.close()
+
+def test_concurrent_assignment_has_exactly_one_winner(session_factory):
+    topic_id, student_ids = seed(session_factory, THREADS)
+    results = Counter()
+    winners = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(THREADS)
+
+    def attempt(student_id):
+        db = session_factory()
+        try:
+            barrier.wait()
+            result = crud.try_assign_topic(db, topic_id=topic_id, student_profile_id=student_id)
+        finally:
+            db.close()
+        with lock:
+            results[result] += 1
+            if result == crud.ASSIGNED:
+                winners.append(student_id)
+
+    threads = [threading.Thread(target=attempt, args=(student_id,)) for student_id in student_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {crud.ASSIGNED: 1, crud.TOPIC_TAKEN: THREADS - 1}
+    db = session_factory()
+    try:
+        assigned = [row[0] for row in db.query(models.Topic.student_id).filter(models.Topic.student_id.isnot(None))]
+    finally:
+        db.close()
+    assert assigned == winners
+    assert len(assigned) == len(set(assigned))
@@ -0,0 +1,73 @@
+# tests/test_auth.py
+import pytest
+from conftest import create_user
+from fastapi.testclient import TestClient
+
+from app import admission, auth, crud
+from app.main import app
+
+PASSWORD = "correct horse"
+
+@pytest.fixture
+def user(db):
+    return create_user(db, "student@test", "student", hashed_password=auth.hash_passwords([PASSWORD])[0][0])
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController())
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def verifications(monkeypatch):
+    """Считает вычисления bcrypt при проверке пароля."""
+    calls = []
+    verify = auth.verify_password
+    monkeypatch.setattr(auth, "verify_password", lambda password, hashed: calls.append(password) or verify(password, hashed))
+    return calls
+
+def test_repeated_login_skips_bcrypt_until_password_changes(db, user, verifications):
+    assert auth.authenticate_user(db, "student@test", PASSWORD).id == user.id
+    assert auth.authenticate_user(db, "Student@Test ", PASSWORD).id == user.id
+    assert verifications == [PASSWORD]
+
+    assert auth.authenticate_user(db, "student@test", "wrong") is None
+    assert auth.authenticate_user(db, "student@test", "wrong") is None
+    assert len(verifications) == 3
+
+    crud.change_user_password(db, user, auth.hash_passwords(["new password"])[0][0])
+
+    assert auth.authenticate_user(db, "student@test", PASSWORD) is None
+    assert auth.authenticate_user(db, "student@test", "new password").id == user.id
+
+def test_refresh_token_is_revoked_by_password_change(db, user):
+    refresh_token = auth.create_refresh_token(user)
+
+    access_token = auth.refresh_access_token(db, refresh_token)
+    assert auth.get_username_from_token(access_token) == "student@test"
+    # Токен доступа не заменяет refresh-токен, и наоборот
+    assert auth.refresh_access_token(db, access_token) is None
+    assert auth.get_username_from_token(refresh_token) is None
+
+    crud.change_user_password(db, user, auth.hash_passwords(["new password"])[0][0])
+
+    assert auth.refresh_access_token(db, refresh_token) is None
+
+def test_login_sets_secure_http_only_refresh_cookie(user, client):
+    response = client.post("/login", data={"username": "student@test", "password": PASSWORD}, follow_redirects=False)
+
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{auth.REFRESH_COOKIE}=")
+    assert "Secure" in cookie and "HttpOnly" in cookie and "SameSite=lax" in cookie
+
+    refresh_token = cookie.split(";")[0].split("=", 1)[1]
+    refreshed = client.get("/token/refresh", headers={"cookie": f"{auth.REFRESH_COOKIE}={refresh_token}"},
+                           follow_redirects=False)
+    assert refreshed.headers["location"].startswith("/dashboard?token=")
+
+def test_invalid_refresh_cookie_is_deleted(client):
+    response = client.get("/token/refresh", headers={"cookie": f"{auth.REFRESH_COOKIE}=garbage"}, follow_redirects=False)
+
+    assert response.headers["location"] == "/login?error=auth"
+    assert f'{auth.REFRESH_COOKIE}=""' in response.headers["set-cookie"]
+    assert "Secure" in response.headers["set-cookie"]
@@ -0,0 +1,54 @@
+# tests/test_catalogue_pagination.py
+import pytest
+from conftest import create_user
+
+from app import crud, models
+
+WORK_TYPES = ("coursework", "vkr", "vkr/coursework")
+
+def seed_catalogue(db):
+    """Создает двух преподавателей с темами всех типов; каждая пятая тема занята."""
+    teachers = [create_user(db, f"teacher{i}@test", "teacher") for i in range(2)]
+    students = iter(create_user(db, f"student{i}@test", "student").student_profile.id for i in range(12))
+    for i in range(60):
+        db.add(models.Topic(title=f"Тема {i}", work_type=WORK_TYPES[i % 3], teacher_id=teachers[i % 2].id,
+                            student_id=next(students) if i % 5 == 0 else None))
+    db.commit()
+    return teachers
+
+def page_through(db, limit: int, **filters):
+    """Проходит все страницы каталога и возвращает идентификаторы тем в порядке выдачи и число страниц."""
+    ids, pages, after = [], 0, 0
+    while True:
+        topics, after = crud.get_free_topics_page(db, after_id=after, limit=limit, **filters)
+        ids += [topic.id for topic in topics]
+        pages += 1
+        if after is None:
+            return ids, pages
+        assert len(topics) == limit
+
+@pytest.mark.parametrize("limit", [4, 5])
+def test_filtered_pages_have_no_gaps_or_duplicates(db, limit):
+    teachers = seed_catalogue(db)
+    expected = [topic.id for topic in db.query(models.Topic).filter(
+        models.Topic.student_id.is_(None),
+        models.Topic.work_type.in_(("vkr", "vkr/coursework")),
+        models.Topic.teacher_id == teachers[0].id,
+    ).order_by(models.Topic.id)]
+
+    ids, pages = page_through(db, limit, work_type="vkr", teacher_id=teachers[0].id)
+
+    # 16 подходящих тем: при limit=4 последняя страница заполнена целиком и следующей нет
+    assert len(expected) == 16
+    assert ids == expected
+    assert pages == -(-len(expected) // limit)
+
+def test_unfiltered_catalogue_lists_every_free_topic_once(db):
+    seed_catalogue(db)
+    expected = [topic_id for (topic_id,) in db.query(models.Topic.id).filter(
+        models.Topic.student_id.is_(None)).order_by(models.Topic.id)]
+
+    ids, _ = page_through(db, 7)
+
+    assert ids == expected
+    assert len(set(ids)) == len(ids) == 48
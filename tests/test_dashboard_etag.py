@@ -0,0 +1,64 @@
+# tests/test_dashboard_etag.py
+from datetime import date, timedelta
+
+import pytest
+from conftest import create_user
+from fastapi.testclient import TestClient
+
+from app import admission, auth, crud, main
+from app.cache import settings_cache
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController())
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def dashboard(db, client):
+    """Запрашивает dashboard студента; возвращает функцию (If-None-Match) -> ответ."""
+    create_user(db, "student@test", "student")
+    token = auth.create_access_token({"sub": "student@test"})
+
+    def get(if_none_match=None):
+        headers = {"if-none-match": if_none_match} if if_none_match else {}
+        return client.get("/dashboard", params={"token": token}, headers=headers)
+    return get
+
+def test_repeated_request_with_etag_is_not_modified(dashboard):
+    first = dashboard()
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    repeated = dashboard(etag)
+
+    assert repeated.status_code == 304
+    assert repeated.headers["etag"] == etag
+    assert repeated.content == b""
+    assert dashboard(f'W/{etag}, "other"').status_code == 304
+
+@pytest.mark.parametrize("version", [crud.TOPICS_VERSION, crud.USERS_VERSION, settings_cache.VERSION_NAME,
+                                     crud.PREFERENCES_VERSION])
+def test_data_version_bump_changes_etag(db, dashboard, version):
+    etag = dashboard().headers["etag"]
+
+    crud.bump_data_version(db, version)
+    db.commit()
+
+    changed = dashboard(etag)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+def test_date_change_changes_etag(dashboard, monkeypatch):
+    etag = dashboard().headers["etag"]
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(main, "date", Tomorrow)
+
+    changed = dashboard(etag)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
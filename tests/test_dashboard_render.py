@@ -0,0 +1,87 @@
+# tests/test_dashboard_render.py
+import threading
+
+import pytest
+from conftest import create_user
+from fastapi.testclient import TestClient
+from jinja2 import Template
+
+from app import admission, auth, main, models
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController())
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def renders(monkeypatch):
+    """
+    Записывает рендеринг шаблонов, переданный main в пул потоков: (имя шаблона, контекст, поток
+    цикла событий, поток рендеринга).
+    """
+    calls = []
+    original = main.run_in_threadpool
+
+    async def recording(func, *args, **kwargs):
+        template = getattr(func, "__self__", None)
+        if not isinstance(template, Template):
+            template = None
+        name = template.name if template is not None else args[0]
+        loop_thread = threading.get_ident()
+
+        def render(*args, **kwargs):
+            context = args[0] if template is not None else args[1]
+            calls.append((name, context, loop_thread, threading.get_ident()))
+            return func(*args, **kwargs)
+        return await original(render, *args, **kwargs)
+    monkeypatch.setattr(main, "run_in_threadpool", recording)
+    return calls
+
+def rendered(renders, name):
+    """Контекст шаблона name, отрендеренного вне потока цикла событий."""
+    for template_name, context, loop_thread, render_thread in renders:
+        if template_name == name:
+            assert render_thread != loop_thread
+            return context
+    raise AssertionError(f"{name} не рендерился в пуле потоков")
+
+def seed(db):
+    """Преподаватель с закрепленной и свободной темами; возвращает (преподаватель, студент)."""
+    teacher = create_user(db, "teacher@test", "teacher", full_name="Иванов Иван")
+    student = create_user(db, "student@test", "student", full_name="Петров Петр")
+    db.add_all([
+        models.Topic(title="Закрепленная тема", work_type="coursework", teacher_id=teacher.id,
+                     student_id=student.student_profile.id),
+        models.Topic(title="Свободная тема", work_type="coursework", teacher_id=teacher.id),
+    ])
+    db.commit()
+    return teacher, student
+
+def get_dashboard(client, username):
+    return client.get("/dashboard", params={"token": auth.create_access_token({"sub": username})})
+
+def test_teacher_dashboard_renders_off_the_event_loop(db, client, renders):
+    seed(db)
+
+    assert get_dashboard(client, "teacher@test").status_code == 200
+
+    rendered(renders, "teacher_dashboard.html")
+    # Объекты контекста уже отделены от сессии: шаблон может читать только загруженные атрибуты
+    topics = rendered(renders, "teacher_topic_cards.html")["topics"]
+    assert sorted(
+        (topic.title, topic.student.user.full_name if topic.student else None) for topic in topics
+    ) == [("Закрепленная тема", "Петров Петр"), ("Свободная тема", None)]
+
+def test_student_dashboard_renders_off_the_event_loop(db, client, renders):
+    seed(db)
+
+    assert get_dashboard(client, "student@test").status_code == 200
+
+    page = rendered(renders, "student_dashboard.html")
+    assert (page["my_topic"].title, page["my_topic"].teacher.full_name) == ("Закрепленная тема", "Иванов Иван")
+    catalogue = rendered(renders, "topic_catalogue.html")
+    assert [(topic.title, topic.teacher.full_name) for topic in catalogue["free_topics"]] == [
+        ("Свободная тема", "Иванов Иван"),
+    ]
+    assert [teacher.full_name for teacher in catalogue["teachers"]] == ["Иванов Иван"]
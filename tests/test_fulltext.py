@@ -0,0 +1,60 @@
+# tests/test_fulltext.py
+from conftest import create_user
+
+from app import crud, schemas
+
+def create_topic(db, teacher_id, title, description=None):
+    return crud.create_teacher_topic(
+        db, schemas.TopicCreate(title=title, description=description, work_type="coursework"), teacher_id=teacher_id
+    )
+
+def search(db, query, after_id=0, limit=20):
+    topics, next_after = crud.get_free_topics_page(db, after_id=after_id, limit=limit, search=query)
+    return [topic.title for topic in topics], next_after
+
+def test_search_matches_other_word_forms_after_create_and_edit(db):
+    teacher = create_user(db, "teacher@test", "teacher")
+    topic = create_topic(db, teacher.id, "Разработка веб-приложений", "Проектирование интерфейсов")
+
+    assert search(db, "разработки приложения")[0] == ["Разработка веб-приложений"]
+    assert search(db, "интерфейс")[0] == ["Разработка веб-приложений"]
+
+    crud.update_topic(db, topic, schemas.TopicUpdate(title="Обучение нейронных сетей"))
+
+    assert search(db, "нейронная сеть")[0] == ["Обучение нейронных сетей"]
+    assert search(db, "разработка")[0] == []
+    # Описание не менялось и по-прежнему находится
+    assert search(db, "проектированию")[0] == ["Обучение нейронных сетей"]
+
+def test_unfinished_last_word_matches_as_prefix(db):
+    teacher = create_user(db, "teacher@test", "teacher")
+    create_topic(db, teacher.id, "Обучение нейронных сетей")
+    create_topic(db, teacher.id, "Нейтронная физика")
+
+    assert search(db, "нейро")[0] == ["Обучение нейронных сетей"]
+    assert search(db, "обучение ней")[0] == ["Обучение нейронных сетей"]
+
+def test_title_match_ranks_above_description_match(db):
+    teacher = create_user(db, "teacher@test", "teacher")
+    create_topic(db, teacher.id, "Обзор методов", "Сравнение алгоритмов сортировки")
+    create_topic(db, teacher.id, "Алгоритмы сортировки", "Обзор методов")
+
+    assert search(db, "алгоритм сортировки")[0] == ["Алгоритмы сортировки", "Обзор методов"]
+
+def test_search_pages_continue_by_offset(db):
+    teacher = create_user(db, "teacher@test", "teacher")
+    # Совпадения в названии (нечетные темы) ранжируются выше совпадений в описании, а не по id
+    for i in range(5):
+        if i % 2:
+            create_topic(db, teacher.id, f"Анализ данных {i}")
+        else:
+            create_topic(db, teacher.id, f"Тема {i}", "Анализ данных")
+    everything, _ = search(db, "анализ")
+    assert everything == ["Анализ данных 1", "Анализ данных 3", "Тема 0", "Тема 2", "Тема 4"]
+
+    first, after = search(db, "анализ", limit=2)
+    second, after_second = search(db, "анализ", after_id=after, limit=2)
+    last, after_last = search(db, "анализ", after_id=after_second, limit=2)
+
+    assert (after, after_second, after_last) == (2, 4, None)
+    assert first + second + last == everything
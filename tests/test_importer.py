@@ -0,0 +1,85 @@
+# tests/test_importer.py
+import json
+
+from conftest import create_user
+from openpyxl import Workbook, load_workbook
+from sqlalchemy import select
+
+from app import config, crud, jobs, models, tasks
+
+CSV = """full_name,email,group,profile
+Иванов Иван,ivanov@test.ru,ТЕСТ-1,Программная инженерия
+,nameless@test.ru,ТЕСТ-1,
+Без Почты,,ТЕСТ-1,
+Плохая Почта,not-an-email,ТЕСТ-1,
+Без Группы,nogroup@test.ru,,
+Иванов Двойник, IVANOV@test.ru ,ТЕСТ-2,
+Уже Есть,exists@test.ru,ТЕСТ-1,
+Петров   Петр,petrov@test.ru,12345678901234567890123,
+"""
+
+def run_import(db, tmp_path, monkeypatch, path, filename):
+    """Выполняет задачу импорта студентов; возвращает (итог, задачу)."""
+    monkeypatch.setattr(config.settings, "JOBS_DIR", str(tmp_path / "jobs"))
+    # Пачки по 3 строки: повторы и отклонения должны находиться и между пачками
+    monkeypatch.setattr(config.settings, "IMPORT_CHUNK_SIZE", 3)
+    job = crud.create_job(db, kind="import_students", created_by=None, owner="test")
+    context = jobs.JobContext(job.id)
+    summary = json.loads(tasks.import_students(db, context, str(path), filename))
+    return summary, context
+
+def students(db):
+    """Импортированные студенты: email -> (ФИО, группа, профиль)."""
+    rows = db.execute(
+        select(models.User.username, models.User.full_name, models.Student.group, models.Student.profile)
+        .join(models.Student, models.Student.user_id == models.User.id)
+    ).all()
+    return {username: (full_name, group, profile) for username, full_name, group, profile in rows}
+
+def test_csv_import_counts_rejects_and_writes_rejected_rows(db, tmp_path, monkeypatch):
+    create_user(db, "exists@test.ru", "student", full_name="Уже Есть")
+    path = tmp_path / "students.csv"
+    path.write_text(CSV, encoding="utf-8")
+
+    summary, context = run_import(db, tmp_path, monkeypatch, path, "students.csv")
+
+    assert (summary["created"], summary["skipped"], summary["invalid"]) == (2, 2, 4)
+    assert summary["rejected_reasons"] == {
+        "missing_full_name": 1, "missing_email": 1, "invalid_email": 1, "missing_group": 1,
+        "duplicate_in_file": 1, "already_exists": 1,
+    }
+    imported = students(db)
+    assert imported["ivanov@test.ru"] == ("Иванов Иван", "ТЕСТ-1", "Программная инженерия")
+    # Пробелы внутри значения схлопываются, длинное число остается строкой без изменений
+    assert imported["petrov@test.ru"] == ("Петров Петр", "12345678901234567890123", None)
+    assert not path.exists()
+
+    assert context.artifact_name == "rejected_rows.xlsx"
+    sheet = load_workbook(context.artifact_path).active
+    assert [list(row) for row in sheet.iter_rows(values_only=True)] == [
+        ["Строка", "Email", "ФИО", "Код причины", "Причина"],
+        [3, "nameless@test.ru", "", "missing_full_name", "Не указано ФИО"],
+        [4, "", "Без Почты", "missing_email", "Не указан email"],
+        [5, "not-an-email", "Плохая Почта", "invalid_email", "Некорректный email"],
+        [6, "nogroup@test.ru", "Без Группы", "missing_group", "Не указана группа"],
+        [7, "ivanov@test.ru", "Иванов Двойник", "duplicate_in_file", "Email повторяется в файле"],
+        [8, "exists@test.ru", "Уже Есть", "already_exists", "Пользователь с таким email уже существует"],
+    ]
+
+def test_xlsx_numeric_groups_keep_whole_numbers_without_overflow(db, tmp_path, monkeypatch):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["full_name", "email", "group"])
+    sheet.append(["Первый", "first@test.ru", 101.0])
+    sheet.append(["Второй", "second@test.ru", 1e25])
+    sheet.append(["Третий", "third@test.ru", 10.5])
+    path = tmp_path / "students.xlsx"
+    workbook.save(path)
+
+    summary, context = run_import(db, tmp_path, monkeypatch, path, "students.xlsx")
+
+    assert (summary["created"], summary["skipped"], summary["invalid"]) == (3, 0, 0)
+    assert context.artifact_path is None
+    assert {email: group for email, (_, group, _) in students(db).items()} == {
+        "first@test.ru": "101", "second@test.ru": "1e+25", "third@test.ru": "10.5",
+    }
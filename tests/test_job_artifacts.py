@@ -0,0 +1,47 @@
+# tests/test_job_artifacts.py
+import os
+import time
+from datetime import datetime, timedelta
+
+from app import config, crud, jobs, models, tasks  # noqa: F401  (tasks регистрирует типы задач)
+
+def make_job(db, kind: str, path: str, finished_at: datetime) -> int:
+    """Создает завершенную задачу с файлом-результатом path."""
+    with open(path, "wb") as artifact:
+        artifact.write(b"secret")
+    job = models.Job(kind=kind, status="done", artifact_path=path, artifact_name=os.path.basename(path),
+                     finished_at=finished_at)
+    db.add(job)
+    db.commit()
+    return job.id
+
+def test_sweep_removes_expired_artifacts_and_stale_uploads(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(config.settings, "JOBS_DIR", str(tmp_path))
+    ttl = timedelta(hours=config.settings.JOB_ARTIFACT_TTL_HOURS)
+    expired_id = make_job(db, "report", str(tmp_path / "job_1_report.xlsx"), datetime.utcnow() - ttl * 2)
+    fresh_id = make_job(db, "report", str(tmp_path / "job_2_report.xlsx"), datetime.utcnow())
+    stale_upload = tmp_path / "upload_stale.csv"
+    stale_upload.write_text("email\n")
+    old = time.time() - ttl.total_seconds() * 2
+    os.utime(stale_upload, (old, old))
+
+    jobs.sweep_expired_files(db)
+    db.expire_all()
+
+    assert crud.get_job(db, expired_id).artifact_path is None
+    assert not (tmp_path / "job_1_report.xlsx").exists()
+    assert crud.get_job(db, fresh_id).artifact_path == str(tmp_path / "job_2_report.xlsx")
+    assert (tmp_path / "job_2_report.xlsx").exists()
+    assert not stale_upload.exists()
+
+def test_credentials_artifact_is_discarded_after_download(db, tmp_path):
+    path = str(tmp_path / "job_1_students_new_credentials.xlsx")
+    job_id = make_job(db, "reset_passwords_students", path, datetime.utcnow())
+
+    assert "reset_passwords_students" in jobs.ONE_TIME_ARTIFACT_KINDS
+    assert "report" not in jobs.ONE_TIME_ARTIFACT_KINDS
+    jobs.discard_artifact(job_id, path)
+    db.expire_all()
+
+    assert not os.path.exists(path)
+    assert crud.get_job(db, job_id).artifact_path is None
@@ -0,0 +1,81 @@
+# tests/test_password_reset.py
+import json
+
+from conftest import create_user
+from openpyxl import load_workbook
+
+from app import auth, config, crud, jobs, models, tasks
+from app.cache import principal_cache
+
+OLD_PASSWORD = "old password"
+
+def seed(db):
+    """Студенты двух групп и преподаватель со старым паролем; возвращает {логин: пользователь}."""
+    hashed = auth.hash_passwords([OLD_PASSWORD])[0][0]
+    users = [
+        create_user(db, "a1@test", "student", full_name="Студент А1", hashed_password=hashed, group="А"),
+        create_user(db, "a2@test", "student", full_name="Студент А2", hashed_password=hashed, group="А"),
+        create_user(db, "b1@test", "student", full_name="Студент Б1", hashed_password=hashed, group="Б"),
+        create_user(db, "teacher@test", "teacher", full_name="Преподаватель", hashed_password=hashed),
+    ]
+    return {user.username: user for user in users}
+
+def sign_in(db, users):
+    """Входит всеми пользователями (кэш проверок входа, кэш пользователей по токену) и выдает refresh-токены."""
+    refresh_tokens = {}
+    for username, user in users.items():
+        assert auth.authenticate_user(db, username, OLD_PASSWORD).id == user.id
+        assert auth.get_principal_from_token(db, auth.create_access_token({"sub": username})) is not None
+        refresh_tokens[username] = auth.create_refresh_token(user)
+    assert all(principal_cache.get(username) is not None for username in users)
+    return refresh_tokens
+
+def stored_hashes(db):
+    db.expire_all()
+    return {user.username: user.hashed_password for user in db.query(models.User)}
+
+def assert_reset_only(db, reset, credentials, hashes_before, refresh_tokens):
+    """Проверяет, что сброшены пароли ровно пользователей reset и учетные данные подходят к новым хэшам."""
+    hashes_after = stored_hashes(db)
+    assert {username for username in hashes_before if hashes_after[username] != hashes_before[username]} == reset
+    assert {row["Логин (email)"] for row in credentials} == reset
+    for row in credentials:
+        username, password = row["Логин (email)"], row["Новый пароль"]
+        assert auth.verify_password(password, hashes_after[username])
+        assert auth.authenticate_user(db, username, password) is not None
+    for username, refresh_token in refresh_tokens.items():
+        still_valid = username not in reset
+        # Запомненный вход со старым паролем и старый refresh-токен действуют только у остальных
+        assert (auth.authenticate_user(db, username, OLD_PASSWORD) is not None) == still_valid
+        assert (auth.refresh_access_token(db, refresh_token) is not None) == still_valid
+        assert (principal_cache.get(username) is not None) == still_valid
+
+def test_group_reset_task_rehashes_only_the_group(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(config.settings, "JOBS_DIR", str(tmp_path))
+    users = seed(db)
+    refresh_tokens = sign_in(db, users)
+    hashes_before = stored_hashes(db)
+    job = crud.create_job(db, kind="reset_passwords_students", created_by=None, owner="test")
+    context = jobs.JobContext(job.id)
+
+    message = json.loads(tasks.reset_student_passwords(db, context, group="А"))
+
+    assert message["users"] == 2
+    sheet = load_workbook(context.artifact_path).active
+    header, *rows = sheet.iter_rows(values_only=True)
+    credentials = [dict(zip(header, row)) for row in rows]
+    assert {row["ФИО"] for row in credentials} == {"Студент А1", "Студент А2"}
+    assert_reset_only(db, {"a1@test", "a2@test"}, credentials, hashes_before, refresh_tokens)
+
+def test_reset_by_user_ids_rehashes_only_selected_users(db):
+    users = seed(db)
+    refresh_tokens = sign_in(db, users)
+    hashes_before = stored_hashes(db)
+    selected = [users["a2@test"].id, users["b1@test"].id, users["teacher@test"].id]
+
+    targets = crud.get_password_reset_targets(db, role="student", user_ids=selected)
+    credentials, _ = auth.reset_user_passwords(db, targets)
+
+    # Преподаватель не входит в выборку студентов, даже если его id передан
+    assert [username for _, username, _ in targets] == ["a2@test", "b1@test"]
+    assert_reset_only(db, {"a2@test", "b1@test"}, credentials, hashes_before, refresh_tokens)
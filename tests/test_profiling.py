@@ -0,0 +1,36 @@
+# tests/test_profiling.py
+import asyncio
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+
+from app import profiling
+
+def test_failed_statements_do_not_leave_start_times_on_connection():
+    engine = create_engine("sqlite://")
+    profiling.instrument_engine(engine)
+    stats = profiling.RequestStats()
+    token = profiling._current.set(stats)
+    try:
+        with engine.connect() as connection:
+            for _ in range(20):
+                try:
+                    connection.execute(text("SELECT * FROM missing_table"))
+                except OperationalError:
+                    pass
+            connection.execute(text("SELECT 1"))
+            assert not connection.info.get("profiling_started")
+    finally:
+        profiling._current.reset(token)
+
+    assert stats.sql_count == 1
+    assert 0 <= stats.sql_time < 1
+
+def test_metrics_are_served_only_to_allowed_hosts():
+    def call(host: str):
+        request = Request({"type": "http", "method": "GET", "path": "/metrics", "headers": [], "client": (host, 40000)})
+        return asyncio.run(profiling.metrics_endpoint(request))
+
+    assert call("203.0.113.7").status_code == 403
+    assert call("127.0.0.1").status_code == 200
@@ -0,0 +1,64 @@
+# tests/test_report_download.py
+import asyncio
+import io
+import zipfile
+
+from conftest import create_user
+from fastapi.responses import StreamingResponse
+from openpyxl import load_workbook
+from starlette.requests import Request
+
+from app import auth, crud, main, reports, schemas, tabular
+
+def seed_topics(db, count: int):
+    """Создает преподавателя, студента и count тем; первая тема закреплена за студентом."""
+    teacher = create_user(db, "teacher@test", "teacher", full_name="Преподаватель")
+    student = create_user(db, "student@test", "student", full_name="Студент")
+    topics = [crud.create_teacher_topic(db, schemas.TopicCreate(title=f"Тема {i}", description=f"Описание {i}",
+                                                                  work_type="coursework"), teacher_id=teacher.id)
+              for i in range(count)]
+    assert crud.try_assign_topic(db, topic_id=topics[0].id, student_profile_id=student.student_profile.id) == crud.ASSIGNED
+
+async def collect(response: StreamingResponse) -> bytes:
+    """Собирает тело потокового ответа."""
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+def read_xlsx(content: bytes):
+    """Возвращает строки первого листа Excel-файла."""
+    return [tuple(row) for row in load_workbook(io.BytesIO(content), read_only=True).active.iter_rows(values_only=True)]
+
+def test_xlsx_report_is_streamed_and_matches_snapshot(db):
+    seed_topics(db, 25)
+    create_user(db, "admin@test", "admin")
+    request = Request({"type": "http", "method": "GET", "path": "/admin/report/download", "headers": []})
+
+    response = main.download_report(request, token=auth.create_access_token({"sub": "admin@test"}), format="xlsx", db=db)
+
+    assert isinstance(response, StreamingResponse)
+    assert response.headers["etag"]
+    content = asyncio.run(collect(response))
+    rows = read_xlsx(content)
+    assert rows[0] == reports.REPORT_HEADERS
+    expected = list(reports.iter_report_rows(db))
+    assert rows[1:] == expected
+    assert rows[1][4] == "Студент"
+
+def test_first_xlsx_block_is_sent_before_all_rows_are_read():
+    consumed = []
+
+    def rows():
+        for i in range(20000):
+            consumed.append(i)
+            # Неповторяющиеся значения, чтобы сжатый лист был больше одного блока
+            yield (i, f"строка {i * 7919 % 100003}", hex(i * 2654435761 % 2 ** 32))
+
+    blocks = tabular.iter_xlsx(rows(), chunk_size=64 * 1024, headers=("n", "text", "hex"))
+    first = next(blocks)
+    consumed_before_first_block = len(consumed)
+    content = first + b"".join(blocks)
+
+    assert consumed_before_first_block < len(consumed) == 20000
+    assert zipfile.ZipFile(io.BytesIO(content)).testzip() is None
+    sheet = read_xlsx(content)
+    assert len(sheet) == 20001
+    assert sheet[-1][0] == 19999
@@ -0,0 +1,68 @@
+# tests/test_report_snapshot.py
+from conftest import create_user
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+
+from app import crud, models, report_snapshot, reports, schemas
+
+def fresh_report(db):
+    """Строки отчета, вычисленные заново по темам и пользователям, в порядке id тем."""
+    topics = db.query(models.Topic).options(
+        joinedload(models.Topic.teacher), joinedload(models.Topic.student).joinedload(models.Student.user)
+    ).order_by(models.Topic.id).all()
+    rows = []
+    for topic in topics:
+        if topic.student is None:
+            student_name, student_status, teacher_status = "", report_snapshot.STUDENT_FREE, ""
+        else:
+            student_name, student_status = topic.student.user.full_name, report_snapshot.STUDENT_ASSIGNED
+            teacher_status = report_snapshot.TEACHER_APPROVED if topic.is_approved else report_snapshot.TEACHER_PENDING
+        rows.append((topic.work_type, topic.teacher.full_name, topic.title, topic.description or "",
+                     student_name, student_status, teacher_status, ""))
+    return rows
+
+def assert_consistent(db):
+    db.expire_all()
+    assert list(reports.iter_report_rows(db)) == fresh_report(db)
+    assert report_snapshot.count_mismatches(db) == 0
+
+def test_snapshot_follows_crud_mutations(db):
+    teacher = create_user(db, "teacher@test", "teacher", full_name="Иванов Иван")
+    topics = [
+        crud.create_teacher_topic(db, schemas.TopicCreate(title=f"Тема {i}", work_type="coursework"), teacher.id)
+        for i in range(3)
+    ]
+    assert_consistent(db)
+
+    crud.bulk_create_users_with_profiles(db, "student", [
+        {"username": f"student{i}@test", "full_name": f"Студент {i}", "hashed_password": "-",
+         "profile": {"group": "ТЕСТ-1"}}
+        for i in range(2)
+    ])
+    students = [crud.get_user_with_profiles(db, f"student{i}@test").student_profile for i in range(2)]
+    assert_consistent(db)
+
+    crud.assign_topic_to_student(db, topics[0], students[0].id)
+    assert crud.try_assign_topic(db, topics[1].id, students[1].id) == crud.ASSIGNED
+    assert_consistent(db)
+
+    crud.approve_topic_assignment(db, topics[0])
+    assert_consistent(db)
+    crud.unapprove_topic_assignment(db, topics[0])
+    assert_consistent(db)
+
+    crud.update_topic(db, topics[2], schemas.TopicUpdate(title="Новое название", description="Описание"))
+    crud.unassign_topic_from_student(db, topics[1])
+    assert_consistent(db)
+
+def test_ensure_rebuilds_snapshot_that_differs_with_same_row_count(db):
+    teacher = create_user(db, "teacher@test", "teacher")
+    crud.create_teacher_topic(db, schemas.TopicCreate(title="Тема", work_type="coursework"), teacher.id)
+    # Правка в обход crud: число строк снимка совпадает с числом тем, но содержимое устарело
+    db.execute(update(models.Topic).values(title="Исправленная тема"))
+    db.commit()
+    assert report_snapshot.count_mismatches(db) == 1
+
+    report_snapshot.ensure(db)
+
+    assert_consistent(db)
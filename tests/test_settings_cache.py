@@ -0,0 +1,43 @@
+# tests/test_settings_cache.py
+import time
+
+from conftest import QueryCounter
+
+from app import crud
+from app.cache import SettingsCache
+
+def test_write_path_is_visible_without_waiting_for_ttl(db, monkeypatch):
+    monkeypatch.setattr(crud.settings_cache, "ttl", 3600)
+    crud.set_setting(db, name="vkr_edit_deadline", value="2030-01-01")
+    assert crud.get_setting_value(db, "vkr_edit_deadline") == "2030-01-01"
+
+    crud.set_setting(db, name="vkr_edit_deadline", value="2031-06-30")
+
+    assert crud.get_setting_value(db, "vkr_edit_deadline") == "2031-06-30"
+
+def test_other_process_cache_follows_version_row_after_ttl(db, monkeypatch):
+    # Кэш другого воркера: локальная инвалидация set_setting до него не доходит
+    other = SettingsCache(ttl=60)
+    crud.set_setting(db, name="selection_mode", value="fcfs")
+    assert other.get(db, "selection_mode") == "fcfs"
+
+    crud.set_setting(db, name="selection_mode", value=crud.PREFERENCES_MODE)
+    assert other.get(db, "selection_mode") == "fcfs"
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert other.get(db, "selection_mode") == crud.PREFERENCES_MODE
+
+def test_unchanged_version_extends_cache_with_one_query(db, monkeypatch):
+    cache = SettingsCache(ttl=60)
+    crud.set_setting(db, name="selection_mode", value="fcfs")
+    cache.get(db, "selection_mode")
+    later = time.monotonic() + 61
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+
+    with QueryCounter() as counter:
+        assert cache.get(db, "selection_mode") == "fcfs"
+        assert cache.get(db, "selection_mode") == "fcfs"
+
+    assert len(counter.statements) == 1
+    assert "data_versions" in counter.statements[0]
@@ -0,0 +1,42 @@
+# tests/test_teacher_dashboard.py
+from conftest import QueryCounter
+
+from app import crud, models
+
+TOPICS = 40
+
+def seed_teacher_with_students(db, topics: int) -> int:
+    """Создает преподавателя и topics тем, каждая из которых закреплена за своим студентом."""
+    teacher = models.User(username="teacher@test", full_name="Преподаватель", role="teacher", hashed_password="-")
+    db.add(teacher)
+    db.flush()
+    for i in range(topics):
+        user = models.User(username=f"student{i}@test", full_name=f"Студент {i}", role="student", hashed_password="-")
+        db.add(user)
+        db.flush()
+        student = models.Student(user_id=user.id, group="ТЕСТ-1")
+        db.add(student)
+        db.flush()
+        db.add(models.Topic(title=f"Тема {i}", work_type="vkr" if i % 2 else "coursework",
+                            teacher_id=teacher.id, student_id=student.id, is_approved=bool(i % 3)))
+    db.commit()
+    teacher_id = teacher.id
+    # Тест не должен получать объекты из карты идентичности сессии вместо запросов
+    db.expunge_all()
+    return teacher_id
+
+def test_teacher_dashboard_topics_load_in_bounded_queries(db):
+    teacher_id = seed_teacher_with_students(db, TOPICS)
+
+    with QueryCounter() as counter:
+        topics = crud.get_teacher_dashboard_topics(db, teacher_id=teacher_id, vkr_deadline="2000-01-01")
+        # Те же атрибуты, что читает шаблон карточек тем преподавателя
+        rendered = [
+            (topic.title, topic.work_type, topic.is_approved, topic.deadline_is_passed,
+             topic.student.user.full_name, topic.student.group)
+            for topic in topics
+        ]
+
+    assert len(rendered) == TOPICS
+    assert len(counter.statements) <= 2, counter.statements
+    assert all(deadline_passed == (work_type == "vkr") for _, work_type, _, deadline_passed, _, _ in rendered)
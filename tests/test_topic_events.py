@@ -0,0 +1,43 @@
+# tests/test_topic_events.py
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import config, events, models
+
+def test_database_backend_prunes_old_events_periodically(db, monkeypatch):
+    monkeypatch.setattr(config.settings, "EVENTS_POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(config.settings, "EVENTS_PRUNE_INTERVAL_SECONDS", 0.05)
+    old = datetime.utcnow() - timedelta(hours=config.settings.EVENTS_RETENTION_HOURS + 1)
+    db.add_all([models.TopicEvent(kind=events.CREATED, topic_id=1, created_at=old),
+                models.TopicEvent(kind=events.EDITED, topic_id=1)])
+    db.commit()
+
+    def remaining_kinds():
+        db.expire_all()
+        return db.scalars(select(models.TopicEvent.kind).order_by(models.TopicEvent.id)).all()
+
+    async def run_backend():
+        backend = events.DatabaseBackend(events.Broker())
+        backend.start()
+        try:
+            # Первая чистка выполняется сразу после запуска
+            for _ in range(100):
+                if remaining_kinds() == [events.EDITED]:
+                    break
+                await asyncio.sleep(0.01)
+            assert remaining_kinds() == [events.EDITED]
+
+            # Запись, устаревшая уже после запуска, удаляется следующей чисткой
+            db.add(models.TopicEvent(kind=events.ASSIGNED, topic_id=2, created_at=old))
+            db.commit()
+            for _ in range(100):
+                if remaining_kinds() == [events.EDITED]:
+                    break
+                await asyncio.sleep(0.01)
+            assert remaining_kinds() == [events.EDITED]
+        finally:
+            backend._task.cancel()
+
+    asyncio.run(run_backend())